@@ -0,0 +1,73 @@
+"""
+bench_common.py — Shared timing and report plumbing for the bench_*.py scripts
+
+Each benchmark builds a list of result dicts (one per solver, stage or
+phase) with an "id" and a "failures" list; this module stamps the run's
+environment onto the report, writes it, prints the failures and turns them
+into the exit status.
+
+Reports go under .cache/benchmarks/ (gitignored, like the script caches)
+unless a script is given --output.
+"""
+
+import json
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+REPORT_DIR = Path(os.environ.get("BENCH_REPORT_DIR",
+                                 Path(__file__).parent.parent / ".cache" / "benchmarks"))
+
+
+def report_path(name):
+    """Default JSON report path for a benchmark."""
+    return REPORT_DIR / f"{name}.json"
+
+
+def timed(fn, *args, **kwargs):
+    """(fn(*args, **kwargs), wall seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def banner(title):
+    print("=" * 60)
+    print(title)
+    print("=" * 60)
+
+
+def environment():
+    """When and on what the benchmark ran (NumPy version only if it is installed)."""
+    env = {
+        "generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+    }
+    try:
+        import numpy
+        env["numpy"] = numpy.__version__
+    except ImportError:
+        pass
+    return env
+
+
+def finish(report, results, path):
+    """Write the report, print every failure and exit non-zero if there were any."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({**environment(), **report}, f, indent=2)
+
+    failed = [r for r in results if r["failures"]]
+    print("\n" + "=" * 60)
+    for r in failed:
+        for msg in r["failures"]:
+            print(f"FAIL {r['id']}: {msg}")
+    print(f"Report: {path}")
+    print("=" * 60)
+
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Radioactive Decay Chains — Solver Benchmark
+Runs every available inventory solver from fetch_decay_chain.py on the same
+time grid and compares them against the highest-precision one available.
+
+Reports wall time, peak memory and max relative error per isotope, writes a
+JSON report, and exits non-zero when a solver breaks its thresholds (or
+regresses against a previous report passed with --baseline).
+
+Usage: python scripts/bench_decay_chain.py [--points 100] [--baseline old.json]
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import math
+import sys
+import tracemalloc
+from pathlib import Path
+
+import bench_common as bench
+import fetch_decay_chain as dc
+
+REPORT_PATH = bench.report_path("decay_chain_solvers")
+
+# Solvers in order of decreasing precision; the first available one is the reference
+SOLVERS = [
+    {
+        "id": "rd_hp",
+        "label": "radioactivedecay InventoryHP",
+        "available": dc.HAS_RD,
+        "run": lambda log_times: dc.compute_inventory_with_rd(log_times, high_precision=True),
+    },
+    {
+        "id": "rd",
+        "label": "radioactivedecay Inventory",
+        "available": dc.HAS_RD,
+        "run": lambda log_times: dc.compute_inventory_with_rd(log_times, high_precision=False),
+    },
+    {
+        "id": "euler",
+        "label": "Euler fallback",
+        "available": True,
+        "run": lambda log_times: dc.compute_inventory_evolution(log_times),
+    },
+]
+
+# Absolute limits per solver. Errors are relative to the reference solver;
+# a max_rel_error of None leaves that solver's error ungated.
+THRESHOLDS = {
+    "rd_hp": {"max_rel_error": 0.0, "max_seconds": 600.0},
+    "rd": {"max_rel_error": 1e-3, "max_seconds": 60.0},
+    # Explicit Euler is unstable for the sub-second daughters, so only its
+    # runtime and regressions against --baseline are gated
+    "euler": {"max_rel_error": None, "max_seconds": 120.0},
+}
+
+# Each solver estimates the stable end-member differently (atom count vs
+# 1 - U-238 activity), so Pb-206 is reported but never gated on
+UNGATED_ISOTOPES = {"Pb-206"}
+
+# Reference activities (Bq, from 1 Bq of U-238) below this are skipped: plain
+# float64 solvers lose all significant digits long before the HP reference does
+ACTIVITY_FLOOR = 1e-12
+
+# Peak memory is measured on a separate tracemalloc run over this many points
+# of the same range: the solvers step through the grid one time at a time, so
+# the peak barely depends on its length, and tracing slows the HP solver a lot
+MEMORY_POINTS = 10
+
+
+def run_solver(solver, log_times, repeat, memory_points=MEMORY_POINTS):
+    """Run a solver `repeat` times for timing, then on a short grid under tracemalloc for peak memory."""
+    timings = []
+    snapshots = None
+    for _ in range(repeat):
+        with contextlib.redirect_stdout(io.StringIO()):
+            snapshots, seconds = bench.timed(solver["run"], log_times)
+        timings.append(seconds)
+
+    step = max(1, (len(log_times) - 1) // max(memory_points - 1, 1))
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        solver["run"](log_times[::step])
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return snapshots, {
+        "wall_time_s": min(timings),
+        "wall_times_s": timings,
+        "peak_memory_mb": peak / 1e6,
+        "peak_memory_points": len(log_times[::step]),
+    }
+
+
+def compare_to_reference(snapshots, reference, floor=ACTIVITY_FLOOR):
+    """Max relative error per isotope over the shared time grid."""
+    by_time = {round(s["log10_time"], 9): s["isotopes"] for s in snapshots}
+    errors = {}
+
+    for ref in reference:
+        candidate = by_time.get(round(ref["log10_time"], 9))
+        for iso, ref_value in ref["isotopes"].items():
+            if ref_value <= floor:
+                continue
+            value = candidate.get(iso, 0.0) if candidate is not None else 0.0
+            rel = abs(value - ref_value) / ref_value
+            if iso not in errors or rel > errors[iso]["max_rel_error"]:
+                errors[iso] = {
+                    "max_rel_error": rel,
+                    "at_log10_time": float(ref["log10_time"]),
+                }
+
+    return errors
+
+
+def check_solver(result, thresholds, baseline, tolerance):
+    """Return a list of human-readable threshold/regression failures."""
+    failures = []
+    gated = [
+        e["max_rel_error"] for iso, e in result["errors"].items()
+        if iso not in UNGATED_ISOTOPES
+    ]
+    # NaN (0/0 on a dead reference) counts as unbounded, like inf
+    max_err = max((math.inf if math.isnan(e) else e for e in gated), default=0.0)
+    result["max_rel_error"] = max_err
+    result["error_gated"] = bool(thresholds) and thresholds["max_rel_error"] is not None
+
+    if thresholds:
+        if result["error_gated"] and max_err > thresholds["max_rel_error"]:
+            failures.append(
+                f"max relative error {max_err:.3e} > {thresholds['max_rel_error']:.3e}"
+            )
+        if result["wall_time_s"] > thresholds["max_seconds"]:
+            failures.append(
+                f"wall time {result['wall_time_s']:.2f}s > {thresholds['max_seconds']:.2f}s"
+            )
+
+    if baseline:
+        base_time = baseline["wall_time_s"]
+        # Small absolute slack so millisecond solvers don't fail on timer jitter
+        if result["wall_time_s"] > base_time * (1 + tolerance) + 0.05:
+            failures.append(
+                f"wall time regressed {base_time:.2f}s → {result['wall_time_s']:.2f}s"
+            )
+        # null in a baseline report means its error was already unbounded
+        base_err = baseline.get("max_rel_error", 0.0)
+        if base_err is not None and max_err > base_err * (1 + tolerance) + 1e-12:
+            failures.append(
+                f"max relative error regressed {base_err:.3e} → {max_err:.3e}"
+            )
+
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark decay-chain inventory solvers")
+    parser.add_argument("--points", type=int, default=100,
+                        help="time grid size over 10^-5..10^18 s (default 100; the site uses 500)")
+    parser.add_argument("--repeat", type=int, default=1, help="timed runs per solver (best is kept)")
+    parser.add_argument("--solvers", nargs="+", choices=[s["id"] for s in SOLVERS],
+                        help="restrict to these solvers")
+    parser.add_argument("--floor", type=float, default=ACTIVITY_FLOOR,
+                        help="ignore reference activities below this (Bq)")
+    parser.add_argument("--output", type=Path, default=REPORT_PATH, help="JSON report path")
+    parser.add_argument("--baseline", type=Path, help="previous report to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="allowed fractional regression against --baseline (default 0.25)")
+    args = parser.parse_args()
+
+    bench.banner("Decay Chain Solver Benchmark")
+
+    log_times = [-5 + i * 23 / (args.points - 1) for i in range(args.points)]
+    if dc.HAS_NUMPY:
+        log_times = dc.np.array(log_times)
+
+    solvers = [
+        s for s in SOLVERS
+        if s["available"] and (args.solvers is None or s["id"] in args.solvers)
+    ]
+    skipped = [s["id"] for s in SOLVERS if not s["available"]]
+    if skipped:
+        print(f"Unavailable: {', '.join(skipped)}")
+    if not solvers:
+        print("No solvers to run")
+        sys.exit(1)
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = {s["id"]: s for s in json.load(f)["solvers"]}
+
+    results = []
+    reference = None
+    for solver in solvers:
+        print(f"\nRunning {solver['label']}...")
+        snapshots, stats = run_solver(solver, log_times, args.repeat)
+        if reference is None:
+            reference = snapshots
+            reference_id = solver["id"]
+        result = {
+            "id": solver["id"],
+            "label": solver["label"],
+            "n_snapshots": len(snapshots),
+            **stats,
+            "errors": compare_to_reference(snapshots, reference, args.floor),
+        }
+        result["failures"] = check_solver(
+            result, THRESHOLDS.get(solver["id"]), baseline.get(solver["id"]), args.tolerance
+        )
+        results.append(result)
+        print(f"  {stats['wall_time_s']:.3f}s, peak {stats['peak_memory_mb']:.2f} MB, "
+              f"max rel error {result['max_rel_error']:.3e}"
+              + ("" if result["error_gated"] else " (not gated)"))
+
+    # Per-isotope table
+    print("\nMax relative error vs " + reference_id)
+    isotopes = [d["isotope"] for d in dc.CHAIN_DATA]
+    print(f"  {'isotope':<9}" + "".join(f"{r['id']:>12}" for r in results))
+    for iso in isotopes:
+        cells = []
+        for r in results:
+            err = r["errors"].get(iso)
+            cells.append(f"{err['max_rel_error']:>12.2e}" if err else f"{'—':>12}")
+        print(f"  {iso:<9}" + "".join(cells))
+
+    report = {
+        "n_points": args.points,
+        "log10_time_range": [float(log_times[0]), float(log_times[-1])],
+        "reference": reference_id,
+        "activity_floor": args.floor,
+        "ungated_isotopes": sorted(UNGATED_ISOTOPES),
+        "solvers": results,
+    }
+    # JSON has no infinity or NaN; unbounded errors come out as null
+    for r in results:
+        if not math.isfinite(r["max_rel_error"]):
+            r["max_rel_error"] = None
+        for e in r["errors"].values():
+            if not math.isfinite(e["max_rel_error"]):
+                e["max_rel_error"] = None
+
+    bench.finish(report, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
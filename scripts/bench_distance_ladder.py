@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Cosmic Distance Ladder — Gaia Column Processing Benchmark
+Times the vectorized column processing in fetch_distance_ladder.py on a
+synthetic Gaia-like result set (10^6 rows by default) against the per-row
+loop it replaced, and checks both produce the same records.
+
+Writes a JSON report and exits non-zero when the vectorized path is slower
+than its threshold or disagrees with the row loop.
+
+Usage: python scripts/bench_distance_ladder.py [--rows 1000000] [--output report.json]
+"""
+
+import argparse
+import json
+from pathlib import Path
+
+import numpy as np
+
+import bench_common as bench
+import fetch_distance_ladder as dl
+
+REPORT_PATH = bench.report_path("distance_ladder_columns")
+
+# Wall-time limits for the vectorized path at 10^6 rows, scaled linearly
+MAX_SECONDS_PER_MILLION = {"parallax": 10.0, "cepheids": 10.0}
+
+
+def synthetic_columns(n, seed=0):
+    """Gaia-like masked columns: parallax sample and Cepheid fields, a few % masked or bad."""
+    rng = np.random.default_rng(seed)
+    plx = rng.lognormal(0.0, 1.0, n)
+    plx[rng.random(n) < 0.02] *= -1
+    columns = {
+        'source_id': rng.integers(0, 12 * 4 ** 12 * dl.SOURCE_ID_PER_HPX12, n),
+        'ra': rng.uniform(0, 360, n),
+        'dec': np.degrees(np.arcsin(rng.uniform(-1, 1, n))),
+        'parallax': plx,
+        'parallax_error': np.abs(plx) * rng.uniform(0.005, 0.3, n),
+        'phot_g_mean_mag': np.ma.array(rng.uniform(3, 20, n), mask=rng.random(n) < 0.01),
+        'bp_rp': np.ma.array(rng.uniform(-0.5, 4, n), mask=rng.random(n) < 0.01),
+        'pf': 10 ** rng.uniform(0, 2, n),
+        'peak_to_peak_g': np.ma.array(rng.uniform(0, 1.2, n), mask=rng.random(n) < 0.05),
+    }
+    columns['name'] = np.char.add("Gaia DR3 ", columns['source_id'].astype(str))
+    return {k: np.ma.asarray(v) for k, v in columns.items()}
+
+
+def _rows(columns):
+    """Row dicts over a column mapping; masked cells come back as None."""
+    names = list(columns)
+    for i in range(len(columns[names[0]])):
+        yield {name: (None if np.ma.is_masked(columns[name][i]) else columns[name][i])
+               for name in names}
+
+
+def _good_row(row, keys):
+    if any(row[k] is None for k in keys) or row['parallax'] <= 0:
+        return False
+    return row['parallax_error'] / row['parallax'] <= dl.MAX_DISTANCE_ERROR
+
+
+def row_loop_parallax(columns):
+    """Reference: the old one-row-at-a-time parallax loop, with the same quality cuts."""
+    stars = []
+    for row in _rows(columns):
+        if not _good_row(row, ('parallax', 'parallax_error', 'phot_g_mean_mag', 'bp_rp')):
+            continue
+        distance_pc = 1000 / row['parallax']
+        stars.append({
+            'id': str(row['source_id']),
+            'name': str(row['name']),
+            'ra': float(row['ra']),
+            'dec': float(row['dec']),
+            'parallax_mas': float(row['parallax']),
+            'parallax_error_mas': float(row['parallax_error']),
+            'distance_pc': round(distance_pc, 3),
+            'distance_error_pc': round(distance_pc * row['parallax_error'] / row['parallax'], 3),
+            'distance_ly': round(distance_pc * dl.PC_TO_LY, 3),
+            'mag_g': float(row['phot_g_mean_mag']),
+            'color_bp_rp': float(row['bp_rp']),
+        })
+    return stars
+
+
+def row_loop_cepheids(columns):
+    """Reference: the old one-row-at-a-time Cepheid loop, with the same quality cuts."""
+    cepheids = []
+    for row in _rows(columns):
+        if not _good_row(row, ('parallax', 'parallax_error', 'phot_g_mean_mag', 'pf')):
+            continue
+        distance_pc = 1000 / row['parallax']
+        abs_mag = row['phot_g_mean_mag'] - 5 * np.log10(distance_pc / 10)
+        cepheids.append({
+            'id': str(row['source_id']),
+            'ra': float(row['ra']),
+            'dec': float(row['dec']),
+            'period_days': float(row['pf']),
+            'log_period': float(np.log10(row['pf'])),
+            'apparent_mag': float(row['phot_g_mean_mag']),
+            'absolute_mag': round(float(abs_mag), 3),
+            'absolute_mag_error': round(float(5 / np.log(10) * row['parallax_error'] / row['parallax']), 3),
+            'parallax_mas': float(row['parallax']),
+            'distance_pc': round(distance_pc, 1),
+            'distance_kpc': round(distance_pc / 1000, 3),
+            'amplitude': float(row['peak_to_peak_g']) if row['peak_to_peak_g'] else 0.5,
+        })
+    cepheids.sort(key=lambda c: c['period_days'])
+    return cepheids
+
+
+def max_difference(records, reference):
+    """Largest absolute difference over numeric fields; inf if the record sets differ in shape."""
+    if len(records) != len(reference):
+        return float("inf")
+    worst = 0.0
+    for a, b in zip(records, reference):
+        if a.keys() != b.keys():
+            return float("inf")
+        for key, value in a.items():
+            if isinstance(value, str):
+                if value != b[key]:
+                    return float("inf")
+            else:
+                worst = max(worst, abs(value - b[key]))
+    return worst
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Gaia column processing")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="synthetic rows (default 10^6)")
+    parser.add_argument("--reference-rows", type=int, default=100_000,
+                        help="rows run through the per-row loop for timing and comparison")
+    parser.add_argument("--output", type=Path, default=REPORT_PATH, help="JSON report path")
+    args = parser.parse_args()
+
+    bench.banner("Gaia Column Processing Benchmark")
+
+    columns = synthetic_columns(args.rows)
+    subset = {k: v[:args.reference_rows] for k, v in columns.items()}
+    stages = [
+        ("parallax", dl.process_parallax_columns, row_loop_parallax),
+        ("cepheids", dl.process_cepheid_columns, row_loop_cepheids),
+    ]
+
+    results = []
+    for name, vectorized, row_loop in stages:
+        print(f"\n{name}: {args.rows:,} rows")
+        records, seconds = bench.timed(vectorized, columns)
+        _, json_seconds = bench.timed(json.dumps, records)
+        reference, ref_seconds = bench.timed(row_loop, subset)
+        agreement = max_difference(vectorized(subset), reference)
+        # Per-row loop extrapolated to the full size for the speedup figure
+        ref_full = ref_seconds * args.rows / max(args.reference_rows, 1)
+
+        limit = MAX_SECONDS_PER_MILLION[name] * args.rows / 1e6
+        failures = []
+        if seconds > limit:
+            failures.append(f"vectorized {seconds:.2f}s > {limit:.2f}s")
+        if agreement > 1e-9:
+            failures.append(f"differs from row loop by {agreement:.3e}")
+
+        print(f"  vectorized   {seconds:8.2f}s  ({len(records):,} records kept)")
+        print(f"  json.dumps   {json_seconds:8.2f}s")
+        print(f"  row loop     {ref_full:8.2f}s  (extrapolated from {args.reference_rows:,} rows)")
+        print(f"  speedup      {ref_full / seconds:8.1f}×, max difference {agreement:.1e}")
+        results.append({
+            "id": name,
+            "records": len(records),
+            "vectorized_s": seconds,
+            "json_dumps_s": json_seconds,
+            "row_loop_s_extrapolated": ref_full,
+            "speedup": ref_full / seconds,
+            "max_difference": agreement if np.isfinite(agreement) else None,
+            "failures": failures,
+        })
+
+    report = {
+        "n_rows": args.rows,
+        "reference_rows": args.reference_rows,
+        "stages": results,
+    }
+    bench.finish(report, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
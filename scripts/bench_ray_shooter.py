@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Seismic Waves — Ray Shooter Check
+Compares the offline ray shooter in fetch_seismic.py (used when ObsPy is not
+installed) with TauP on the same earth_model, for every phase the site
+draws, over the ray-path distances and a few source depths.
+
+Reports the largest travel-time difference per phase, the distances only
+one side finds an arrival at, and the shooter's wall time. Writes a JSON
+report and exits non-zero when a phase differs from TauP by more than its
+tolerance. Needs ObsPy for the TauP side.
+
+Usage: python scripts/bench_ray_shooter.py [--depths 10 30 300] [--step 1]
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+import bench_common as bench
+import fetch_seismic as fs
+
+REPORT_PATH = bench.report_path("ray_shooter")
+
+DEPTHS_KM = [10.0, 30.0, 300.0]
+
+# Max |shooter - TauP| first-arrival time per phase (s). The shooter uses the
+# same Bullen-law layers as TauP, so what is left is the 10 km shell step and
+# the bisection tolerance; two-leg phases double both.
+TOLERANCE_S = {
+    "P": 0.1,
+    "S": 0.1,
+    "PP": 0.2,
+    "SS": 0.2,
+    "PcP": 0.1,
+    "ScS": 0.1,
+    "PKP": 0.1,
+    "PKIKP": 0.1,
+    "Pdiff": 0.1,
+}
+
+
+def check_phase(model, phase, distances, depth):
+    """Per-distance (shooter time, TauP first-arrival time or None)."""
+    grid = fs.ShellGrid(depth)
+    _, _, t, found = fs.find_ray_parameters(phase, distances, grid)
+    rows = []
+    for dist, t_shoot, ok in zip(distances, t, found):
+        arrivals = model.get_travel_times(source_depth_in_km=depth, distance_in_degree=float(dist),
+                                          phase_list=[phase])
+        rows.append((float(dist), float(t_shoot) if ok else None,
+                     arrivals[0].time if arrivals else None))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the offline ray shooter against TauP")
+    parser.add_argument("--depths", type=float, nargs="+", default=DEPTHS_KM,
+                        help="source depths in km (default 10 30 300)")
+    parser.add_argument("--step", type=float, default=1.0, help="distance step in degrees")
+    parser.add_argument("--phases", nargs="+", choices=list(fs.RAY_PHASES), default=fs.PHASES)
+    parser.add_argument("--output", type=Path, default=REPORT_PATH, help="JSON report path")
+    args = parser.parse_args()
+
+    if not fs.HAS_OBSPY:
+        print("ObsPy is required for the TauP reference")
+        sys.exit(1)
+    from obspy.taup import TauPyModel
+
+    bench.banner("Ray Shooter vs TauP (earth_model)")
+
+    model = TauPyModel(model=fs.resolve_taup_model("earth_model"))
+    distances = np.arange(args.step, 180.0, args.step)
+
+    trace_seconds = sum(bench.timed(fs.trace_ray_paths, args.phases, range(5, 180, 5), depth)[1]
+                        for depth in args.depths) / len(args.depths)
+    print(f"\ntrace_ray_paths: {trace_seconds:.2f}s per depth ({len(args.phases)} phases, 5° steps)")
+
+    print(f"\n  {'phase':<7}{'max |Δt| s':>12}{'at':>14}{'tol':>7}{'shooter only':>14}{'TauP only':>11}")
+    results = []
+    for phase in args.phases:
+        worst, worst_at = 0.0, None
+        shooter_only, taup_only = [], []
+        for depth in args.depths:
+            for dist, t_shoot, t_taup in check_phase(model, phase, distances, depth):
+                if t_shoot is not None and t_taup is not None:
+                    if abs(t_shoot - t_taup) > abs(worst):
+                        worst, worst_at = t_shoot - t_taup, [depth, dist]
+                elif t_shoot is not None:
+                    shooter_only.append([depth, dist])
+                elif t_taup is not None:
+                    taup_only.append([depth, dist])
+
+        tolerance = TOLERANCE_S[phase]
+        failures = []
+        if abs(worst) > tolerance:
+            failures.append(f"max |Δt| {abs(worst):.2f}s > {tolerance:.2f}s "
+                            f"at {worst_at[1]:g}° from {worst_at[0]:g} km")
+        at = f"{worst_at[1]:g}°/{worst_at[0]:g}km" if worst_at else "—"
+        print(f"  {phase:<7}{abs(worst):>12.3f}{at:>14}{tolerance:>7.2f}"
+              f"{len(shooter_only):>14}{len(taup_only):>11}")
+        results.append({
+            "id": phase,
+            "max_time_difference_s": worst,
+            "at_depth_km_distance_deg": worst_at,
+            "tolerance_s": tolerance,
+            "shooter_only": shooter_only,
+            "taup_only": taup_only,
+            "failures": failures,
+        })
+
+    report = {
+        "depths_km": args.depths,
+        "distance_step_deg": args.step,
+        "trace_ray_paths_s_per_depth": trace_seconds,
+        "phases": results,
+    }
+    bench.finish(report, results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+"""
+cosmology.py — Tabulated FLRW distances for the distance-ladder scripts
+
+Integrates the line-of-sight comoving distance once per (Ωm, ΩΛ, w) on a
+dense redshift grid with cumulative quadrature, then answers comoving,
+luminosity distance and distance modulus for any array of redshifts by
+interpolation. Tables are dimensionless (in units of the Hubble distance
+c/H0), so sweeping H0 reuses the same table and only rescales it.
+
+Usage:
+  from cosmology import luminosity_distance, distance_modulus
+  d_L = luminosity_distance(z, H0=70)          # Mpc
+  mu = distance_modulus(z, H0=73.04, omega_m=0.3)
+
+Requires: pip install numpy
+"""
+
+from functools import lru_cache
+
+import numpy as np
+
+C_KM_S = 299792.458  # speed of light, km/s
+
+# Fiducial flat ΛCDM
+H0_FIDUCIAL = 70.0   # km/s/Mpc
+OMEGA_M = 0.3
+OMEGA_L = 0.7
+W_DE = -1.0          # dark-energy equation of state p = w ρ c²
+
+# Redshift grid: trapezoid error on this step is ~1e-9 of c/H0
+TABLE_DZ = 1e-4
+TABLE_Z_MAX = 3.0    # grown in steps of this size when asked for higher z
+
+
+def hubble_function(z, omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE):
+    """E(z) = H(z) / H0 for matter, curvature and constant-w dark energy (radiation ignored)."""
+    zp1 = 1 + np.asarray(z, dtype=np.float64)
+    omega_k = 1 - omega_m - omega_l
+    return np.sqrt(omega_m * zp1 ** 3 + omega_k * zp1 ** 2 + omega_l * zp1 ** (3 * (1 + w)))
+
+
+@lru_cache(maxsize=64)
+def distance_table(omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE, z_max=TABLE_Z_MAX):
+    """
+    (z, D_C / D_H, D_M / D_H) on a uniform grid from 0 to z_max.
+
+    D_C is the cumulative trapezoid integral of 1/E(z); D_M applies the
+    curvature correction (sinh for open, sin for closed). Arrays are
+    read-only because the table is shared between callers.
+    """
+    n = int(round(z_max / TABLE_DZ)) + 1
+    z = np.linspace(0.0, z_max, n)
+    inv_e = 1 / hubble_function(z, omega_m, omega_l, w)
+    dc = np.concatenate([[0.0], np.cumsum(0.5 * (inv_e[1:] + inv_e[:-1]) * np.diff(z))])
+
+    omega_k = 1 - omega_m - omega_l
+    if omega_k > 1e-12:
+        k = np.sqrt(omega_k)
+        dm = np.sinh(k * dc) / k
+    elif omega_k < -1e-12:
+        k = np.sqrt(-omega_k)
+        dm = np.sin(k * dc) / k
+    else:
+        dm = dc
+
+    for arr in (z, dc, dm):
+        arr.flags.writeable = False
+    return z, dc, dm
+
+
+def _table_for(z, omega_m, omega_l, w):
+    """Table covering max(z), with z_max rounded up to a multiple of TABLE_Z_MAX so it caches."""
+    z_top = float(np.max(z, initial=0.0))
+    if not np.isfinite(z_top):
+        raise ValueError("redshifts must be finite")
+    z_max = TABLE_Z_MAX * max(1, int(np.ceil(z_top / TABLE_Z_MAX)))
+    return distance_table(float(omega_m), float(omega_l), float(w), z_max)
+
+
+def comoving_distance(z, H0=H0_FIDUCIAL, omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE):
+    """Line-of-sight comoving distance in Mpc."""
+    z = np.asarray(z, dtype=np.float64)
+    grid, dc, _ = _table_for(z, omega_m, omega_l, w)
+    return C_KM_S / H0 * np.interp(z, grid, dc)
+
+
+def transverse_comoving_distance(z, H0=H0_FIDUCIAL, omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE):
+    """Transverse comoving distance D_M in Mpc (equals comoving_distance when flat)."""
+    z = np.asarray(z, dtype=np.float64)
+    grid, _, dm = _table_for(z, omega_m, omega_l, w)
+    return C_KM_S / H0 * np.interp(z, grid, dm)
+
+
+def luminosity_distance(z, H0=H0_FIDUCIAL, omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE):
+    """Luminosity distance d_L = (1 + z) D_M in Mpc."""
+    z = np.asarray(z, dtype=np.float64)
+    return (1 + z) * transverse_comoving_distance(z, H0, omega_m, omega_l, w)
+
+
+def distance_modulus(z, H0=H0_FIDUCIAL, omega_m=OMEGA_M, omega_l=OMEGA_L, w=W_DE):
+    """μ = 5 log10(d_L / 10 pc); -inf at z = 0."""
+    with np.errstate(divide='ignore'):
+        return 5 * np.log10(luminosity_distance(z, H0, omega_m, omega_l, w)) + 25
@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+"""
+fdsn_standin.py — Local FDSN web service stand-in for fetch_seismic.py
+Serves canned StationXML and miniSEED over the fdsnws station/dataselect
+query endpoints, so the whole fetch path can be exercised and benchmarked
+without network access.
+
+Usage:
+  python scripts/fdsn_standin.py --generate            # write canned data for target_stations
+  python scripts/fdsn_standin.py --port 8080 [--latency 0.2] [--fail-rate 0.1]
+  python scripts/fetch_seismic.py --fdsn-url http://127.0.0.1:8080
+
+Requires: pip install obspy numpy
+"""
+
+import argparse
+import io
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+from obspy import Stream, Trace, UTCDateTime, read, read_inventory
+from obspy.core.inventory import Channel, Inventory, Network, Site, Station
+from obspy.core.inventory.response import Response
+
+import fetch_seismic as fs
+
+DATA_DIR = fs.CACHE_DIR / "fdsn_standin"
+
+# Canned waveforms cover the fetch window with a little slack either side
+WINDOW_BEFORE_S = 120
+WINDOW_AFTER_S = 2 * 3600 + 120
+SAMPLE_RATE = 1.0  # LHZ
+COUNTS_PER_UNIT = 1e4
+
+
+def _destination(lat, lon, distance_deg, azimuth_deg):
+    """Point at a great-circle distance and azimuth from (lat, lon)."""
+    lat1, lon1 = np.radians(lat), np.radians(lon)
+    d, az = np.radians(distance_deg), np.radians(azimuth_deg)
+    lat2 = np.arcsin(np.sin(lat1) * np.cos(d) + np.cos(lat1) * np.sin(d) * np.cos(az))
+    lon2 = lon1 + np.arctan2(np.sin(az) * np.sin(d) * np.cos(lat1),
+                             np.cos(d) - np.sin(lat1) * np.sin(lat2))
+    return float(np.degrees(lat2)), float((np.degrees(lon2) + 540) % 360 - 180)
+
+
+def generate_canned_data(data_dir=DATA_DIR):
+    """Write one StationXML and one LHZ miniSEED file per target station."""
+    data_dir.mkdir(parents=True, exist_ok=True)
+    event_time = UTCDateTime(fs.EVENT_TIME_STR)
+    start = event_time - WINDOW_BEFORE_S
+    duration = WINDOW_BEFORE_S + WINDOW_AFTER_S
+
+    np.random.seed(7)
+    for i, (net, sta, dist) in enumerate(fs.target_stations):
+        lat, lon = _destination(fs.EVENT_LAT, fs.EVENT_LON, dist, (i * 47) % 360)
+
+        response = Response.from_paz(zeros=[], poles=[], stage_gain=COUNTS_PER_UNIT,
+                                     input_units="M/S", output_units="COUNTS")
+        channel = Channel(code="LHZ", location_code="00", latitude=lat, longitude=lon,
+                          elevation=0.0, depth=0.0, azimuth=0.0, dip=-90.0,
+                          sample_rate=SAMPLE_RATE, response=response,
+                          start_date=UTCDateTime(2000, 1, 1))
+        station = Station(code=sta, latitude=lat, longitude=lon, elevation=0.0,
+                          site=Site(name=f"{sta} (stand-in)"), channels=[channel],
+                          start_date=UTCDateTime(2000, 1, 1))
+        inv = Inventory(networks=[Network(code=net, stations=[station])], source="fdsn_standin")
+        inv.write(str(data_dir / f"{net}.{sta}.xml"), format="STATIONXML")
+
+        # Synthetic trace starts at the event; pad the lead-in with noise
+        body = np.array(fs.generate_synthetic_seismogram(dist, duration - WINDOW_BEFORE_S,
+                                                         SAMPLE_RATE))
+        lead = np.random.randn(int(WINDOW_BEFORE_S * SAMPLE_RATE)) * 0.02
+        data = (np.concatenate([lead, body]) * COUNTS_PER_UNIT).astype(np.int32)
+        tr = Trace(data=data, header={
+            "network": net, "station": sta, "location": "00", "channel": "LHZ",
+            "starttime": start, "sampling_rate": SAMPLE_RATE,
+        })
+        Stream([tr]).write(str(data_dir / f"{net}.{sta}.LHZ.mseed"), format="MSEED",
+                           encoding="STEIM2")
+        print(f"  ✓ {net}.{sta} ({lat:.2f}, {lon:.2f})")
+
+    print(f"Canned data written to {data_dir}")
+
+
+class FDSNStandinHandler(BaseHTTPRequestHandler):
+    """Minimal fdsnws-station (GET and bulk POST) / fdsnws-dataselect query handler over canned files."""
+
+    data_dir = DATA_DIR
+    latency = 0.0
+    fail_rate = 0.0
+    stats = {"requests": 0, "failed": 0, "no_data": 0}
+    stats_lock = threading.Lock()
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _count(self, key):
+        with self.stats_lock:
+            self.stats[key] += 1
+
+    def _send(self, status, body=b"", content_type="text/plain"):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        self._count("requests")
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._count("failed")
+            self._send(503, b"Service temporarily unavailable (stand-in)")
+            return
+
+        if url.path.endswith("/version"):
+            self._send(200, b"1.1.0")
+        elif url.path == "/fdsnws/station/1/query":
+            self._station(params)
+        elif url.path == "/fdsnws/dataselect/1/query":
+            self._dataselect(params)
+        else:
+            self._send(404, b"Not found")
+
+    def do_POST(self):
+        """Bulk queries: key=value lines, then one "NET STA LOC CHA START END" line per selection."""
+        self._count("requests")
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+        params, selections = {}, []
+        for line in body.splitlines():
+            line = line.strip()
+            if "=" in line:
+                key, value = line.split("=", 1)
+                params[key.strip()] = value.strip()
+            elif line:
+                selections.append(line.split())
+
+        if self.latency:
+            time.sleep(self.latency)
+        if self.fail_rate and random.random() < self.fail_rate:
+            self._count("failed")
+            self._send(503, b"Service temporarily unavailable (stand-in)")
+            return
+
+        if url.path == "/fdsnws/station/1/query":
+            self._station_bulk(selections)
+        else:
+            self._send(404, b"Not found")
+
+    def _station_bulk(self, selections):
+        inv = None
+        for net, sta, *_ in selections:
+            path = self.data_dir / f"{net}.{sta}.xml"
+            if not path.exists():
+                continue
+            station_inv = read_inventory(str(path))
+            inv = station_inv if inv is None else inv + station_inv
+        if inv is None:
+            self._no_data()
+            return
+        buf = io.BytesIO()
+        inv.write(buf, format="STATIONXML")
+        self._send(200, buf.getvalue(), "application/xml")
+
+    def _no_data(self):
+        self._count("no_data")
+        self._send(204)
+
+    def _station(self, params):
+        net, sta = params.get("network") or params.get("net"), params.get("station") or params.get("sta")
+        path = self.data_dir / f"{net}.{sta}.xml"
+        if not path.exists():
+            self._no_data()
+            return
+        self._send(200, path.read_bytes(), "application/xml")
+
+    def _dataselect(self, params):
+        net, sta = params.get("network") or params.get("net"), params.get("station") or params.get("sta")
+        cha = params.get("channel") or params.get("cha") or "LHZ"
+        path = self.data_dir / f"{net}.{sta}.{cha}.mseed"
+        if not path.exists():
+            self._no_data()
+            return
+        st = read(str(path))
+        start = UTCDateTime(params["starttime"]) if "starttime" in params else None
+        end = UTCDateTime(params["endtime"]) if "endtime" in params else None
+        st.trim(start, end)
+        if not st or not len(st[0].data):
+            self._no_data()
+            return
+        buf = io.BytesIO()
+        st.write(buf, format="MSEED", encoding="STEIM2")
+        self._send(200, buf.getvalue(), "application/vnd.fdsn.mseed")
+
+
+def serve(port, data_dir=DATA_DIR, latency=0.0, fail_rate=0.0):
+    """Run the stand-in until interrupted."""
+    handler = type("Handler", (FDSNStandinHandler,), {
+        "data_dir": data_dir, "latency": latency, "fail_rate": fail_rate,
+        "stats": {"requests": 0, "failed": 0, "no_data": 0},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"FDSN stand-in serving {data_dir} on http://127.0.0.1:{port} "
+          f"(latency {latency}s, fail rate {fail_rate:.0%})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"\nServed {handler.stats['requests']} requests "
+              f"({handler.stats['failed']} injected failures, {handler.stats['no_data']} no data)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local FDSN stand-in for fetch_seismic.py")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--generate", action="store_true",
+                        help="write canned StationXML/miniSEED for target_stations and exit")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0,
+                        help="fraction of requests answered with HTTP 503")
+    args = parser.parse_args()
+
+    if args.generate:
+        generate_canned_data(args.data_dir)
+        return
+    if not any(args.data_dir.glob("*.xml")):
+        print(f"No canned data in {args.data_dir}; generating it first...")
+        generate_canned_data(args.data_dir)
+    serve(args.port, args.data_dir, args.latency, args.fail_rate)
+
+
+if __name__ == "__main__":
+    main()
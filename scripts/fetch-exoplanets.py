@@ -2,14 +2,18 @@
 Fetch exoplanet data from NASA Exoplanet Archive TAP service.
 Outputs JSON for the browser visualization.
 
-Usage: python scripts/fetch-exoplanets.py
+Usage: python scripts/fetch-exoplanets.py [--table ps] [--input response.json]
 Output: public/data/exoplanets/planets.json
         public/data/exoplanets/featured.json
+        public/data/exoplanets/planets_all_params.json  (--table ps)
 """
+import argparse
 import requests
 import json
-import math
 import os
+import time
+
+import numpy as np
 
 TAP_URL = "https://exoplanetarchive.ipac.caltech.edu/TAP/sync"
 
@@ -25,9 +29,18 @@ COLUMNS = [
     "disc_year", "discoverymethod", "disc_facility"
 ]
 
-QUERY = f"""
-SELECT {','.join(COLUMNS)}
-FROM pscomppars
+STRING_COLUMNS = {"pl_name", "hostname", "pl_letter", "discoverymethod", "disc_facility"}
+INT_COLUMNS = {"disc_year"}
+
+# pscomppars: one composite row per planet; ps: every published parameter set
+TABLES = {
+    "pscomppars": "planets.json",
+    "ps": "planets_all_params.json",
+}
+
+QUERY = """
+SELECT {columns}
+FROM {table}
 WHERE tran_flag = 1
   AND pl_rade IS NOT NULL
 ORDER BY pl_trandep DESC
@@ -57,59 +70,110 @@ LD_TABLE = {
     6500: (0.30, 0.26), 7000: (0.25, 0.27), 7500: (0.22, 0.27),
 }
 
+LD_TEMPS = np.array(sorted(LD_TABLE), dtype=float)
+LD_U1 = np.array([LD_TABLE[t][0] for t in sorted(LD_TABLE)])
+LD_U2 = np.array([LD_TABLE[t][1] for t in sorted(LD_TABLE)])
+LD_DEFAULT = (0.40, 0.24)  # solar, for stars without Teff
+
 def get_limb_darkening(teff):
-    """Interpolate quadratic LD coefficients from Teff."""
-    if teff is None:
-        return (0.40, 0.24)  # default solar
-    temps = sorted(LD_TABLE.keys())
-    if teff <= temps[0]:
-        return LD_TABLE[temps[0]]
-    if teff >= temps[-1]:
-        return LD_TABLE[temps[-1]]
-    for i in range(len(temps) - 1):
-        if temps[i] <= teff <= temps[i + 1]:
-            t = (teff - temps[i]) / (temps[i + 1] - temps[i])
-            u1a, u2a = LD_TABLE[temps[i]]
-            u1b, u2b = LD_TABLE[temps[i + 1]]
-            return (u1a + t * (u1b - u1a), u2a + t * (u2b - u2a))
-    return (0.40, 0.24)
+    """Interpolate quadratic LD coefficients from Teff (array or scalar; clamped at the table ends)."""
+    teff = np.asarray(teff, dtype=float)
+    i = np.clip(np.searchsorted(LD_TEMPS, teff) - 1, 0, len(LD_TEMPS) - 2)
+    t = np.clip((teff - LD_TEMPS[i]) / (LD_TEMPS[i + 1] - LD_TEMPS[i]), 0.0, 1.0)
+    u1 = LD_U1[i] + t * (LD_U1[i + 1] - LD_U1[i])
+    u2 = LD_U2[i] + t * (LD_U2[i + 1] - LD_U2[i])
+    # Exact table values beyond the ends, solar defaults without Teff
+    u1 = np.where(teff <= LD_TEMPS[0], LD_U1[0], np.where(teff >= LD_TEMPS[-1], LD_U1[-1], u1))
+    u2 = np.where(teff <= LD_TEMPS[0], LD_U2[0], np.where(teff >= LD_TEMPS[-1], LD_U2[-1], u2))
+    missing = np.isnan(teff)
+    return np.where(missing, LD_DEFAULT[0], u1), np.where(missing, LD_DEFAULT[1], u2)
 
-def main():
-    print("Fetching data from NASA Exoplanet Archive...")
-    response = requests.get(TAP_URL, params={
-        "query": QUERY.replace("\n", " "),
-        "format": "json"
-    })
-    response.raise_for_status()
-    planets = response.json()
-    print(f"Retrieved {len(planets)} transiting planets.")
+def to_columns(rows):
+    """TAP JSON rows → {column: array}; numeric nulls become NaN, string columns stay objects."""
+    columns = {}
+    for name in COLUMNS:
+        values = [row.get(name) for row in rows]
+        columns[name] = np.array(values, dtype=object if name in STRING_COLUMNS else float)
+    return columns
 
-    # Add computed fields
-    for p in planets:
-        teff = p.get("st_teff")
-        u1, u2 = get_limb_darkening(teff)
-        p["ld_u1"] = round(u1, 3)
-        p["ld_u2"] = round(u2, 3)
+def rounded(values, ndigits):
+    """Python's round() on each element; np.round scales by 10^n first and breaks .xxx5 ties differently."""
+    return np.frompyfunc(round, 2, 1)(values, ndigits).astype(float)
+
+def add_derived(columns):
+    """Limb darkening, transit depth ↔ radius ratio fill-ins and the featured flag, as array ops."""
+    u1, u2 = get_limb_darkening(columns["st_teff"])
+    columns["ld_u1"] = rounded(u1, 3)
+    columns["ld_u2"] = rounded(u2, 3)
 
-        # Compute transit depth from radius ratio if missing
-        if p.get("pl_trandep") is None and p.get("pl_ratror") is not None:
-            p["pl_trandep"] = round(p["pl_ratror"] ** 2 * 100, 6)
+    depth, ratror = columns["pl_trandep"], columns["pl_ratror"]
+    has_depth, has_ratror = ~np.isnan(depth), ~np.isnan(ratror)
 
-        # Compute radius ratio if missing
-        if p.get("pl_ratror") is None and p.get("pl_trandep") is not None:
-            p["pl_ratror"] = round(math.sqrt(p["pl_trandep"] / 100), 5)
+    # Compute transit depth from radius ratio if missing
+    columns["pl_trandep"] = np.where(~has_depth & has_ratror, rounded(ratror ** 2 * 100, 6), depth)
 
-        # Flag as featured
-        p["featured"] = p["pl_name"] in FEATURED
+    # Compute radius ratio if missing
+    with np.errstate(invalid="ignore"):
+        columns["pl_ratror"] = np.where(~has_ratror & has_depth,
+                                        rounded(np.sqrt(depth / 100), 5), ratror)
+
+    # Flag as featured
+    columns["featured"] = np.isin(columns["pl_name"], FEATURED)
+    return columns
+
+def to_records(columns):
+    """Columns → list of row dicts, NaN → None, converting each column once."""
+    lists = {}
+    for name, values in columns.items():
+        if values.dtype.kind == "f":
+            out = values.astype(object)
+            out[np.isnan(values)] = None
+            if name in INT_COLUMNS:
+                out[~np.isnan(values)] = values[~np.isnan(values)].astype(int)
+            lists[name] = out.tolist()
+        else:
+            lists[name] = values.tolist()
+    names = list(lists)
+    return [dict(zip(names, row)) for row in zip(*lists.values())]
+
+def main():
+    parser = argparse.ArgumentParser(description="Fetch transiting exoplanets from the NASA Exoplanet Archive")
+    parser.add_argument("--table", choices=sorted(TABLES), default="pscomppars",
+                        help="pscomppars (one row per planet) or ps (every parameter set)")
+    parser.add_argument("--input", help="process a saved TAP JSON response instead of querying")
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            rows = json.load(f)
+    else:
+        print("Fetching data from NASA Exoplanet Archive...")
+        query = QUERY.format(columns=",".join(COLUMNS), table=args.table)
+        response = requests.get(TAP_URL, params={
+            "query": query.replace("\n", " "),
+            "format": "json"
+        })
+        response.raise_for_status()
+        rows = response.json()
+    print(f"Retrieved {len(rows)} transiting planet rows from {args.table}.")
+
+    # Add computed fields
+    start = time.perf_counter()
+    columns = add_derived(to_columns(rows))
+    planets = to_records(columns)
+    print(f"Processed {len(planets)} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
 
     # Write full catalogue
     os.makedirs("public/data/exoplanets", exist_ok=True)
-    with open("public/data/exoplanets/planets.json", "w") as f:
+    out_name = TABLES[args.table]
+    with open(f"public/data/exoplanets/{out_name}", "w") as f:
         json.dump(planets, f)
-    print(f"Wrote planets.json ({len(planets)} planets)")
+    print(f"Wrote {out_name} ({len(planets)} planets)")
+    if args.table != "pscomppars":
+        return
 
     # Write featured subset
-    featured = [p for p in planets if p["featured"]]
+    featured = [planets[i] for i in np.flatnonzero(columns["featured"])]
     with open("public/data/exoplanets/featured.json", "w") as f:
         json.dump(featured, f, indent=2)
     print(f"Wrote featured.json ({len(featured)} planets)")
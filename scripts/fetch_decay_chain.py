@@ -390,7 +390,14 @@ TIME_COMPARISONS = [
 ]
 
 
-def compute_inventory_evolution():
+def default_log_times():
+    """Log-spaced time grid shared by every inventory solver: 10^-5 s to 10^18 s, 500 points."""
+    if HAS_NUMPY:
+        return np.linspace(-5, 18, 500)
+    return [-5 + i * 23 / 499 for i in range(500)]
+
+
+def compute_inventory_evolution(log_times=None):
     """
     Compute isotope inventories at logarithmically-spaced time points.
     Uses Bateman equations for chain decay.
@@ -409,10 +416,8 @@ def compute_inventory_evolution():
     decay_constants = [math.log(2) / hl if hl != float("inf") else 0 for hl in half_lives]
 
     # Log-spaced time points from 10^-5 s to 10^18 s (500 points)
-    if HAS_NUMPY:
-        log_times = np.linspace(-5, 18, 500)
-    else:
-        log_times = [-5 + i * 23 / 499 for i in range(500)]
+    if log_times is None:
+        log_times = default_log_times()
 
     snapshots = []
 
@@ -478,19 +483,20 @@ def compute_inventory_evolution():
     return snapshots
 
 
-def compute_inventory_with_rd():
+def compute_inventory_with_rd(log_times=None, high_precision=True):
     """Use radioactivedecay package for high-precision inventory evolution."""
-    print("Computing inventory evolution with radioactivedecay (high precision)...")
-
-    try:
-        inv = rd.InventoryHP({"U-238": 1.0})  # 1 Bq initial
-    except:
+    if high_precision:
+        print("Computing inventory evolution with radioactivedecay (high precision)...")
+        try:
+            inv = rd.InventoryHP({"U-238": 1.0})  # 1 Bq initial
+        except:
+            inv = rd.Inventory({"U-238": 1.0})
+    else:
+        print("Computing inventory evolution with radioactivedecay...")
         inv = rd.Inventory({"U-238": 1.0})
 
-    if HAS_NUMPY:
-        log_times = np.linspace(-5, 18, 500)
-    else:
-        log_times = [-5 + i * 23 / 499 for i in range(500)]
+    if log_times is None:
+        log_times = default_log_times()
 
     isotopes = [d["isotope"] for d in CHAIN_DATA]
     snapshots = []
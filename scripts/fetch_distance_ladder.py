@@ -5,20 +5,53 @@ Cosmic Distance Ladder Data Preprocessing
 Fetches and processes data for the four rungs:
 1. Parallax - Nearby stars from Gaia DR3
 2. Cepheids - Classical Cepheids from Gaia DR3 vari_cepheid
-3. Type Ia Supernovae - Simulated light curves using SALT2-like model
+3. Type Ia Supernovae - SALT2 light curves via sncosmo (template fallback)
 4. Hubble Flow - Cosmological calculations
 
 Output: JSON files for visualization
 """
 
+import argparse
+import hashlib
 import json
+import os
+import random
+import threading
+import time
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+from cosmology import luminosity_distance
+
 # Output directory
 OUTPUT_DIR = Path(__file__).parent.parent / "public" / "data" / "distance-ladder"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Local cache for Gaia archive results (one .npz of columns per query)
+CACHE_DIR = Path(os.environ.get("GAIA_CACHE_DIR",
+                                Path(__file__).parent.parent / ".cache" / "gaia"))
+
+# Gaia archive jobs
+GAIA_CONCURRENCY = 4   # async jobs in flight at once
+GAIA_RETRIES = 3       # per chunk, after the first attempt
+GAIA_BACKOFF_S = 5.0   # first retry delay, doubled each attempt
+GAIA_CHUNKS = 12       # source_id ranges for large queries (HEALPix level 0)
+
+# Gaia DR3 source_id = HEALPix level-12 index × 2^35 + extra bits
+SOURCE_ID_PER_HPX12 = 2 ** 35
+
+# Star names: cross-matched locally against a cached, source_id-sorted
+# copy of the identifier table instead of a per-row subquery on the server
+IDENT_TABLE = "gaiadr3.ident"
+IDENT_INDEX_PATH = CACHE_DIR / "ident_index.npz"
+IDENT_BATCH = 2000     # source_ids per IN (...) lookup query
+
+# SALT2 surfaces sampled from sncosmo, cached so later builds need neither the
+# model download nor sncosmo's per-object evaluation
+SALT2_CACHE_DIR = Path(os.environ.get("SALT2_CACHE_DIR",
+                                      Path(__file__).parent.parent / ".cache" / "salt2"))
+
 # Try imports, use fallbacks if not available
 try:
     from astroquery.gaia import Gaia
@@ -32,10 +65,312 @@ try:
     HAS_SNCOSMO = True
 except ImportError:
     HAS_SNCOSMO = False
-    print("sncosmo not installed, using synthetic supernova data")
+    print("sncosmo not installed, using template supernova light curves")
+
+
+# ─── GAIA QUERIES (async, chunked, cached) ───────────────
+def source_id_ranges(n_chunks=GAIA_CHUNKS):
+    """
+    Split the Gaia source_id space into n_chunks contiguous ranges.
 
+    Boundaries fall on HEALPix pixel edges (level 0 for 12 chunks, level 1 for
+    48, ...), so each range is a compact patch of sky the archive can scan
+    with its source_id index.
+    """
+    n_pixels = 12 * 4 ** 12
+    edges = np.linspace(0, n_pixels, n_chunks + 1).round().astype(np.int64)
+    return [(int(lo) * SOURCE_ID_PER_HPX12, int(hi) * SOURCE_ID_PER_HPX12 - 1)
+            for lo, hi in zip(edges[:-1], edges[1:])]
+
+
+def _gaia_cache_path(query):
+    """Cache file for one query, keyed by its whitespace-normalised ADQL text."""
+    key = " ".join(query.split())
+    return CACHE_DIR / f"{hashlib.sha256(key.encode()).hexdigest()[:24]}.npz"
+
+
+def _table_to_columns(table):
+    """astropy Table → {name: masked array}; strings become fixed-width unicode."""
+    columns = {}
+    for name in table.colnames:
+        col = np.ma.asarray(table[name])
+        if col.dtype.kind in "OSU":
+            col = np.ma.array(np.asarray(col.filled(""), dtype=str), mask=np.ma.getmaskarray(col))
+        columns[name] = col
+    return columns
+
+
+def _save_columns(path, columns):
+    """Columns → .npz (data + optional mask per column), written atomically."""
+    arrays = {}
+    for name, col in columns.items():
+        arrays[f"data__{name}"] = np.ma.getdata(col)
+        mask = np.ma.getmaskarray(col)
+        if mask.any():
+            arrays[f"mask__{name}"] = mask
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp, **arrays)
+    os.replace(tmp, path)
+
+
+def _load_columns(path):
+    with np.load(path, allow_pickle=False) as data:
+        names = [k[len("data__"):] for k in data.files if k.startswith("data__")]
+        return {
+            name: np.ma.array(data[f"data__{name}"],
+                              mask=data[f"mask__{name}"] if f"mask__{name}" in data.files else False)
+            for name in names
+        }
+
+
+def _concat_columns(parts):
+    names = list(parts[0]) if parts else []
+    return {name: np.ma.concatenate([p[name] for p in parts]) for name in names}
 
-def fetch_parallax_stars():
+
+def _run_gaia_job(query, label, retries=GAIA_RETRIES, backoff=GAIA_BACKOFF_S, refresh=False,
+                  cache=True):
+    """One async archive job, retried with backoff and (unless cache=False) cached by query text."""
+    path = _gaia_cache_path(query)
+    if cache and path.exists() and not refresh:
+        return _load_columns(path)
+    for attempt in range(retries + 1):
+        try:
+            start = time.perf_counter()
+            job = Gaia.launch_job_async(query)
+            columns = _table_to_columns(job.get_results())
+            break
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(1.0, 1.25)
+            print(f"  … {label}: {type(e).__name__} (retry {attempt + 1}/{retries} in {delay:.0f}s)")
+            time.sleep(delay)
+    if cache:
+        _save_columns(path, columns)
+    n = len(next(iter(columns.values()))) if columns else 0
+    print(f"  ✓ {label}: {n} rows in {time.perf_counter() - start:.1f}s")
+    return columns
+
+
+def iter_gaia_chunks(template, chunks, source_id_column="source_id",
+                     concurrency=GAIA_CONCURRENCY, refresh=False):
+    """
+    Yield the columns of each source_id-range chunk of a query, in order.
+
+    At most `concurrency` chunks are in flight or waiting to be consumed,
+    so a caller that reduces each chunk as it arrives holds a bounded
+    amount of data however large the full result is. See gaia_query for
+    the {source_id_range} placeholder and caching.
+    """
+    queries = [
+        template.replace("{source_id_range}", f"AND {source_id_column} BETWEEN {lo} AND {hi}")
+        for lo, hi in source_id_ranges(chunks)
+    ]
+    cached = sum(_gaia_cache_path(q).exists() for q in queries) if not refresh else 0
+    print(f"  {len(queries)} chunks, {cached} cached")
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        pending = []
+        for i, query in enumerate(queries):
+            pending.append(pool.submit(_run_gaia_job, query, f"chunk {i + 1}/{len(queries)}",
+                                       refresh=refresh))
+            if len(pending) >= concurrency:
+                yield pending.pop(0).result()
+        for future in pending:
+            yield future.result()
+
+
+def gaia_query(template, chunks=1, source_id_column="source_id", concurrency=GAIA_CONCURRENCY,
+               refresh=False):
+    """
+    Run an ADQL query as asynchronous archive jobs and return its columns.
+
+    `template` may contain {source_id_range}, which is replaced per chunk by
+    an AND-ed BETWEEN condition on source_id_column (so it must sit at the
+    end of a WHERE clause) and the query runs as `chunks` concurrent jobs
+    over disjoint source_id ranges. Every chunk is cached separately as .npz
+    columns keyed by its query text, so a failed run resumes where it
+    stopped and a complete re-run touches no network. Returns {name: masked
+    array}; chunk results are concatenated in source_id-range order
+    (re-sort client-side if the query's ORDER BY matters).
+    """
+    if chunks <= 1:
+        return _run_gaia_job(template.replace("{source_id_range}", ""), "query", refresh=refresh)
+    return _concat_columns(list(iter_gaia_chunks(template, chunks, source_id_column,
+                                                 concurrency, refresh)))
+
+
+# ─── STAR NAMES (local cross-match index) ───────────────
+def _load_ident_index(path=IDENT_INDEX_PATH):
+    """Cached (source_id, name) pairs sorted by source_id; name "" = looked up, none found."""
+    if not path.exists():
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=str)
+    columns = _load_columns(path)
+    return np.ma.getdata(columns['source_id']), np.ma.getdata(columns['name'])
+
+
+def _merge_ident(ids, names, new_ids, new_names):
+    """Union of two identifier sets, one entry per source_id, real names before blanks."""
+    ids = np.concatenate([ids, np.asarray(new_ids, dtype=np.int64)])
+    names = np.concatenate([names.astype(str), np.asarray(new_names, dtype=str)])
+    order = np.lexsort((names == "", ids))
+    ids, names = ids[order], names[order]
+    first = np.ones(len(ids), dtype=bool)
+    first[1:] = ids[1:] != ids[:-1]
+    return ids[first], names[first]
+
+
+def resolve_gaia_names(source_ids, refresh=False):
+    """
+    Names for an array of Gaia DR3 source_ids, falling back to "Gaia DR3 <id>".
+
+    Lookups go through a local index of the identifier table sorted by
+    source_id, the only on-disk store for names. Only ids the index has
+    never seen are fetched, in uncached batches of IDENT_BATCH, and merged
+    back in (ids with no name are kept as blanks so they are not asked for
+    again). The join itself is one searchsorted.
+    refresh re-fetches just the requested ids; the rest of the index is kept.
+    """
+    source_ids = np.asarray(np.ma.getdata(source_ids), dtype=np.int64)
+    ids, names = _load_ident_index()
+
+    wanted = np.unique(source_ids)
+    if refresh:
+        stale = np.isin(ids, wanted)
+        ids, names = ids[~stale], names[~stale]
+    missing = wanted[~np.isin(wanted, ids, assume_unique=True)]
+    if len(missing):
+        print(f"  Resolving {len(missing)} names ({len(wanted) - len(missing)} already indexed)...")
+        found_ids, found_names = [], []
+        for start in range(0, len(missing), IDENT_BATCH):
+            batch = missing[start:start + IDENT_BATCH]
+            query = (f"SELECT source_id, name FROM {IDENT_TABLE} "
+                     f"WHERE source_id IN ({', '.join(map(str, batch))})")
+            # The merged index below is the cache; no per-batch copy
+            columns = _run_gaia_job(query, f"names {start + 1}-{start + len(batch)}", cache=False)
+            if columns:
+                found_ids.append(np.ma.getdata(columns['source_id']))
+                found_names.append(np.ma.filled(columns['name'], ""))
+        new_ids = np.concatenate(found_ids + [missing])
+        new_names = np.concatenate(found_names + [np.full(len(missing), "")])
+        ids, names = _merge_ident(ids, names, new_ids, new_names)
+        _save_columns(IDENT_INDEX_PATH, {'source_id': ids, 'name': names})
+
+    if len(ids):
+        pos = np.minimum(np.searchsorted(ids, source_ids), len(ids) - 1)
+        resolved = np.where(ids[pos] == source_ids, names[pos], "")
+    else:
+        resolved = np.full(len(source_ids), "")
+    fallback = np.char.add("Gaia DR3 ", source_ids.astype(str))
+    return np.where(resolved != "", resolved, fallback)
+
+
+# ─── COLUMN PROCESSING ───────────────────────────────────
+PC_TO_LY = 3.26156
+MAX_DISTANCE_ERROR = 0.2   # fractional, σ_d / d = σ_ϖ / ϖ
+
+
+def _float_column(columns, name, fill=np.nan):
+    """Column as a float64 array with masked cells set to `fill`."""
+    return np.ma.filled(np.ma.asarray(columns[name]).astype(np.float64), fill)
+
+
+def parallax_distances(parallax_mas, parallax_error_mas):
+    """
+    Inverse-parallax distance and its first-order error, in parsecs.
+
+    Non-positive or missing parallaxes give NaN. Since σ_d / d = σ_ϖ / ϖ,
+    the fractional error doubles as the quality cut used by the callers.
+    """
+    with np.errstate(divide='ignore', invalid='ignore'):
+        plx = np.where(parallax_mas > 0, parallax_mas, np.nan)
+        distance_pc = 1000 / plx
+        distance_error_pc = distance_pc * parallax_error_mas / plx
+    return distance_pc, distance_error_pc
+
+
+def _records(fields):
+    """{key: array} → list of dicts, converting each column to Python scalars once."""
+    keys = list(fields)
+    values = [np.asarray(fields[k]).tolist() for k in keys]
+    return [dict(zip(keys, row)) for row in zip(*values)]
+
+
+def process_parallax_columns(columns):
+    """Gaia parallax-sample columns → parallax_stars.json records, one array op per field."""
+    plx = _float_column(columns, 'parallax')
+    plx_err = _float_column(columns, 'parallax_error')
+    mag_g = _float_column(columns, 'phot_g_mean_mag')
+    bp_rp = _float_column(columns, 'bp_rp')
+    distance_pc, distance_err = parallax_distances(plx, plx_err)
+
+    keep = (np.isfinite(distance_pc) & np.isfinite(mag_g) & np.isfinite(bp_rp)
+            & (distance_err <= MAX_DISTANCE_ERROR * distance_pc))
+    source_id = np.ma.getdata(columns['source_id'])[keep]
+    names = (np.ma.getdata(columns['name'])[keep] if 'name' in columns
+             else np.char.add("Gaia DR3 ", source_id.astype(str)))
+    distance_pc, distance_err = distance_pc[keep], distance_err[keep]
+
+    return _records({
+        'id': source_id.astype(str),
+        'name': names.astype(str),
+        'ra': _float_column(columns, 'ra')[keep],
+        'dec': _float_column(columns, 'dec')[keep],
+        'parallax_mas': plx[keep],
+        'parallax_error_mas': plx_err[keep],
+        'distance_pc': np.round(distance_pc, 3),
+        'distance_error_pc': np.round(distance_err, 3),
+        'distance_ly': np.round(distance_pc * PC_TO_LY, 3),
+        'mag_g': mag_g[keep],
+        'color_bp_rp': bp_rp[keep],
+    })
+
+
+def process_cepheid_columns(columns):
+    """
+    Gaia vari_cepheid columns → cepheids.json records, sorted by period.
+
+    Absolute magnitudes come from the inverse-parallax distance, with the
+    parallax error propagated as σ_M = (5 / ln 10) σ_ϖ / ϖ. Rows without a
+    positive parallax, magnitude or period, or with σ_ϖ / ϖ above
+    MAX_DISTANCE_ERROR, are dropped.
+    """
+    plx = _float_column(columns, 'parallax')
+    plx_err = _float_column(columns, 'parallax_error')
+    mag_g = _float_column(columns, 'phot_g_mean_mag')
+    period = _float_column(columns, 'pf')
+    distance_pc, distance_err = parallax_distances(plx, plx_err)
+
+    keep = (np.isfinite(distance_pc) & np.isfinite(mag_g) & (period > 0)
+            & (distance_err <= MAX_DISTANCE_ERROR * distance_pc))
+    keep = np.flatnonzero(keep)
+    keep = keep[np.argsort(period[keep], kind='stable')]
+
+    distance_pc = distance_pc[keep]
+    abs_mag = mag_g[keep] - 5 * np.log10(distance_pc / 10)
+    abs_mag_err = 5 / np.log(10) * distance_err[keep] / distance_pc
+    # Missing or zero amplitudes fall back to a typical DCEP G-band amplitude
+    amplitude = _float_column(columns, 'peak_to_peak_g', fill=0.0)[keep]
+    amplitude = np.where(amplitude > 0, amplitude, 0.5)
+
+    return _records({
+        'id': np.ma.getdata(columns['source_id'])[keep].astype(str),
+        'ra': _float_column(columns, 'ra')[keep],
+        'dec': _float_column(columns, 'dec')[keep],
+        'period_days': period[keep],
+        'log_period': np.log10(period[keep]),
+        'apparent_mag': mag_g[keep],
+        'absolute_mag': np.round(abs_mag, 3),
+        'absolute_mag_error': np.round(abs_mag_err, 3),
+        'parallax_mas': plx[keep],
+        'distance_pc': np.round(distance_pc, 1),
+        'distance_kpc': np.round(distance_pc / 1000, 3),
+        'amplitude': amplitude,
+    })
+
+
+def fetch_parallax_stars(refresh=False):
     """
     Fetch nearby stars with good parallax measurements from Gaia DR3.
     These demonstrate geometric parallax measurement.
@@ -52,12 +387,8 @@ def fetch_parallax_stars():
             parallax_error,
             parallax_over_error,
             phot_g_mean_mag,
-            bp_rp,
-            COALESCE(
-                (SELECT name FROM gaiadr3.ident WHERE gaiadr3.ident.source_id = g.source_id LIMIT 1),
-                CONCAT('Gaia DR3 ', g.source_id)
-            ) as name
-        FROM gaiadr3.gaia_source AS g
+            bp_rp
+        FROM gaiadr3.gaia_source
         WHERE parallax > 100
             AND parallax_over_error > 20
             AND phot_g_mean_mag < 10
@@ -65,25 +396,9 @@ def fetch_parallax_stars():
         ORDER BY parallax DESC
         """
         try:
-            job = Gaia.launch_job(query)
-            results = job.get_results()
-
-            stars = []
-            for row in results:
-                distance_pc = 1000 / row['parallax']  # parallax in mas
-                stars.append({
-                    'id': str(row['source_id']),
-                    'name': row['name'] if row['name'] else f"Gaia {row['source_id']}",
-                    'ra': float(row['ra']),
-                    'dec': float(row['dec']),
-                    'parallax_mas': float(row['parallax']),
-                    'parallax_error_mas': float(row['parallax_error']),
-                    'distance_pc': round(distance_pc, 3),
-                    'distance_ly': round(distance_pc * 3.26156, 3),
-                    'mag_g': float(row['phot_g_mean_mag']),
-                    'color_bp_rp': float(row['bp_rp']),
-                })
-            return stars
+            results = gaia_query(query, refresh=refresh)
+            results['name'] = np.ma.array(resolve_gaia_names(results['source_id'], refresh))
+            return process_parallax_columns(results)
         except Exception as e:
             print(f"Gaia query failed: {e}, using synthetic data")
 
@@ -125,7 +440,8 @@ def fetch_parallax_stars():
             'parallax_mas': star['parallax_mas'],
             'parallax_error_mas': star['parallax_mas'] * 0.001,  # Very small error for nearby stars
             'distance_pc': round(distance_pc, 3),
-            'distance_ly': round(distance_pc * 3.26156, 3),
+            'distance_error_pc': round(distance_pc * 0.001, 3),
+            'distance_ly': round(distance_pc * PC_TO_LY, 3),
             'mag_g': star['mag_g'],
             'color_bp_rp': star['color'],
         })
@@ -142,7 +458,8 @@ def fetch_parallax_stars():
             'parallax_mas': round(parallax, 2),
             'parallax_error_mas': round(parallax * 0.01, 3),
             'distance_pc': round(distance_pc, 3),
-            'distance_ly': round(distance_pc * 3.26156, 3),
+            'distance_error_pc': round(distance_pc * 0.01, 3),
+            'distance_ly': round(distance_pc * PC_TO_LY, 3),
             'mag_g': round(np.random.uniform(4, 12), 2),
             'color_bp_rp': round(np.random.uniform(-0.5, 3.5), 2),
         })
@@ -150,7 +467,7 @@ def fetch_parallax_stars():
     return stars
 
 
-def fetch_cepheids():
+def fetch_cepheids(refresh=False, chunks=GAIA_CHUNKS, concurrency=GAIA_CONCURRENCY):
     """
     Fetch classical Cepheid variables from Gaia DR3.
     These demonstrate the Period-Luminosity relation.
@@ -176,35 +493,12 @@ def fetch_cepheids():
             AND g.parallax_error / g.parallax < 0.2
             AND v.pf > 1
             AND v.pf < 100
-        ORDER BY v.pf
+            {source_id_range}
         """
         try:
-            job = Gaia.launch_job(query)
-            results = job.get_results()
-
-            cepheids = []
-            for row in results:
-                if row['parallax'] <= 0:
-                    continue
-
-                distance_pc = 1000 / row['parallax']
-                # Absolute magnitude
-                abs_mag = row['phot_g_mean_mag'] - 5 * np.log10(distance_pc / 10)
-
-                cepheids.append({
-                    'id': str(row['source_id']),
-                    'ra': float(row['ra']),
-                    'dec': float(row['dec']),
-                    'period_days': float(row['pf']),
-                    'log_period': float(np.log10(row['pf'])),
-                    'apparent_mag': float(row['phot_g_mean_mag']),
-                    'absolute_mag': round(float(abs_mag), 3),
-                    'parallax_mas': float(row['parallax']),
-                    'distance_pc': round(distance_pc, 1),
-                    'distance_kpc': round(distance_pc / 1000, 3),
-                    'amplitude': float(row['peak_to_peak_g']) if row['peak_to_peak_g'] else 0.5,
-                })
-            return cepheids
+            results = gaia_query(query, chunks, source_id_column="v.source_id",
+                                 concurrency=concurrency, refresh=refresh)
+            return process_cepheid_columns(results)
         except Exception as e:
             print(f"Gaia Cepheid query failed: {e}, using synthetic data")
 
@@ -284,33 +578,234 @@ def fetch_cepheids():
     return cepheids
 
 
-def generate_cepheid_lightcurve(period, amplitude, mean_mag, num_points=100):
-    """Generate a realistic Cepheid light curve shape."""
+# ─── LIGHT CURVES (batched) ──────────────────────────────
+CEPHEID_LC_POINTS = 100   # samples over two pulsation cycles
+SN_LC_POINTS = 60         # samples from -20 to +60 days
+LC_MAG_STEP = 0.001       # quantization step of the binary export (JSON rounds to 1 mmag too)
+
+
+def cepheid_lightcurves(amplitudes, mean_mags, num_points=CEPHEID_LC_POINTS):
+    """
+    Light curves for many Cepheids at once on a shared phase axis.
+
+    Returns (phases, mags) with mags shaped (n_cepheids, num_points). The
+    shape is a fast sinusoidal rise over the first 15% of the cycle and a
+    slow cosine decline over the rest, scaled by each star's amplitude.
+    """
+    amplitudes = np.asarray(amplitudes, dtype=np.float64)[:, None]
+    mean_mags = np.asarray(mean_mags, dtype=np.float64)[:, None]
     phases = np.linspace(0, 2, num_points)  # Two full cycles
 
     # Cepheid light curves have characteristic asymmetric shape
     # Fast rise, slow decline
     rise_time = 0.15  # Fraction of period for rise
+    p = phases % 1.0
+    shape = np.where(
+        p < rise_time,
+        0.5 * (1 + np.sin(np.pi * p / rise_time - np.pi / 2)),
+        0.5 * (1 + np.cos(np.pi * (p - rise_time) / (1 - rise_time))),
+    )
 
-    light_curve = []
-    for phase in phases:
-        p = phase % 1.0
-        if p < rise_time:
-            # Fast rise (roughly sinusoidal)
-            brightness = amplitude * 0.5 * (1 + np.sin(np.pi * p / rise_time - np.pi/2))
-        else:
-            # Slow decline
-            decline_phase = (p - rise_time) / (1 - rise_time)
-            brightness = amplitude * 0.5 * (1 + np.cos(np.pi * decline_phase))
-
-        # Convert to magnitude (brighter = lower magnitude)
-        mag = mean_mag - brightness + amplitude/2
-        light_curve.append({
-            'phase': round(phase, 4),
-            'mag': round(mag, 3),
-        })
+    # Convert to magnitude (brighter = lower magnitude)
+    return phases, mean_mags - amplitudes * shape + amplitudes / 2
+
+
+def template_sn_lightcurves(peak_mags, x1, c_salt, num_points=SN_LC_POINTS):
+    """
+    Template Type Ia light curves for many supernovae at once on a shared day axis.
+
+    Returns (days, mags) with mags shaped (n_sne, num_points), days relative
+    to peak. x1 is accepted for the SALT2 path's signature; the template
+    itself does not stretch.
+    """
+    peak_mags = np.asarray(peak_mags, dtype=np.float64)[:, None]
+    c_salt = np.asarray(c_salt, dtype=np.float64)[:, None]
+    days = np.linspace(-20, 60, num_points)
+
+    relative_mag = np.where(
+        days < 0,
+        # Rising phase (approximately exponential)
+        2.5 * np.log10(1 + np.exp((days + 15) / 3)),
+        # Declining phase: initial fast decline, then secondary linear decline
+        np.where(days < 30, 0.1 * days, 3.0 + 0.015 * (days - 30)),
+    )
+
+    # Color correction
+    return days, peak_mags + relative_mag + c_salt * 0.5
+
+
+# ─── SALT2 (sncosmo, cached surfaces) ────────────────────
+SALT2_SOURCE = "salt2"
+SALT2_BAND = "bessellb"    # rest-frame B, the band peak_mag is quoted in
+SALT2_WAVE_STEP = 10.0     # Å
+SALT2_BUDGET_S = 30.0      # max wait for a first-time surface build before using the template
+SALT2_FLUX_FLOOR = 1e-6    # of each curve's peak (15 mag); M0 + x1·M1 dips below 0 at the edges
+
+
+def _salt2_cache_path():
+    return SALT2_CACHE_DIR / f"{SALT2_SOURCE}_{SALT2_BAND}.npz"
+
+
+def build_salt2_surfaces():
+    """
+    Sample the SALT2 M0/M1 surfaces and colour law over the band with sncosmo.
+
+    Stores, on a 1-day phase grid and SALT2_WAVE_STEP wavelength grid, the
+    two spectral components, CL(λ) and the photon-counting band weights
+    T(λ) λ dλ, so a band flux is one matrix product per component.
+    """
+    source = sncosmo.get_source(SALT2_SOURCE)
+    band = sncosmo.get_bandpass(SALT2_BAND)
+    phase = np.arange(np.ceil(source.minphase()), np.floor(source.maxphase()) + 1, 1.0)
+    wave = np.arange(max(band.minwave(), source.minwave()),
+                     min(band.maxwave(), source.maxwave()), SALT2_WAVE_STEP)
+
+    source.set(x0=1.0, x1=0.0, c=0.0)
+    m0 = source.flux(phase, wave)
+    source.set(x1=1.0)
+    m1 = source.flux(phase, wave) - m0
+
+    surfaces = {
+        'phase': phase,
+        'wave': wave,
+        'm0': m0,
+        'm1': m1,
+        'colorlaw': source.colorlaw(wave),
+        'band_weight': band(wave) * wave * SALT2_WAVE_STEP,
+        'version': np.array(str(source.version)),
+    }
+    path = _salt2_cache_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp, **surfaces)
+    os.replace(tmp, path)
+    return surfaces
+
+
+def load_salt2_surfaces(budget_s=SALT2_BUDGET_S, refresh=False):
+    """
+    Cached SALT2 surfaces, building them with sncosmo on first use.
+
+    The build (which may download the model) runs in a daemon thread and is
+    abandoned after budget_s so the ladder build stays fast; returns None in
+    that case, or when neither a cache nor sncosmo is available.
+    """
+    path = _salt2_cache_path()
+    if path.exists() and not refresh:
+        with np.load(path, allow_pickle=False) as data:
+            return {k: data[k] for k in data.files}
+    if not HAS_SNCOSMO:
+        return None
+
+    result = {}
+
+    def build():
+        try:
+            result['surfaces'] = build_salt2_surfaces()
+        except Exception as e:
+            result['error'] = e
+
+    start = time.perf_counter()
+    worker = threading.Thread(target=build, daemon=True)
+    worker.start()
+    worker.join(budget_s)
+    if worker.is_alive():
+        print(f"  SALT2 surfaces not ready after {budget_s:.0f}s, using template light curves")
+        return None
+    if 'error' in result:
+        print(f"  SALT2 surface build failed: {result['error']}, using template light curves")
+        return None
+    print(f"  ✓ SALT2 surfaces built in {time.perf_counter() - start:.1f}s ({path.name})")
+    return result['surfaces']
+
+
+def salt2_lightcurves(peak_mags, x1, c_salt, surfaces, num_points=SN_LC_POINTS):
+    """
+    Rest-frame B light curves for many supernovae from cached SALT2 surfaces.
+
+    Band flux F = x0 Σ_λ (M0 + x1 M1) 10^(-0.4 c CL) w is evaluated for all
+    objects as two (n_sne × n_wave) @ (n_wave × n_phase) products, converted
+    to magnitudes relative to each curve's maximum (floored at
+    SALT2_FLUX_FLOOR of it) and offset to peak_mag.
+    Days past the model's last phase continue that curve's final 10-day
+    slope. Returns (days, mags) like template_sn_lightcurves.
+    """
+    peak_mags = np.asarray(peak_mags, dtype=np.float64)[:, None]
+    x1 = np.asarray(x1, dtype=np.float64)[:, None]
+    c_salt = np.asarray(c_salt, dtype=np.float64)[:, None]
+    days = np.linspace(-20, 60, num_points)
+
+    phase = surfaces['phase']
+    weights = 10 ** (-0.4 * c_salt * surfaces['colorlaw']) * surfaces['band_weight']
+    flux = weights @ surfaces['m0'].T + x1 * (weights @ surfaces['m1'].T)
+    peak = flux.max(axis=1, keepdims=True)
+    flux = np.maximum(flux, SALT2_FLUX_FLOOR * peak)
+    relative_mag = -2.5 * np.log10(flux / peak)
+
+    # Shared linear-interpolation weights for every row
+    clipped = np.clip(days, phase[0], phase[-1])
+    hi = np.clip(np.searchsorted(phase, clipped), 1, len(phase) - 1)
+    frac = (clipped - phase[hi - 1]) / (phase[hi] - phase[hi - 1])
+    mags = relative_mag[:, hi - 1] * (1 - frac) + relative_mag[:, hi] * frac
+
+    tail = min(10, len(phase) - 1)
+    slope = (relative_mag[:, -1] - relative_mag[:, -1 - tail]) / (phase[-1] - phase[-1 - tail])
+    mags += slope[:, None] * np.maximum(days - phase[-1], 0)
+    return days, peak_mags + mags
+
+
+def sn_lightcurves(peak_mags, x1, c_salt, num_points=SN_LC_POINTS, surfaces=None):
+    """SALT2 light curves when surfaces are available, otherwise the template."""
+    if surfaces is not None:
+        return salt2_lightcurves(peak_mags, x1, c_salt, surfaces, num_points)
+    return template_sn_lightcurves(peak_mags, x1, c_salt, num_points)
+
+
+def generate_cepheid_lightcurve(period, amplitude, mean_mag, num_points=CEPHEID_LC_POINTS):
+    """Generate a realistic Cepheid light curve shape."""
+    phases, mags = cepheid_lightcurves([amplitude], [mean_mag], num_points)
+    return [{'phase': round(p, 4), 'mag': round(m, 3)}
+            for p, m in zip(phases.tolist(), mags[0].tolist())]
 
-    return light_curve
+
+def export_lightcurves(name, axis_name, axis, mags, ref_mags, ids, output_dir=OUTPUT_DIR):
+    """
+    Write <name>.bin + <name>_index.json for a batch of light curves.
+
+    Row i of the int16 (n_objects × n_samples) array is
+    ref_mags[i] + value × mag_step; all rows share the axis, which the index
+    stores as linspace parameters. Offsets beyond the int16 range (±32.767
+    mag) are clipped to it rather than left to wrap.
+    """
+    ref_mags = np.round(np.asarray(ref_mags, dtype=np.float64), 3)
+    steps = np.round((mags - ref_mags[:, None]) / LC_MAG_STEP)
+    info = np.iinfo(np.int16)
+    out_of_range = np.count_nonzero(~((steps >= info.min) & (steps <= info.max)))
+    if out_of_range:
+        print(f"  {name}: {out_of_range} samples outside ±{info.max * LC_MAG_STEP:g} mag "
+              f"of their reference, clipped")
+    quantized = np.clip(np.nan_to_num(steps), info.min, info.max).astype("<i2")
+    with open(output_dir / f"{name}.bin", "wb") as f:
+        f.write(quantized.tobytes())
+    with open(output_dir / f"{name}_index.json", "w") as f:
+        json.dump({
+            "dtype": "int16",
+            "shape": list(quantized.shape),
+            "mag_step": LC_MAG_STEP,
+            "axis": {"name": axis_name, "start": float(axis[0]), "stop": float(axis[-1]),
+                     "n": len(axis)},
+            "ids": list(ids),
+            "ref_mag": ref_mags.tolist(),
+        }, f)
+    print(f"  ✓ {name}.bin ({quantized.shape[0]} curves × {quantized.shape[1]} samples, "
+          f"{quantized.nbytes / 1e3:.0f} kB)")
+
+
+# Type Ia standardization (Tripp): μ = m_B - M_B + α x1 - β c
+SN_M_B = -19.3        # M_B ≈ -19.3 ± 0.1 after standardization
+SN_ALPHA = 0.14
+SN_BETA = 3.1
+SN_SIGMA_INT = 0.15   # intrinsic scatter, mag
 
 
 def generate_supernovae():
@@ -322,10 +817,6 @@ def generate_supernovae():
 
     np.random.seed(44)
 
-    # Absolute magnitude of Type Ia SNe (after standardization)
-    # M_B ≈ -19.3 ± 0.1
-    M_Ia = -19.3
-
     supernovae = []
 
     # Generate SNe at various redshifts
@@ -344,35 +835,19 @@ def generate_supernovae():
         {'name': 'SN 2014J', 'z': 0.00068, 'host': 'M82'},
     ]
 
-    for i, z in enumerate(redshifts):
-        # Luminosity distance (simplified flat ΛCDM)
-        H0 = 70  # km/s/Mpc
-        c = 299792.458  # km/s
-
-        # Approximate luminosity distance for flat ΛCDM
-        # D_L ≈ (c/H0) * z * (1 + z/2) for low z
-        if z < 0.3:
-            d_L_Mpc = (c / H0) * z * (1 + 0.5 * z)
-        else:
-            # More accurate for higher z
-            Omega_m = 0.3
-            Omega_L = 0.7
-            # Simplified integral
-            d_L_Mpc = (c / H0) * z * (1 + z) * (1 - 0.5 * Omega_m * z)
+    # Luminosity distance and distance modulus for all SNe at once (flat ΛCDM, H0 = 70)
+    d_L_all = luminosity_distance(redshifts)
+    mu_all = 5 * np.log10(d_L_all * 1e6 / 10)  # Convert Mpc to pc
 
-        # Distance modulus
-        mu = 5 * np.log10(d_L_Mpc * 1e6 / 10)  # Convert Mpc to pc
+    for i, z in enumerate(redshifts):
+        d_L_Mpc, mu = d_L_all[i], mu_all[i]
 
         # SALT2-like parameters
         x1 = np.random.normal(0, 1)  # Stretch parameter
         c_salt = np.random.normal(0, 0.1)  # Color
 
-        # Standardization corrections
-        alpha = 0.14
-        beta = 3.1
-
         # Apparent magnitude at peak
-        m_B = M_Ia + mu - alpha * x1 + beta * c_salt + np.random.normal(0, 0.15)
+        m_B = SN_M_B + mu - SN_ALPHA * x1 + SN_BETA * c_salt + np.random.normal(0, SN_SIGMA_INT)
 
         # Host galaxy mass (for mass step)
         log_host_mass = np.random.uniform(8, 12)
@@ -391,11 +866,10 @@ def generate_supernovae():
         })
 
     # Add famous SNe
+    famous_d_L = luminosity_distance([sn['z'] for sn in famous_sne])
     for i, sn in enumerate(famous_sne):
         z = sn['z']
-        H0 = 70
-        c = 299792.458
-        d_L_Mpc = (c / H0) * z * (1 + 0.5 * z)
+        d_L_Mpc = famous_d_L[i]
         mu = 5 * np.log10(d_L_Mpc * 1e6 / 10)
 
         supernovae.append({
@@ -405,7 +879,7 @@ def generate_supernovae():
             'redshift': z,
             'distance_Mpc': round(d_L_Mpc, 2),
             'mu': round(mu, 3),
-            'peak_mag': round(M_Ia + mu, 3),
+            'peak_mag': round(SN_M_B + mu, 3),
             'x1': round(np.random.normal(0, 0.5), 3),
             'c': round(np.random.normal(0, 0.05), 3),
             'log_host_mass': 10.5,
@@ -417,56 +891,115 @@ def generate_supernovae():
     return supernovae
 
 
-def generate_sn_lightcurve(peak_mag, x1, c_salt, num_points=60):
+def generate_sn_lightcurve(peak_mag, x1, c_salt, num_points=SN_LC_POINTS, surfaces=None):
     """
-    Generate a Type Ia supernova light curve using SALT2-like template.
+    Generate a Type Ia supernova light curve (SALT2 if surfaces are given, else the template).
     """
-    # Time in days relative to peak
-    times = np.linspace(-20, 60, num_points)
+    days, mags = sn_lightcurves([peak_mag], [x1], [c_salt], num_points, surfaces)
+    return [{'day': round(t, 1), 'mag': round(m, 3)}
+            for t, m in zip(days.tolist(), mags[0].tolist())]
 
-    # SALT2-like template (simplified)
-    # Rise time depends on stretch
-    rise_time = 17 * (1 + 0.1 * x1)  # ~17 days for normal
-    decay_time = 40 * (1 + 0.1 * x1)  # Longer decay
 
-    light_curve = []
-    for t in times:
-        if t < 0:
-            # Rising phase (approximately exponential)
-            relative_mag = 2.5 * np.log10(1 + np.exp((t + 15) / 3))
-        else:
-            # Declining phase (approximately linear in mag, with break)
-            if t < 30:
-                # Initial fast decline
-                relative_mag = 0.1 * t
-            else:
-                # Secondary linear decline
-                relative_mag = 3.0 + 0.015 * (t - 30)
-
-        # Color correction
-        relative_mag += c_salt * 0.5
-
-        mag = peak_mag + relative_mag
-        light_curve.append({
-            'day': round(t, 1),
-            'mag': round(mag, 3),
-        })
+# ─── H0 FITS ─────────────────────────────────────────────
+H0_PLANCK = 67.4          # Planck 2018 CMB
+H0_PLANCK_ERR = 0.5
+H0_SHOES = 73.04          # SH0ES (Cepheid-calibrated SNe Ia)
+H0_SHOES_ERR = 1.04
+H0_BOOTSTRAP = 100_000    # resamples per fit
+H0_BOOTSTRAP_CHUNK = 25_000
+SN_HUBBLE_FLOW_ZMIN = 0.01
 
-    return light_curve
 
+def _bootstrap_sums(weights, n_boot=H0_BOOTSTRAP, seed=0, chunk=H0_BOOTSTRAP_CHUNK):
+    """
+    Bootstrap resampled sums of each column of `weights` (n_points × k).
 
-def generate_hubble_diagram():
+    Each resample is a row of multinomial counts, so all resampled sums in a
+    chunk are one (chunk × n) @ (n × k) product. Returns (n_boot, k).
+    """
+    n = weights.shape[0]
+    rng = np.random.default_rng(seed)
+    out = []
+    for start in range(0, n_boot, chunk):
+        counts = rng.multinomial(n, np.full(n, 1 / n), size=min(chunk, n_boot - start))
+        out.append(counts @ weights)
+    return np.concatenate(out)
+
+
+def _fit_summary(h0, h0_err, samples, n):
+    lo, med, hi = np.percentile(samples, [15.865, 50, 84.135])
+    return {
+        'H0': round(float(h0), 3),
+        'H0_err': round(float(np.std(samples)), 3),
+        'H0_err_wls': round(float(h0_err), 3),
+        'H0_median': round(float(med), 3),
+        'H0_68': [round(float(lo), 3), round(float(hi), 3)],
+        'n_points': int(n),
+        'n_bootstrap': len(samples),
+        'tension_planck_sigma': round(tension_sigma(h0, np.std(samples), H0_PLANCK, H0_PLANCK_ERR), 2),
+    }
+
+
+def tension_sigma(h0_a, err_a, h0_b, err_b):
+    """Gaussian tension |a - b| / sqrt(σa² + σb²)."""
+    return float(abs(h0_a - h0_b) / np.hypot(err_a, err_b))
+
+
+def fit_h0_hubble_flow(velocity, distance, distance_err, n_boot=H0_BOOTSTRAP, seed=0):
+    """
+    H0 from (v, d ± σd) points: weighted least squares for d = v / H0
+    through the origin, plus a bootstrap over the points.
+    """
+    v, d = np.asarray(velocity, dtype=np.float64), np.asarray(distance, dtype=np.float64)
+    w = 1 / np.asarray(distance_err, dtype=np.float64) ** 2
+    sxy, sxx = np.sum(w * v * d), np.sum(w * v * v)
+    slope, slope_err = sxy / sxx, 1 / np.sqrt(sxx)
+    h0, h0_err = 1 / slope, slope_err / slope ** 2
+
+    sums = _bootstrap_sums(np.column_stack([w * v * d, w * v * v]), n_boot, seed)
+    return _fit_summary(h0, h0_err, sums[:, 1] / sums[:, 0], len(v))
+
+
+def fit_h0_supernovae(supernovae, n_boot=H0_BOOTSTRAP, seed=1):
+    """
+    H0 from standardized SN Ia distance moduli against the ΛCDM prediction.
+
+    μ_obs = m_B - M_B + α x1 - β c with M_B fixed by the Cepheid rung, so
+    μ_obs - μ(z; H0) is a constant offset whose weighted mean a gives
+    H0 = H0_ref · 10^(-a/5). Featured (nearby, unstandardized) SNe and
+    z < SN_HUBBLE_FLOW_ZMIN are left out.
+    """
+    sample = [sn for sn in supernovae
+              if not sn.get('featured') and sn['redshift'] >= SN_HUBBLE_FLOW_ZMIN]
+    z = np.array([sn['redshift'] for sn in sample])
+    mu_obs = (np.array([sn['peak_mag'] for sn in sample]) - SN_M_B
+              + SN_ALPHA * np.array([sn['x1'] for sn in sample])
+              - SN_BETA * np.array([sn['c'] for sn in sample]))
+    h0_ref = 70.0
+    offset = mu_obs - 5 * np.log10(luminosity_distance(z, h0_ref) * 1e6 / 10)
+    w = np.full(len(z), 1 / SN_SIGMA_INT ** 2)
+
+    a, a_err = np.sum(w * offset) / np.sum(w), 1 / np.sqrt(np.sum(w))
+    h0 = h0_ref * 10 ** (-a / 5)
+    h0_err = h0 * np.log(10) / 5 * a_err
+
+    sums = _bootstrap_sums(np.column_stack([w * offset, w]), n_boot, seed)
+    return _fit_summary(h0, h0_err, h0_ref * 10 ** (-(sums[:, 0] / sums[:, 1]) / 5), len(z))
+
+
+def generate_hubble_diagram(supernovae=()):
     """
     Generate Hubble diagram data showing the expansion of the universe
-    and the Hubble tension.
+    and the Hubble tension, with H0 fitted to the observed points and to
+    the supernova sample.
     """
     print("Generating Hubble diagram data...")
 
     np.random.seed(45)
 
     # Two H0 measurements to illustrate tension
-    H0_shoes = 73.04  # SH0ES (Cepheid-calibrated SNe Ia)
-    H0_planck = 67.4  # Planck CMB
+    H0_shoes = H0_SHOES
+    H0_planck = H0_PLANCK
 
     c = 299792.458  # km/s
 
@@ -518,111 +1051,195 @@ def generate_hubble_diagram():
             'd_err': round(distance * 0.07, 2),  # ~7% uncertainty
         })
 
+    start = time.perf_counter()
+    fits = {
+        'hubble_flow': fit_h0_hubble_flow(
+            [p['v'] for p in observed_points],
+            [p['d_Mpc'] for p in observed_points],
+            [p['d_err'] for p in observed_points],
+        ),
+    }
+    if supernovae:
+        fits['supernovae'] = fit_h0_supernovae(supernovae)
+    for name, fit in fits.items():
+        print(f"  H0 ({name}): {fit['H0']:.2f} ± {fit['H0_err']:.2f} km/s/Mpc "
+              f"({fit['n_points']} points, {fit['tension_planck_sigma']:.1f}σ from Planck)")
+    print(f"  Fits + {H0_BOOTSTRAP:,}-resample bootstraps in {time.perf_counter() - start:.2f}s")
+
     return {
         'models': hubble_data,
         'observations': observed_points,
         'H0_shoes': H0_shoes,
         'H0_planck': H0_planck,
-        'H0_shoes_err': 1.04,
-        'H0_planck_err': 0.5,
-        'tension_sigma': 4.4,  # ~4.4σ tension
+        'H0_shoes_err': H0_SHOES_ERR,
+        'H0_planck_err': H0_PLANCK_ERR,
+        # Between the two plotted values, so the label matches the bars it sits by
+        'tension_sigma': round(tension_sigma(H0_SHOES, H0_SHOES_ERR, H0_PLANCK, H0_PLANCK_ERR), 2),
+        # Ladder (SN) fit against Planck; the Hubble-flow fit if there are no SNe
+        'tension_sigma_fit': fits.get('supernovae', fits['hubble_flow'])['tension_planck_sigma'],
+        'fits': fits,
     }
 
 
-def generate_redshift_spectrum():
+# ─── REDSHIFT SPECTRA ────────────────────────────────────
+# Rest-frame wavelengths of key spectral features (in Angstroms)
+SPECTRAL_LINES = {
+    'Ca_K': {'wavelength': 3934, 'type': 'absorption', 'name': 'Ca K'},
+    'Ca_H': {'wavelength': 3969, 'type': 'absorption', 'name': 'Ca H'},
+    'H_delta': {'wavelength': 4102, 'type': 'absorption', 'name': 'Hδ'},
+    'H_gamma': {'wavelength': 4341, 'type': 'absorption', 'name': 'Hγ'},
+    'H_beta': {'wavelength': 4861, 'type': 'absorption', 'name': 'Hβ'},
+    'O_III_1': {'wavelength': 4959, 'type': 'emission', 'name': '[O III]'},
+    'O_III_2': {'wavelength': 5007, 'type': 'emission', 'name': '[O III]'},
+    'Mg_b': {'wavelength': 5175, 'type': 'absorption', 'name': 'Mg b'},
+    'Na_D': {'wavelength': 5893, 'type': 'absorption', 'name': 'Na D'},
+    'H_alpha': {'wavelength': 6563, 'type': 'both', 'name': 'Hα'},
+}
+
+# Line depth/height as a fraction of the local continuum
+LINE_STRENGTH = {'absorption': -0.2, 'emission': 0.3, 'both': 0.3}
+
+SPECTRUM_WAVE_RANGE = (3500.0, 7500.0)   # observed-frame window, Å
+SPECTRUM_POINTS = 1000
+SPECTRUM_LINE_SIGMA = 5.0                # rest-frame Gaussian width, Å
+SPECTRUM_CONTINUUM = {'amplitude': 100.0, 'pivot': 5500.0, 'index': -0.5}
+
+# Observed-frame noise, exported as int8 multiples of SPECTRUM_NOISE_STEP
+SPECTRUM_NOISE_SIGMA = 2.0
+SPECTRUM_NOISE_STEP = SPECTRUM_NOISE_SIGMA / 32
+SPECTRUM_NOISE_SEED = 46
+
+
+def spectrum_wavelengths():
+    return np.linspace(*SPECTRUM_WAVE_RANGE, SPECTRUM_POINTS)
+
+
+def spectrum_continuum(wavelengths):
+    """Simple power-law continuum."""
+    c = SPECTRUM_CONTINUUM
+    return c['amplitude'] * (np.asarray(wavelengths) / c['pivot']) ** c['index']
+
+
+def spectrum_noise(n=SPECTRUM_POINTS, seed=SPECTRUM_NOISE_SEED):
+    """Gaussian noise quantized to int8 steps; returns (int8 values, flux noise)."""
+    rng = np.random.default_rng(seed)
+    steps = np.clip(np.round(rng.normal(0, SPECTRUM_NOISE_SIGMA, n) / SPECTRUM_NOISE_STEP), -127, 127)
+    steps = steps.astype(np.int8)
+    return steps, steps * SPECTRUM_NOISE_STEP
+
+
+def redshift_spectra(redshifts, wavelengths=None, noise=None):
     """
-    Generate a template galaxy spectrum showing absorption/emission lines
-    at various redshifts.
+    Observed spectra for an array of redshifts in one broadcasted pass.
+
+    Every line is a Gaussian at λ_rest (1 + z), broadened to
+    SPECTRUM_LINE_SIGMA (1 + z), scaled by LINE_STRENGTH times the
+    continuum at its observed wavelength, and dropped when it falls outside
+    the window. Returns flux shaped (n_z, n_wavelengths); noise, if given,
+    is added to every row (it lives in the observed frame).
     """
-    print("Generating redshift spectrum data...")
+    wavelengths = spectrum_wavelengths() if wavelengths is None else np.asarray(wavelengths)
+    z = np.atleast_1d(np.asarray(redshifts, dtype=np.float64))[:, None]
+    rest = np.array([line['wavelength'] for line in SPECTRAL_LINES.values()], dtype=np.float64)
+    strength = np.array([LINE_STRENGTH[line['type']] for line in SPECTRAL_LINES.values()])
+
+    observed = rest * (1 + z)                                              # (n_z, n_lines)
+    in_window = (observed > wavelengths[0]) & (observed < wavelengths[-1])
+    amplitude = np.where(in_window, strength * spectrum_continuum(observed), 0.0)
+    sigma = SPECTRUM_LINE_SIGMA * (1 + z)[:, :, None]
+    profiles = np.exp(-0.5 * ((wavelengths - observed[:, :, None]) / sigma) ** 2)
+
+    flux = spectrum_continuum(wavelengths) + np.einsum('zl,zlw->zw', amplitude, profiles)
+    if noise is not None:
+        flux += noise
+    return flux
 
-    # Rest-frame wavelengths of key spectral features (in Angstroms)
-    spectral_lines = {
-        'Ca_K': {'wavelength': 3934, 'type': 'absorption', 'name': 'Ca K'},
-        'Ca_H': {'wavelength': 3969, 'type': 'absorption', 'name': 'Ca H'},
-        'H_delta': {'wavelength': 4102, 'type': 'absorption', 'name': 'Hδ'},
-        'H_gamma': {'wavelength': 4341, 'type': 'absorption', 'name': 'Hγ'},
-        'H_beta': {'wavelength': 4861, 'type': 'absorption', 'name': 'Hβ'},
-        'O_III_1': {'wavelength': 4959, 'type': 'emission', 'name': '[O III]'},
-        'O_III_2': {'wavelength': 5007, 'type': 'emission', 'name': '[O III]'},
-        'Mg_b': {'wavelength': 5175, 'type': 'absorption', 'name': 'Mg b'},
-        'Na_D': {'wavelength': 5893, 'type': 'absorption', 'name': 'Na D'},
-        'H_alpha': {'wavelength': 6563, 'type': 'both', 'name': 'Hα'},
-    }
 
-    # Generate a template spectrum
-    wavelengths = np.linspace(3500, 7500, 1000)
-
-    def generate_spectrum_at_z(z):
-        """Generate a spectrum at a given redshift."""
-        # Continuum (simple power law)
-        continuum = 100 * (wavelengths / 5500) ** (-0.5)
-
-        flux = continuum.copy()
-
-        # Add spectral features
-        line_positions = []
-        for line_id, line in spectral_lines.items():
-            observed_lambda = line['wavelength'] * (1 + z)
-
-            if 3500 < observed_lambda < 7500:
-                # Gaussian profile
-                sigma = 5 * (1 + z)  # Broadened by redshift
-
-                if line['type'] == 'absorption':
-                    depth = 0.2 * continuum[np.argmin(np.abs(wavelengths - observed_lambda))]
-                    flux -= depth * np.exp(-0.5 * ((wavelengths - observed_lambda) / sigma) ** 2)
-                else:
-                    strength = 0.3 * continuum[np.argmin(np.abs(wavelengths - observed_lambda))]
-                    flux += strength * np.exp(-0.5 * ((wavelengths - observed_lambda) / sigma) ** 2)
-
-                line_positions.append({
-                    'id': line_id,
-                    'name': line['name'],
-                    'rest_wavelength': line['wavelength'],
-                    'observed_wavelength': round(observed_lambda, 1),
-                    'type': line['type'],
-                })
-
-        # Add noise
-        noise = np.random.normal(0, 2, len(flux))
-        flux += noise
+def generate_redshift_spectrum():
+    """
+    Export a rest-frame template galaxy spectrum, its line list and a noise
+    vector, from which the viewer can rebuild the spectrum at any redshift
+    (see redshift_spectra), plus the z = 0 spectrum it draws today.
+    """
+    print("Generating redshift spectrum data...")
 
-        return {
-            'wavelengths': wavelengths.tolist(),
-            'flux': flux.tolist(),
-            'lines': line_positions,
+    wavelengths = spectrum_wavelengths()
+    noise_steps, noise = spectrum_noise()
+    rest_flux = redshift_spectra([0.0], wavelengths)[0]
+    observed_flux = rest_flux + noise
+
+    line_positions = [
+        {
+            'id': line_id,
+            'name': line['name'],
+            'rest_wavelength': line['wavelength'],
+            'observed_wavelength': round(float(line['wavelength']), 1),
+            'type': line['type'],
         }
-
-    # Generate spectra at different redshifts for animation
-    spectra = {}
-    for z in [0.0, 0.01, 0.03, 0.05, 0.1]:
-        spectra[f'z_{z:.2f}'.replace('.', '_')] = generate_spectrum_at_z(z)
+        for line_id, line in SPECTRAL_LINES.items()
+        if SPECTRUM_WAVE_RANGE[0] < line['wavelength'] < SPECTRUM_WAVE_RANGE[1]
+    ]
 
     return {
-        'spectral_lines': spectral_lines,
-        'spectra': spectra,
+        'spectral_lines': SPECTRAL_LINES,
+        'template': {
+            'wavelength_range': list(SPECTRUM_WAVE_RANGE),
+            'n_points': SPECTRUM_POINTS,
+            'continuum': SPECTRUM_CONTINUUM,
+            'line_sigma': SPECTRUM_LINE_SIGMA,
+            'line_strength': LINE_STRENGTH,
+            'rest_flux': np.round(rest_flux, 2).tolist(),
+        },
+        'noise': {
+            'seed': SPECTRUM_NOISE_SEED,
+            'step': SPECTRUM_NOISE_STEP,
+            'values': noise_steps.tolist(),
+        },
+        'spectra': {
+            'z_0_00': {
+                'wavelengths': np.round(wavelengths, 2).tolist(),
+                'flux': np.round(observed_flux, 2).tolist(),
+                'lines': line_positions,
+            },
+        },
     }
 
 
 def main():
     """Run all data generation."""
+    parser = argparse.ArgumentParser(description="Generate Cosmic Distance Ladder data")
+    parser.add_argument("--refresh-gaia", action="store_true",
+                        help="re-run Gaia queries even when cached results exist")
+    parser.add_argument("--gaia-chunks", type=int, default=GAIA_CHUNKS,
+                        help="source_id ranges the Cepheid query is split into (default %(default)s)")
+    parser.add_argument("--gaia-concurrency", type=int, default=GAIA_CONCURRENCY,
+                        help="Gaia async jobs in flight at once (default %(default)s)")
+    parser.add_argument("--no-salt2", action="store_true",
+                        help="use the template SN light curves even when SALT2 is available")
+    parser.add_argument("--salt2-budget", type=float, default=SALT2_BUDGET_S,
+                        help="seconds to wait for a first-time SALT2 surface build (default %(default)s)")
+    args = parser.parse_args()
+
     print("=" * 60)
     print("Cosmic Distance Ladder Data Generation")
     print("=" * 60)
 
     # Rung 1: Parallax
-    parallax_stars = fetch_parallax_stars()
+    parallax_stars = fetch_parallax_stars(refresh=args.refresh_gaia)
     print(f"Generated {len(parallax_stars)} parallax stars")
 
     with open(OUTPUT_DIR / "parallax_stars.json", 'w') as f:
         json.dump(parallax_stars, f, indent=2)
 
     # Rung 2: Cepheids
-    cepheids = fetch_cepheids()
+    cepheids = fetch_cepheids(args.refresh_gaia, args.gaia_chunks, args.gaia_concurrency)
     print(f"Generated {len(cepheids)} Cepheid variables")
 
-    # Generate light curves for featured Cepheids
+    # Light curves for every Cepheid as one binary block; featured ones also inline
+    phases, cep_mags = cepheid_lightcurves([cep['amplitude'] for cep in cepheids],
+                                           [cep['apparent_mag'] for cep in cepheids])
+    export_lightcurves("cepheid_lightcurves", "phase", phases, cep_mags,
+                       [cep['apparent_mag'] for cep in cepheids], [cep['id'] for cep in cepheids])
     for cep in cepheids:
         if cep.get('featured') or cep.get('name'):
             cep['lightcurve'] = generate_cepheid_lightcurve(
@@ -649,20 +1266,29 @@ def main():
     supernovae = generate_supernovae()
     print(f"Generated {len(supernovae)} Type Ia supernovae")
 
-    # Generate light curves for featured SNe
+    # Light curves for every SN as one binary block; featured ones also inline
+    salt2 = None if args.no_salt2 else load_salt2_surfaces(args.salt2_budget)
+    print(f"  SN light curves: {'SALT2 (' + SALT2_BAND + ')' if salt2 is not None else 'template'}")
+    days, sn_mags = sn_lightcurves([sn['peak_mag'] for sn in supernovae],
+                                   [sn['x1'] for sn in supernovae],
+                                   [sn['c'] for sn in supernovae],
+                                   surfaces=salt2)
+    export_lightcurves("sn_lightcurves", "day", days, sn_mags,
+                       [sn['peak_mag'] for sn in supernovae], [sn['id'] for sn in supernovae])
     for sn in supernovae:
         if sn.get('featured'):
             sn['lightcurve'] = generate_sn_lightcurve(
                 sn['peak_mag'],
                 sn['x1'],
-                sn['c']
+                sn['c'],
+                surfaces=salt2,
             )
 
     with open(OUTPUT_DIR / "supernovae.json", 'w') as f:
         json.dump(supernovae, f, indent=2)
 
     # Rung 4: Hubble Flow
-    hubble_data = generate_hubble_diagram()
+    hubble_data = generate_hubble_diagram(supernovae)
     print("Generated Hubble diagram data")
 
     with open(OUTPUT_DIR / "hubble_diagram.json", 'w') as f:
@@ -673,7 +1299,7 @@ def main():
     print("Generated redshift spectrum data")
 
     with open(OUTPUT_DIR / "redshift_spectrum.json", 'w') as f:
-        json.dump(spectrum_data, f, indent=2)
+        json.dump(spectrum_data, f, separators=(',', ':'))
 
     # Summary metadata
     metadata = {
@@ -687,11 +1313,13 @@ def main():
             'cepheids': {
                 'count': len(cepheids),
                 'file': 'cepheids.json',
+                'lightcurves': 'cepheid_lightcurves.bin',
                 'description': 'Classical Cepheid variables with P-L data',
             },
             'supernovae': {
                 'count': len(supernovae),
                 'file': 'supernovae.json',
+                'lightcurves': 'sn_lightcurves.bin',
                 'description': 'Type Ia supernovae as standardizable candles',
             },
             'hubble': {
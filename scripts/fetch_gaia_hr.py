@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Gaia HR Diagram Density Maps
+
+Streams (BP-RP, M_G) for millions of Gaia DR3 stars chunk by chunk and
+accumulates them into fixed-size structures, so memory stays bounded
+whatever the row count:
+- a 2D histogram on a fine grid, exported as a pyramid of density tiles
+- hexbin counts for the full diagram and the main-sequence zoom
+- a uniform reservoir sample for the scatter variants
+
+Chunks come from the Gaia archive via fetch_distance_ladder's chunked,
+cached async queries (or a synthetic HR population without astroquery).
+
+Output:
+  public/data/stellar-evolution/hr-tiles/{z}/{x}-{y}.png + index.json
+  public/images/work/stellar-evolution/*.png
+
+Needs astroquery for Gaia. --synthetic runs the same pipeline on a fake
+population and writes to .cache/gaia-hr-synthetic/ instead, so the shipped
+tiles and figures are never replaced by fake stars.
+
+Usage:
+  python scripts/fetch_gaia_hr.py [--chunks 192] [--max-zoom 3]
+  python scripts/fetch_gaia_hr.py --synthetic --rows 3000000
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+import fetch_distance_ladder as dl
+
+try:
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    HAS_MATPLOTLIB = True
+except ImportError:
+    HAS_MATPLOTLIB = False
+    print("matplotlib not installed, writing tile counts index only")
+
+ROOT = Path(__file__).parent.parent
+TILE_DIR = ROOT / "public" / "data" / "stellar-evolution" / "hr-tiles"
+IMAGE_DIR = ROOT / "public" / "images" / "work" / "stellar-evolution"
+SYNTHETIC_DIR = ROOT / ".cache" / "gaia-hr-synthetic"  # tiles/ and images/ for --synthetic
+
+# (bp_rp min, bp_rp max, M_G min, M_G max); M_G runs bright → faint down the page
+FULL_EXTENT = (-1.0, 6.5, -6.0, 18.0)
+MAINSEQ_EXTENT = (-0.5, 4.0, -2.0, 16.0)
+
+TILE_SIZE = 256        # pixels per tile side
+MAX_ZOOM = 3           # base grid is TILE_SIZE × 2^MAX_ZOOM per side
+HEXBIN_GRIDSIZE = 150  # hexagons across, as in matplotlib's hexbin
+SCATTER_SAMPLE = 200_000
+HR_CHUNKS = 192        # source_id ranges (HEALPix level 2)
+CMAP = "YlOrRd"
+
+SYNTHETIC_ROWS = 3_000_000
+SYNTHETIC_CHUNK = 250_000
+
+# Stars with well-measured parallaxes and colours; M_G from the inverse parallax
+HR_QUERY = """
+SELECT
+    source_id,
+    bp_rp,
+    phot_g_mean_mag + 5 * LOG10(parallax) - 10 AS mg
+FROM gaiadr3.gaia_source
+WHERE parallax_over_error > 10
+    AND parallax > 1
+    AND bp_rp IS NOT NULL
+    AND phot_g_mean_mag IS NOT NULL
+    {source_id_range}
+"""
+
+
+# ─── STREAMING ACCUMULATORS ──────────────────────────────
+class DensityGrid:
+    """2D histogram of (x, y) on a size × size grid; row 0 is the top (smallest y)."""
+
+    def __init__(self, extent, size):
+        self.extent = extent
+        self.size = size
+        self.counts = np.zeros((size, size), dtype=np.int64)
+
+    def add(self, x, y):
+        xmin, xmax, ymin, ymax = self.extent
+        col = np.floor((x - xmin) / (xmax - xmin) * self.size).astype(np.int64)
+        row = np.floor((y - ymin) / (ymax - ymin) * self.size).astype(np.int64)
+        ok = (col >= 0) & (col < self.size) & (row >= 0) & (row < self.size)
+        flat = np.bincount(row[ok] * self.size + col[ok], minlength=self.size ** 2)
+        self.counts += flat.reshape(self.size, self.size)
+
+    def level(self, zoom, max_zoom):
+        """Counts summed into 2^(max_zoom - zoom) blocks."""
+        f = 2 ** (max_zoom - zoom)
+        n = self.size // f
+        return self.counts.reshape(n, f, n, f).sum(axis=(1, 3))
+
+
+class HexbinAccumulator:
+    """
+    Hexagon counts on matplotlib's hexbin lattice (two offset rectangular
+    grids), accumulated one chunk at a time.
+
+    centres() returns (x, y, counts) for the non-empty cells; passing them to
+    ax.hexbin with C=counts, reduce_C_function=np.sum and the same gridsize
+    and extent reproduces the full-data hexbin exactly.
+    """
+
+    def __init__(self, extent, gridsize=HEXBIN_GRIDSIZE):
+        self.extent = extent
+        self.gridsize = gridsize
+        self.nx = gridsize
+        self.ny = int(gridsize / np.sqrt(3))
+        self.counts1 = np.zeros((self.nx + 1) * (self.ny + 1), dtype=np.int64)
+        self.counts2 = np.zeros(self.nx * self.ny, dtype=np.int64)
+
+    def _lattice(self):
+        """Origin and cell size, with matplotlib's 1e-9 x padding against round-off."""
+        xmin, xmax, ymin, ymax = self.extent
+        padding = 1.e-9 * (xmax - xmin)
+        xmin, xmax = xmin - padding, xmax + padding
+        return xmin, ymin, (xmax - xmin) / self.nx, (ymax - ymin) / self.ny
+
+    def add(self, x, y):
+        xmin, ymin, sx, sy = self._lattice()
+        ix = (x - xmin) / sx
+        iy = (y - ymin) / sy
+        ix1, iy1 = np.round(ix).astype(np.int64), np.round(iy).astype(np.int64)
+        ix2, iy2 = np.floor(ix).astype(np.int64), np.floor(iy).astype(np.int64)
+        d1 = (ix - ix1) ** 2 + 3.0 * (iy - iy1) ** 2
+        d2 = (ix - ix2 - 0.5) ** 2 + 3.0 * (iy - iy2 - 0.5) ** 2
+        first = d1 < d2
+
+        ok1 = first & (ix1 >= 0) & (ix1 <= self.nx) & (iy1 >= 0) & (iy1 <= self.ny)
+        self.counts1 += np.bincount(ix1[ok1] * (self.ny + 1) + iy1[ok1],
+                                    minlength=len(self.counts1))
+        ok2 = ~first & (ix2 >= 0) & (ix2 < self.nx) & (iy2 >= 0) & (iy2 < self.ny)
+        self.counts2 += np.bincount(ix2[ok2] * self.ny + iy2[ok2],
+                                    minlength=len(self.counts2))
+
+    def centres(self):
+        xmin, ymin, sx, sy = self._lattice()
+        i1, j1 = np.divmod(np.flatnonzero(self.counts1), self.ny + 1)
+        i2, j2 = np.divmod(np.flatnonzero(self.counts2), self.ny)
+        x = np.concatenate([xmin + i1 * sx, xmin + (i2 + 0.5) * sx])
+        y = np.concatenate([ymin + j1 * sy, ymin + (j2 + 0.5) * sy])
+        counts = np.concatenate([self.counts1[self.counts1 > 0], self.counts2[self.counts2 > 0]])
+        return x, y, counts
+
+
+class Reservoir:
+    """Uniform random sample of at most k rows from a stream (keep the k largest random keys)."""
+
+    def __init__(self, k=SCATTER_SAMPLE, seed=0):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.keys = np.empty(0)
+        self.x = np.empty(0)
+        self.y = np.empty(0)
+
+    def add(self, x, y):
+        keys = np.concatenate([self.keys, self.rng.random(len(x))])
+        x, y = np.concatenate([self.x, x]), np.concatenate([self.y, y])
+        if len(keys) > self.k:
+            keep = np.argpartition(keys, -self.k)[-self.k:]
+            keys, x, y = keys[keep], x[keep], y[keep]
+        self.keys, self.x, self.y = keys, x, y
+
+
+# ─── SOURCES ─────────────────────────────────────────────
+def gaia_chunks(chunks=HR_CHUNKS, concurrency=dl.GAIA_CONCURRENCY, refresh=False):
+    """(bp_rp, M_G) arrays per Gaia source_id-range chunk."""
+    for columns in dl.iter_gaia_chunks(HR_QUERY, chunks, concurrency=concurrency, refresh=refresh):
+        bp_rp = np.ma.filled(np.ma.asarray(columns['bp_rp']).astype(np.float64), np.nan)
+        mg = np.ma.filled(np.ma.asarray(columns['mg']).astype(np.float64), np.nan)
+        ok = np.isfinite(bp_rp) & np.isfinite(mg)
+        yield bp_rp[ok], mg[ok]
+
+
+def synthetic_chunks(rows=SYNTHETIC_ROWS, chunk=SYNTHETIC_CHUNK, seed=47):
+    """HR-like synthetic population: main sequence, giant branch + red clump, white dwarfs, field."""
+    rng = np.random.default_rng(seed)
+    for start in range(0, rows, chunk):
+        n = min(chunk, rows - start)
+        population = rng.choice(5, size=n, p=[0.75, 0.12, 0.08, 0.04, 0.01])
+        c = np.empty(n)
+        m = np.empty(n)
+
+        ms = population == 0
+        c[ms] = rng.beta(2.0, 3.0, ms.sum()) * 4.0 - 0.3
+        m[ms] = 1.0 + 4.2 * c[ms] - 0.25 * c[ms] ** 2 + rng.normal(0, 0.3, ms.sum())
+
+        rgb = population == 1
+        c[rgb] = rng.uniform(0.9, 2.4, rgb.sum())
+        m[rgb] = 3.5 - 4.0 * (c[rgb] - 0.9) + rng.normal(0, 0.3, rgb.sum())
+
+        clump = population == 2
+        c[clump] = rng.normal(1.2, 0.08, clump.sum())
+        m[clump] = rng.normal(0.5, 0.2, clump.sum())
+
+        wd = population == 3
+        c[wd] = rng.uniform(-0.4, 1.0, wd.sum())
+        m[wd] = 11.0 + 3.0 * (c[wd] + 0.4) + rng.normal(0, 0.25, wd.sum())
+
+        field = population == 4
+        c[field] = rng.uniform(-0.5, 4.0, field.sum())
+        m[field] = rng.uniform(-4.0, 16.0, field.sum())
+
+        yield c, m
+
+
+# ─── OUTPUT ──────────────────────────────────────────────
+def _colorize(counts, vmax):
+    """Counts → RGBA with log scaling against vmax; empty pixels are transparent."""
+    norm = np.log1p(counts) / np.log1p(max(vmax, 1))
+    rgba = plt.get_cmap(CMAP)(norm)
+    rgba[counts == 0, 3] = 0.0
+    return rgba
+
+
+def export_tiles(grid, max_zoom=MAX_ZOOM, tile_dir=TILE_DIR, source="gaia_dr3"):
+    """
+    Write the density pyramid: zoom z has 2^z × 2^z tiles of TILE_SIZE²
+    pixels, each level's counts summed from the base grid. Empty tiles are
+    skipped and each level's non-empty tiles listed in index.json.
+    """
+    levels = []
+    for zoom in range(max_zoom + 1):
+        counts = grid.level(zoom, max_zoom)
+        vmax = int(counts.max())
+        n_tiles = 2 ** zoom
+        written = []
+        for ty in range(n_tiles):
+            for tx in range(n_tiles):
+                tile = counts[ty * TILE_SIZE:(ty + 1) * TILE_SIZE, tx * TILE_SIZE:(tx + 1) * TILE_SIZE]
+                if not tile.any():
+                    continue
+                written.append([tx, ty])
+                if HAS_MATPLOTLIB:
+                    path = tile_dir / str(zoom) / f"{tx}-{ty}.png"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    plt.imsave(path, _colorize(tile, vmax))
+        levels.append({"zoom": zoom, "tiles_per_side": n_tiles, "max_count": vmax, "tiles": written})
+        print(f"  ✓ zoom {zoom}: {len(written)}/{n_tiles ** 2} tiles, max {vmax} stars/pixel")
+
+    tile_dir.mkdir(parents=True, exist_ok=True)
+    with open(tile_dir / "index.json", "w") as f:
+        json.dump({
+            "x": "bp_rp",
+            "y": "abs_mag_g",
+            "extent": list(grid.extent),
+            "tile_size": TILE_SIZE,
+            "max_zoom": max_zoom,
+            "path": "{z}/{x}-{y}.png",
+            "scale": "log1p(count) / log1p(max_count)",
+            "cmap": CMAP,
+            "total_stars": int(grid.counts.sum()),
+            "source": source,
+            "levels": levels,
+        }, f)
+
+
+def _hr_axes(extent):
+    fig, ax = plt.subplots(figsize=(12, 8), dpi=250)
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[3], extent[2])  # bright at the top
+    ax.set_xlabel("BP - RP", fontfamily="monospace")
+    ax.set_ylabel("Absolute magnitude (M)", fontfamily="monospace")
+    ax.grid(alpha=0.15)
+    for side in ("top", "right"):
+        ax.spines[side].set_visible(False)
+    return fig, ax
+
+
+def render_hexbin(hexbin, path):
+    x, y, counts = hexbin.centres()
+    fig, ax = _hr_axes(hexbin.extent)
+    ax.hexbin(x, y, C=counts, reduce_C_function=np.sum, gridsize=hexbin.gridsize,
+              extent=hexbin.extent, bins="log", cmap=CMAP, mincnt=1)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    print(f"  ✓ {path.name} ({counts.sum():,} stars in {len(counts):,} hexagons)")
+
+
+def render_scatter(reservoir, extent, path):
+    fig, ax = _hr_axes(extent)
+    ax.scatter(reservoir.x, reservoir.y, s=0.2, c="#B22222", alpha=0.25, linewidths=0)
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    print(f"  ✓ {path.name} ({len(reservoir.x):,} sampled stars)")
+
+
+def render_density(grid, path):
+    fig, ax = _hr_axes(grid.extent)
+    rgba = _colorize(grid.counts, grid.counts.max())
+    ax.imshow(rgba, extent=(grid.extent[0], grid.extent[1], grid.extent[3], grid.extent[2]),
+              aspect="auto", interpolation="nearest")
+    fig.savefig(path, bbox_inches="tight")
+    plt.close(fig)
+    print(f"  ✓ {path.name} ({int(grid.counts.sum()):,} stars)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream Gaia stars into HR density maps")
+    parser.add_argument("--synthetic", action="store_true", help="use the synthetic population (output goes to .cache/gaia-hr-synthetic/)")
+    parser.add_argument("--rows", type=int, default=SYNTHETIC_ROWS, help="synthetic rows")
+    parser.add_argument("--chunks", type=int, default=HR_CHUNKS,
+                        help="Gaia source_id ranges (default %(default)s)")
+    parser.add_argument("--gaia-concurrency", type=int, default=dl.GAIA_CONCURRENCY)
+    parser.add_argument("--refresh-gaia", action="store_true")
+    parser.add_argument("--max-zoom", type=int, default=MAX_ZOOM)
+    parser.add_argument("--no-images", action="store_true", help="skip the matplotlib figures")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("Gaia HR Diagram Density Maps")
+    print("=" * 60)
+
+    if not (args.synthetic or dl.HAS_ASTROQUERY):
+        raise SystemExit("astroquery is required for Gaia data (pip install astroquery); "
+                         "pass --synthetic for a test run on fake stars")
+    if args.synthetic:
+        tile_dir, image_dir = SYNTHETIC_DIR / "tiles", SYNTHETIC_DIR / "images"
+    else:
+        tile_dir, image_dir = TILE_DIR, IMAGE_DIR
+
+    grid = DensityGrid(FULL_EXTENT, TILE_SIZE * 2 ** args.max_zoom)
+    hex_full = HexbinAccumulator(FULL_EXTENT)
+    hex_mainseq = HexbinAccumulator(MAINSEQ_EXTENT)
+    sample = Reservoir()
+
+    if args.synthetic:
+        print(f"Streaming {args.rows:,} synthetic stars...")
+        source = synthetic_chunks(args.rows)
+    else:
+        print("Streaming Gaia DR3...")
+        source = gaia_chunks(args.chunks, args.gaia_concurrency, args.refresh_gaia)
+
+    start = time.perf_counter()
+    n_rows = 0
+    for bp_rp, mg in source:
+        grid.add(bp_rp, mg)
+        hex_full.add(bp_rp, mg)
+        hex_mainseq.add(bp_rp, mg)
+        sample.add(bp_rp, mg)
+        n_rows += len(bp_rp)
+    print(f"  Binned {n_rows:,} stars in {time.perf_counter() - start:.1f}s")
+
+    print("Writing density tiles...")
+    export_tiles(grid, args.max_zoom, tile_dir, "synthetic" if args.synthetic else "gaia_dr3")
+
+    if HAS_MATPLOTLIB and not args.no_images:
+        print("Rendering figures...")
+        image_dir.mkdir(parents=True, exist_ok=True)
+        render_density(grid, image_dir / "gaia-hr-3million.png")
+        render_hexbin(hex_full, image_dir / "hr_full_hexbin.png")
+        render_hexbin(hex_mainseq, image_dir / "hr_mainseq_hexbin.png")
+        render_scatter(sample, FULL_EXTENT, image_dir / "hr_full_scatter.png")
+        render_scatter(sample, MAINSEQ_EXTENT, image_dir / "hr_mainseq_scatter.png")
+
+    print("=" * 60)
+    print(f"Tiles: {tile_dir}")
+    if HAS_MATPLOTLIB and not args.no_images:
+        print(f"Figures: {image_dir}")
+    print("=" * 60)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,66 @@
 #!/usr/bin/env python3
 """
 fetch_seismic.py — Download and process seismic data for Seismic Anatomy visualizer
-Outputs: earth_model.json, ray_paths.json, travel_times.json, velocity_profile.json,
-         stations.json, seismograms.json, event.json
+Outputs: earth_model.json, ray_paths.json (+ ray_paths.bin/ray_paths_index.json,
+         wavefronts.bin/wavefronts_index.json),
+         travel_times.json, velocity_profile.json, stations.json,
+         seismograms.json (+ seismograms.bin/seismograms_index.json,
+         spectrograms.bin/spectrograms_index.json), picks.json, event.json
+
+Usage:
+  python scripts/fetch_seismic.py                          # the Tohoku event (event_data)
+  python scripts/fetch_seismic.py --catalog events.csv     # one directory per event + manifest.json
 
 Requires: pip install obspy numpy
 """
 
+import argparse
+import csv
+import hashlib
 import json
 import numpy as np
 import os
+import random
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 try:
     from obspy.clients.fdsn import Client
-    from obspy import UTCDateTime
+    from obspy.clients.fdsn.header import FDSNNoDataException
+    from obspy import UTCDateTime, read, read_inventory
     from obspy.taup import TauPyModel
-    from obspy.geodetics import locations2degrees
     HAS_OBSPY = True
 except ImportError:
     HAS_OBSPY = False
     print("Warning: ObsPy not installed. Generating synthetic data instead.")
 
+try:
+    from scipy.signal import lfilter
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
 OUTPUT_DIR = Path("public/data/seismic")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Intermediate results reused across runs (not shipped with the site)
+CACHE_DIR = Path(os.environ.get("SEISMIC_CACHE_DIR", ".cache/seismic"))
+
+TAUP_MODEL = "earth_model"  # or any TauP model name, e.g. "iasp91"
+
+# ─── FDSN DOWNLOADS ───────────────────────────────────────
+FDSN_URL = "IRIS"          # or e.g. http://127.0.0.1:8080 for scripts/fdsn_standin.py
+FDSN_TIMEOUT_S = 60        # per request
+FDSN_RETRIES = 4           # after the first attempt
+FDSN_BACKOFF_S = 2.0       # first retry delay, doubled each attempt
+FDSN_CONCURRENCY = 6       # simultaneous stations in flight
+
+# ─── PROCESSING ───────────────────────────────────────────
+BANDPASS_FREQMIN = 0.01  # Hz
+BANDPASS_FREQMAX = 0.1   # Hz
+
 # ─── EVENT ────────────────────────────────────────────────
 EVENT_TIME_STR = "2011-03-11T05:46:23"
 EVENT_LAT = 38.297
@@ -95,101 +131,1485 @@ target_stations = [
 ]
 
 
-def generate_synthetic_ray_path(distance_deg, phase, source_depth=30):
-    """Generate synthetic ray path for visualization when ObsPy unavailable."""
-    path = []
-    num_points = 100
+# ─── RAY PATHS (TauP, parallel + cached per cell) ────────
+_worker_taup = None
 
-    earth_radius = 6371
 
-    # Simplified ray geometry
-    if phase.startswith('P') or phase.startswith('p'):
-        base_velocity = 10.0  # km/s average
-        wave_type = 'P'
-    else:
-        base_velocity = 5.7  # km/s average
-        wave_type = 'S'
+def _init_taup_worker(model):
+    """Process-pool initializer: each worker builds its own TauPyModel once."""
+    global _worker_taup
+    _worker_taup = TauPyModel(model=model)
 
-    # Check if phase goes through core
-    goes_through_core = 'K' in phase or distance_deg > 100
 
-    for i in range(num_points):
-        frac = i / (num_points - 1)
-        theta = frac * np.radians(distance_deg)
+class _InlineExecutor:
+    """Executor stand-in that runs each task immediately in the calling process."""
 
-        # Simple curved ray path
-        if goes_through_core and distance_deg > 100:
-            # Ray goes deeper into core
-            min_r = 0.3 if 'I' in phase else 0.55
-            r = 1.0 - (1.0 - min_r) * np.sin(np.pi * frac)
-        else:
-            # Normal mantle ray
-            max_depth = min(0.6, distance_deg / 180)
-            r = 1.0 - max_depth * np.sin(np.pi * frac)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
 
-        # Time calculation (simplified)
-        depth = (1 - r) * earth_radius
-        avg_velocity = base_velocity * (1 + depth / earth_radius * 0.5)
-        dt = (theta * earth_radius * r) / avg_velocity if i > 0 else 0
-        t = sum([dt for _ in range(i)])
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as e:
+            future.set_exception(e)
+        return future
 
-        path.append({
+
+def _taup_executor(model, workers):
+    """Process pool of TauP workers, or the calling process itself when workers == 1."""
+    if workers == 1:
+        _init_taup_worker(model)
+        return _InlineExecutor()
+    return ProcessPoolExecutor(max_workers=workers, initializer=_init_taup_worker,
+                               initargs=(model,))
+
+
+def _write_json_atomic(path, obj):
+    """Write JSON via a temp file so an interrupted run never leaves a torn cache entry."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f)
+    os.replace(tmp, path)
+
+
+def _ray_cell_cache_path(model, source_depth, phase, distance):
+    model_name = Path(model).stem
+    return (CACHE_DIR / "ray_paths" / f"{model_name}_{source_depth:g}km"
+            / f"{phase}_{distance:g}.json")
+
+
+def _arrival_to_ray(arr, distance):
+    """Convert a TauP arrival with a path into the ray_paths.json record."""
+    path_points = []
+    for pt in arr.path:
+        r = (6371 - pt['depth']) / 6371
+        theta = pt['dist']
+        path_points.append({
             "theta": round(float(theta), 6),
             "r": round(float(r), 6),
-            "t": round(float(t + i * distance_deg * 0.5), 2)
+            "t": round(float(pt['time']), 2)
         })
+    return {
+        "phase": arr.name,
+        "distance_deg": distance,
+        "time_s": round(arr.time, 2),
+        "ray_param": round(arr.ray_param, 4),
+        "takeoff_angle": round(arr.takeoff_angle, 2),
+        "incident_angle": round(arr.incident_angle, 2),
+        "wave_type": "P" if arr.name[0] in "Pp" else "S",
+        "path": path_points
+    }
 
-    return path
 
+def _compute_ray_cell(source_depth, phase, distance):
+    """Worker task: ray paths for one (phase, distance) cell.
+
+    Returns (phase, distance, rays, elapsed_s, error); rays is None on failure.
+    """
+    start = time.perf_counter()
+    try:
+        arrivals = _worker_taup.get_ray_paths(
+            source_depth_in_km=source_depth,
+            distance_in_degree=distance,
+            phase_list=[phase]
+        )
+        rays = [_arrival_to_ray(arr, distance) for arr in arrivals]
+    except Exception as e:
+        return phase, distance, None, time.perf_counter() - start, f"{type(e).__name__}: {e}"
+    return phase, distance, rays, time.perf_counter() - start, None
+
+
+def compute_ray_paths(phases, distances, source_depth, model=TAUP_MODEL, workers=None):
+    """
+    Ray paths for every (phase, distance) cell, fanned out over a process pool.
+
+    Each cell is cached on disk keyed by (model, source depth, phase, distance),
+    so re-runs and extended distance lists only compute the missing cells.
+    Returns (ray_paths, report) with ray_paths ordered by distance, then phase.
+    """
+    model = resolve_taup_model(model)
+    cells = [(phase, dist) for dist in distances for phase in phases]
+    results = {}
+    todo = []
+    for phase, dist in cells:
+        cache_path = _ray_cell_cache_path(model, source_depth, phase, dist)
+        if cache_path.exists():
+            with open(cache_path) as f:
+                results[(phase, dist)] = json.load(f)
+        else:
+            todo.append((phase, dist))
+    print(f"  {len(cells) - len(todo)} cells cached, {len(todo)} to compute")
+
+    timings = []
+    failures = []
+    if todo:
+        start = time.perf_counter()
+        with _taup_executor(model, workers) as pool:
+            futures = [pool.submit(_compute_ray_cell, source_depth, phase, dist)
+                       for phase, dist in todo]
+            for future in as_completed(futures):
+                phase, dist, rays, elapsed, error = future.result()
+                timings.append({"phase": phase, "distance_deg": dist, "seconds": round(elapsed, 4)})
+                if error:
+                    failures.append({"phase": phase, "distance_deg": dist, "error": error})
+                    print(f"  ✗ {phase} at {dist}°: {error}")
+                    continue
+                results[(phase, dist)] = rays
+                _write_json_atomic(_ray_cell_cache_path(model, source_depth, phase, dist), rays)
+        wall = time.perf_counter() - start
+
+        cell_seconds = sorted(t["seconds"] for t in timings)
+        slowest = sorted(timings, key=lambda t: t["seconds"], reverse=True)[:5]
+        print(f"  Computed {len(todo)} cells in {wall:.1f}s "
+              f"(median {cell_seconds[len(cell_seconds) // 2]:.3f}s/cell, "
+              f"max {cell_seconds[-1]:.3f}s)")
+        print("  Slowest: " + ", ".join(
+            f"{t['phase']}@{t['distance_deg']}° {t['seconds']:.2f}s" for t in slowest))
+    if failures:
+        print(f"  {len(failures)} cells failed")
+
+    report = {
+        "model": model,
+        "source_depth_km": source_depth,
+        "cells": len(cells),
+        "cached": len(cells) - len(todo),
+        "computed": len(todo) - len(failures),
+        "timings": timings,
+        "failures": failures,
+    }
+    _write_json_atomic(CACHE_DIR / "reports" / "ray_paths.json", report)
+
+    ray_paths = [ray for cell in cells for ray in results.get(cell, [])]
+    return ray_paths, report
+
+
+# ─── TRAVEL-TIME TABLES (depth × distance × phase) ───────
+TT_TABLE_DEPTHS = [0, 5, 10, 15, 20, 25, 30, 40, 50, 60, 70, 80, 100, 120, 150,
+                   200, 250, 300, 400, 500, 600, 700]  # km
+TT_TABLE_DISTANCES = np.arange(0, 1801, 5) / 10.0  # 0.0° to 180.0° in 0.5° steps
+
+
+class TravelTimeTable:
+    """
+    First-arrival travel time and ray parameter per (source depth, distance, phase),
+    with vectorized bilinear lookup. Cells where a phase does not exist are NaN.
+    """
+
+    def __init__(self, depths, distances, phases, times, ray_params, model=TAUP_MODEL):
+        self.depths = np.asarray(depths, dtype=np.float64)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self.phases = list(phases)
+        self.times = np.asarray(times, dtype=np.float32)
+        self.ray_params = np.asarray(ray_params, dtype=np.float32)
+        self.model = model
+        self._phase_index = {p: i for i, p in enumerate(self.phases)}
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as z:
+            return cls(z["depths"], z["distances"], [str(p) for p in z["phases"]],
+                       z["times"], z["ray_params"], str(z["model"]))
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + f".{os.getpid()}.tmp.npz")
+        np.savez_compressed(tmp, depths=self.depths, distances=self.distances,
+                            phases=np.array(self.phases), times=self.times,
+                            ray_params=self.ray_params, model=np.array(self.model))
+        os.replace(tmp, path)
+
+    def covers(self, phases, depths, distances):
+        return (set(phases) <= set(self.phases)
+                and np.array_equal(self.depths, np.asarray(depths, dtype=np.float64))
+                and np.array_equal(self.distances, np.asarray(distances, dtype=np.float64)))
+
+    @staticmethod
+    def _bracket(axis, x):
+        """Lower grid index and interpolation weight for each x (NaN weight outside the axis)."""
+        i = np.clip(np.searchsorted(axis, x, side="right") - 1, 0, len(axis) - 2)
+        w = (x - axis[i]) / (axis[i + 1] - axis[i])
+        w = np.where((x < axis[0]) | (x > axis[-1]), np.nan, w)
+        return i, w
+
+    def lookup(self, depth, distance, phase, field="time"):
+        """
+        Interpolated travel time (s) or ray parameter (s/rad) for one phase at
+        arrays of source depth (km) and distance (degrees), broadcast together.
+        """
+        grid = self.times if field == "time" else self.ray_params
+        grid = grid[:, :, self._phase_index[phase]]
+        depth, distance = np.broadcast_arrays(np.asarray(depth, dtype=np.float64),
+                                              np.asarray(distance, dtype=np.float64))
+        i, wi = self._bracket(self.depths, depth)
+        j, wj = self._bracket(self.distances, distance)
+
+        out = np.zeros(depth.shape)
+        for di, dw in ((0, 1 - wi), (1, wi)):
+            for dj, xw in ((0, 1 - wj), (1, wj)):
+                w = dw * xw
+                # A missing corner only poisons the result if it carries weight
+                v = grid[i + di, j + dj]
+                out += np.where(w > 0, w * v, 0.0)
+        return np.where(np.isnan(wi) | np.isnan(wj), np.nan, out)
+
+    def arrivals(self, depth, distance):
+        """Predicted first arrivals at one (depth, distance), sorted by time."""
+        arrivals = []
+        for phase in self.phases:
+            t = float(self.lookup(depth, distance, phase))
+            if np.isfinite(t):
+                arrivals.append({"phase": phase, "time_s": round(t, 2)})
+        return sorted(arrivals, key=lambda a: a["time_s"])
+
+    def travel_time_curves(self, depth, distances):
+        """travel_times.json-style curves for one source depth."""
+        curves = {}
+        for phase in self.phases:
+            times = self.lookup(depth, distances, phase)
+            points = [{"d": round(float(d), 1), "t": round(float(t), 1)}
+                      for d, t in zip(distances, times) if np.isfinite(t)]
+            if points:
+                curves[phase] = points
+        return curves
+
+
+def _compute_tt_row(depth, distances, phases):
+    """Worker task: first-arrival times and ray parameters for one source depth."""
+    start = time.perf_counter()
+    times = np.full((len(distances), len(phases)), np.nan, dtype=np.float32)
+    ray_params = np.full_like(times, np.nan)
+    failures = []
+    for j, dist in enumerate(distances):
+        try:
+            arrs = _worker_taup.get_travel_times(
+                source_depth_in_km=depth,
+                distance_in_degree=float(dist),
+                phase_list=phases
+            )
+        except Exception as e:
+            failures.append({"depth_km": depth, "distance_deg": float(dist),
+                             "error": f"{type(e).__name__}: {e}"})
+            continue
+        for a in arrs:
+            if a.name not in phases:
+                continue
+            k = phases.index(a.name)
+            if np.isnan(times[j, k]) or a.time < times[j, k]:
+                times[j, k] = a.time
+                ray_params[j, k] = a.ray_param
+    return depth, times, ray_params, time.perf_counter() - start, failures
+
+
+def build_tt_table(phases, depths=TT_TABLE_DEPTHS, distances=TT_TABLE_DISTANCES,
+                   model=TAUP_MODEL, workers=None):
+    """Compute the full travel-time grid once, one source depth per worker task."""
+    model = resolve_taup_model(model)
+    print(f"Building travel-time table: {len(depths)} depths × {len(distances)} distances "
+          f"× {len(phases)} phases...")
+    times = np.full((len(depths), len(distances), len(phases)), np.nan, dtype=np.float32)
+    ray_params = np.full_like(times, np.nan)
+    row_of = {d: i for i, d in enumerate(depths)}
+
+    start = time.perf_counter()
+    failures = []
+    with _taup_executor(model, workers) as pool:
+        futures = [pool.submit(_compute_tt_row, d, list(distances), list(phases)) for d in depths]
+        for future in as_completed(futures):
+            depth, row_times, row_params, elapsed, row_failures = future.result()
+            times[row_of[depth]] = row_times
+            ray_params[row_of[depth]] = row_params
+            failures.extend(row_failures)
+            print(f"  ✓ {depth:g} km ({elapsed:.1f}s)")
+    for fail in failures:
+        print(f"  ✗ {fail['depth_km']:g} km, {fail['distance_deg']}°: {fail['error']}")
+    print(f"  Table built in {time.perf_counter() - start:.1f}s")
+
+    return TravelTimeTable(depths, distances, phases, times, ray_params, model)
+
+
+def load_or_build_tt_table(phases, model=TAUP_MODEL, workers=None, rebuild=False):
+    """Cached travel-time table for `model`, rebuilt only if missing or too small."""
+    model = resolve_taup_model(model)
+    path = CACHE_DIR / "tables" / f"{Path(model).stem}_tt.npz"
+    if path.exists() and not rebuild:
+        table = TravelTimeTable.load(path)
+        if table.covers(phases, TT_TABLE_DEPTHS, TT_TABLE_DISTANCES):
+            print(f"  Using cached travel-time table {path}")
+            return table
+    table = build_tt_table(phases, TT_TABLE_DEPTHS, TT_TABLE_DISTANCES, model=model, workers=workers)
+    table.save(path)
+    return table
+
+
+# ─── WAVEFORM DOWNLOAD (concurrent, retried) ─────────────
+_thread_local = threading.local()
+
+
+def _fdsn_client(base_url, timeout):
+    """One FDSN client per download thread; clients are not shared across threads."""
+    client = getattr(_thread_local, "client", None)
+    if client is None:
+        # Custom URLs (e.g. the local stand-in) don't publish WADL service descriptions
+        discover = not base_url.startswith("http")
+        client = Client(base_url, timeout=timeout, _discover_services=discover)
+        _thread_local.client = client
+    return client
+
+
+def _with_retries(fn, label, retries=FDSN_RETRIES, backoff=FDSN_BACKOFF_S):
+    """Call fn(), retrying with jittered exponential backoff. "No data" is not retried."""
+    for attempt in range(retries + 1):
+        try:
+            return fn()
+        except FDSNNoDataException:
+            raise
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * 2 ** attempt * random.uniform(1.0, 1.25)
+            print(f"  … {label}: {type(e).__name__} (retry {attempt + 1}/{retries} in {delay:.1f}s)")
+            time.sleep(delay)
+
+
+def _raw_cache_path(net, sta, channel, start, end, suffix):
+    """Cache file for one raw request, keyed by network, station, channel and time window."""
+    key = f"{net}.{sta}.{channel}|{UTCDateTime(start).isoformat()}|{UTCDateTime(end).isoformat()}"
+    digest = hashlib.sha256(key.encode()).hexdigest()[:20]
+    return CACHE_DIR / "raw" / f"{net}.{sta}.{channel}" / f"{digest}{suffix}"
+
+
+def _cached_fetch(path, fetch, write, read_cached, offline, label):
+    """Return the cached object at path, or fetch it, store it and return it."""
+    if path.exists():
+        return read_cached(str(path))
+    if offline:
+        raise FileNotFoundError(f"{label} not in cache ({path}) and --offline is set")
+    obj = fetch()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + f".{os.getpid()}.{threading.get_ident()}.tmp")
+    write(obj, str(tmp))
+    os.replace(tmp, path)
+    return obj
+
+
+def download_inventory(net, sta, start, end, base_url=FDSN_URL, timeout=FDSN_TIMEOUT_S,
+                       retries=FDSN_RETRIES, backoff=FDSN_BACKOFF_S, offline=False):
+    """LHZ response inventory for one station over [start, end], cached on disk."""
+    return _cached_fetch(
+        _raw_cache_path(net, sta, "LHZ", start, end, ".xml"),
+        lambda: _with_retries(lambda: _fdsn_client(base_url, timeout).get_stations(
+            network=net, station=sta, channel="LHZ",
+            starttime=start, endtime=end,
+            level="response"
+        ), f"{net}.{sta} stations", retries, backoff),
+        lambda obj, path: obj.write(path, format="STATIONXML"),
+        read_inventory, offline, f"{net}.{sta} inventory",
+    )
+
+
+def download_inventories(stations, start, end, base_url=FDSN_URL, timeout=FDSN_TIMEOUT_S,
+                          retries=FDSN_RETRIES, backoff=FDSN_BACKOFF_S, offline=False):
+    """
+    LHZ response inventories for every station in one bulk request.
+
+    The combined StationXML is cached on disk keyed by the station list and
+    window. Returns {(net, sta): Inventory}; stations the service doesn't
+    return are simply absent (download_station then falls back to its own
+    per-station request).
+    """
+    bulk = [(net, sta, "*", "LHZ", UTCDateTime(start), UTCDateTime(end)) for net, sta, _ in stations]
+    key = "|".join(f"{net}.{sta}" for net, sta, _ in sorted(stations))
+    key += f"|{UTCDateTime(start).isoformat()}|{UTCDateTime(end).isoformat()}"
+    path = CACHE_DIR / "raw" / "stations_bulk" / f"{hashlib.sha256(key.encode()).hexdigest()[:20]}.xml"
+
+    fetch_start = time.perf_counter()
+    inv = _cached_fetch(
+        path,
+        lambda: _with_retries(lambda: _fdsn_client(base_url, timeout).get_stations_bulk(
+            bulk, level="response"
+        ), f"bulk stations ({len(bulk)})", retries, backoff),
+        lambda obj, p: obj.write(p, format="STATIONXML"),
+        read_inventory, offline, "bulk station inventory",
+    )
+    inventories = {}
+    for net, sta, _ in stations:
+        selected = inv.select(network=net, station=sta)
+        if len(selected.networks):
+            inventories[(net, sta)] = selected
+    print(f"  {len(inventories)}/{len(stations)} station inventories in one request "
+          f"({time.perf_counter() - fetch_start:.1f}s)")
+    return inventories
+
+
+def great_circle(lat1, lon1, lat2, lon2):
+    """
+    Distance (deg), azimuth and back-azimuth (deg clockwise from north) on a
+    sphere, from points 1 to points 2, for whole arrays at once.
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(x, dtype=np.float64))
+                              for x in (lat1, lon1, lat2, lon2))
+    dlon = lon2 - lon1
+    sin1, cos1, sin2, cos2 = np.sin(lat1), np.cos(lat1), np.sin(lat2), np.cos(lat2)
+    # Vincenty form of the central angle: well-conditioned at 0° and 180°
+    y = np.hypot(cos2 * np.sin(dlon), cos1 * sin2 - sin1 * cos2 * np.cos(dlon))
+    x = sin1 * sin2 + cos1 * cos2 * np.cos(dlon)
+    distance = np.degrees(np.arctan2(y, x))
+    azimuth = np.degrees(np.arctan2(np.sin(dlon) * cos2, cos1 * sin2 - sin1 * cos2 * np.cos(dlon)))
+    back_azimuth = np.degrees(np.arctan2(-np.sin(dlon) * cos1, cos2 * sin1 - sin2 * cos1 * np.cos(dlon)))
+    return distance, azimuth % 360, back_azimuth % 360
+
+
+def download_station(net, sta, event_time, base_url=FDSN_URL, timeout=FDSN_TIMEOUT_S,
+                     retries=FDSN_RETRIES, backoff=FDSN_BACKOFF_S, offline=False,
+                     inventory=None):
+    """
+    Fetch the LHZ response inventory and raw waveform window for one station.
+
+    Raw StationXML and miniSEED are cached on disk, so repeated runs (and
+    processing changes) never hit the network for a window already fetched.
+    Pass `inventory` to reuse one fetched for a wider window (batch mode).
+    """
+    wf_start, wf_end = event_time - 60, event_time + 2 * 3600
+
+    inv = inventory
+    if inv is None:
+        inv = download_inventory(net, sta, event_time, event_time + 3600, base_url,
+                                 timeout, retries, backoff, offline)
+    st = _cached_fetch(
+        _raw_cache_path(net, sta, "LHZ", wf_start, wf_end, ".mseed"),
+        lambda: _with_retries(lambda: _fdsn_client(base_url, timeout).get_waveforms(
+            net, sta, "*", "LHZ",
+            wf_start,
+            wf_end
+        ), f"{net}.{sta} waveforms", retries, backoff),
+        lambda obj, path: obj.write(path, format="MSEED"),
+        read, offline, f"{net}.{sta} waveforms",
+    )
+    return inv, st
+
+
+def velocity_trace(inv, st):
+    """Raw counts → broadband ground velocity. Works on a copy, so cached streams stay raw."""
+    st = st.copy()
+    st.merge(fill_value=0)
+    st.remove_response(inventory=inv, output="VEL")
+    return st[0]
+
+
+def bandpass_trace(tr, freqmin=BANDPASS_FREQMIN, freqmax=BANDPASS_FREQMAX):
+    """Display band for the seismogram view (on a copy)."""
+    tr = tr.copy()
+    tr.filter('bandpass', freqmin=freqmin, freqmax=freqmax)
+    tr.detrend('demean')
+    return tr
+
+
+def download_stations(stations, event_time, base_url=FDSN_URL, concurrency=FDSN_CONCURRENCY,
+                      timeout=FDSN_TIMEOUT_S, retries=FDSN_RETRIES, backoff=FDSN_BACKOFF_S,
+                      offline=False, inventories=None):
+    """
+    Download every station over a bounded thread pool.
+
+    Returns {(net, sta): (inv, st)} for successes and {(net, sta): error} for failures.
+    """
+    inventories = inventories or {}
+    results = {}
+    errors = {}
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {
+            pool.submit(download_station, net, sta, event_time, base_url,
+                        timeout, retries, backoff, offline,
+                        inventories.get((net, sta))): (net, sta)
+            for net, sta, _ in stations
+        }
+        for future in as_completed(futures):
+            key = futures[future]
+            try:
+                results[key] = future.result()
+            except Exception as e:
+                errors[key] = e
+    print(f"  Loaded {len(results)}/{len(stations)} stations in "
+          f"{time.perf_counter() - start:.1f}s ({concurrency} concurrent)")
+    return results, errors
+
+
+# ─── SEISMOGRAM DECIMATION + ENVELOPE PYRAMIDS ──────────
+OUTPUT_SAMPLE_RATE = 0.5   # Hz, rate of exported seismograms
+DECIMATE_TAPS_PER_PHASE = 16
+PYRAMID_MIN_BINS = 256     # coarsest envelope level has at most this many bins
+
+
+def lowpass_fir(factor, taps_per_phase=DECIMATE_TAPS_PER_PHASE):
+    """Kaiser-windowed sinc anti-alias filter for decimation by `factor` (unit DC gain)."""
+    n_taps = 2 * factor * taps_per_phase + 1
+    cutoff = 0.9 / factor  # fraction of the input Nyquist kept, with 10% transition
+    k = np.arange(n_taps) - (n_taps - 1) / 2
+    h = cutoff * np.sinc(cutoff * k) * np.kaiser(n_taps, 8.0)
+    return h / h.sum()
+
+
+def decimate(data, factor, taps_per_phase=DECIMATE_TAPS_PER_PHASE):
+    """
+    Anti-aliased, zero-phase decimation by an integer factor.
+
+    Polyphase form: the FIR is only evaluated at the retained output samples,
+    so the cost is len(data) / factor filter dot products. Edges are padded
+    by odd reflection to avoid a step at either end.
+    """
+    data = np.asarray(data, dtype=np.float64)
+    if factor <= 1:
+        return data.copy()
+    h = lowpass_fir(factor, taps_per_phase)
+    half = (len(h) - 1) // 2
+    if len(data) > half:
+        padded = np.pad(data, half, mode="reflect", reflect_type="odd")
+    else:
+        padded = np.pad(data, half, mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, len(h))[::factor]
+    return windows @ h[::-1]
+
+
+def envelope_pyramid(samples, min_bins=PYRAMID_MIN_BINS):
+    """
+    Min/max envelopes at block sizes 2, 4, 8, ... samples, each level built from
+    the one below, until a level has at most min_bins bins. Returns a list of
+    (block_size, mins, maxs).
+    """
+    levels = []
+    lo = hi = np.asarray(samples)
+    block = 1
+    while len(lo) > min_bins:
+        if len(lo) % 2:
+            lo, hi = np.r_[lo, lo[-1]], np.r_[hi, hi[-1]]
+        lo = lo.reshape(-1, 2).min(axis=1)
+        hi = hi.reshape(-1, 2).max(axis=1)
+        block *= 2
+        levels.append((block, lo, hi))
+    return levels
+
+
+def export_seismogram_pyramids(seismograms, traces, output_dir=OUTPUT_DIR):
+    """
+    Write seismograms.bin + seismograms_index.json.
+
+    Each trace is int16 with its own scale (physical units per count), followed
+    by its envelope levels as interleaved (min, max) int16 pairs in the same
+    units. All offsets in the index are in int16 elements.
+    """
+    chunks = []
+    offset = 0
+    entries = []
+    for meta, trace in zip(seismograms, traces):
+        trace = np.asarray(trace, dtype=np.float64)
+        peak = float(np.abs(trace).max()) if len(trace) else 0.0
+        scale = peak / 32767 if peak > 0 else 1.0
+        quantized = np.round(trace / scale).astype("<i2")
+
+        entry = {k: v for k, v in meta.items() if k != "data"}
+        entry.update({"offset": offset, "n_samples": len(quantized), "scale": scale, "levels": []})
+        chunks.append(quantized)
+        offset += len(quantized)
+
+        for block, lo, hi in envelope_pyramid(quantized):
+            pairs = np.empty(2 * len(lo), dtype="<i2")
+            pairs[0::2], pairs[1::2] = lo, hi
+            entry["levels"].append({"block": block, "offset": offset, "n_bins": len(lo)})
+            chunks.append(pairs)
+            offset += len(pairs)
+        entries.append(entry)
+
+    packed = np.concatenate(chunks) if chunks else np.empty(0, dtype="<i2")
+    with open(output_dir / "seismograms.bin", "wb") as f:
+        f.write(packed.tobytes())
+    with open(output_dir / "seismograms_index.json", "w") as f:
+        json.dump({"dtype": "int16", "traces": entries}, f)
+    print(f"  ✓ seismograms.bin ({len(entries)} traces + envelope pyramids, "
+          f"{packed.nbytes / 1e3:.0f} kB)")
+
+
+# ─── SPECTROGRAMS + BAND ENVELOPES ───────────────────────
+SPEC_WINDOW_S = 256.0   # STFT window length
+SPEC_HOP_S = 64.0       # STFT hop
+SPEC_DYNAMIC_DB = 80.0  # uint8 range spans [peak - SPEC_DYNAMIC_DB, peak] per trace
+ENVELOPE_BANDS_HZ = [(0.005, 0.02), (0.02, 0.05), (0.05, 0.1), (0.1, 0.25), (0.25, 0.5)]
+
+
+def batched_stft_power(traces, sample_rate, window_s=SPEC_WINDOW_S, hop_s=SPEC_HOP_S):
+    """
+    Hann-windowed power spectra of every frame of every trace in one rfft call.
+
+    traces is (n_traces, n_samples); each frame is demeaned before windowing.
+    Returns (power, freqs, frame_centres_s) with power shaped
+    (n_traces, n_freqs, n_frames) and frame centres in seconds from trace start.
+    """
+    n_win = max(int(round(window_s * sample_rate)), 2)
+    n_hop = max(int(round(hop_s * sample_rate)), 1)
+    traces = np.asarray(traces, dtype=np.float64)
+    if traces.shape[1] < n_win:
+        traces = np.pad(traces, ((0, 0), (0, n_win - traces.shape[1])))
+    frames = np.lib.stride_tricks.sliding_window_view(traces, n_win, axis=1)[:, ::n_hop]
+    frames = frames - frames.mean(axis=2, keepdims=True)
+    window = np.hanning(n_win)
+    spectra = np.fft.rfft(frames * window, axis=2)
+    power = (np.abs(spectra) ** 2) / (sample_rate * (window ** 2).sum())
+    freqs = np.fft.rfftfreq(n_win, 1.0 / sample_rate)
+    centres = (np.arange(frames.shape[1]) * n_hop + n_win / 2) / sample_rate
+    return power.transpose(0, 2, 1), freqs, centres
+
+
+def _to_uint8_db(values, dynamic_db=SPEC_DYNAMIC_DB):
+    """Power → dB → uint8 over [peak - dynamic_db, peak]; returns (image, db_min, db_max)."""
+    db = 10 * np.log10(np.maximum(values, 1e-300))
+    db_max = float(db.max()) if db.size else 0.0
+    db_min = db_max - dynamic_db
+    image = np.round((np.clip(db, db_min, db_max) - db_min) / dynamic_db * 255).astype(np.uint8)
+    return image, db_min, db_max
+
+
+def export_spectrograms(inputs, seismograms, output_dir=OUTPUT_DIR):
+    """
+    Spectrogram and band-energy envelope images for every trace.
+
+    inputs[i] is (samples, sample_rate) for seismograms[i], ideally the
+    broadband velocity before the display bandpass. Traces sharing a sample
+    rate go through one batched STFT. Writes spectrograms.bin (uint8:
+    per trace, an n_freqs × n_frames spectrogram then an n_bands × n_frames
+    envelope image, both row-major) and spectrograms_index.json with the
+    axes and each image's dB range.
+    """
+    start = time.perf_counter()
+    entries = [None] * len(inputs)
+    images = [None] * len(inputs)
+    by_rate = {}
+    for i, (samples, sample_rate) in enumerate(inputs):
+        by_rate.setdefault(float(sample_rate), []).append(i)
+
+    for sample_rate, members in by_rate.items():
+        n_samples = max(len(inputs[i][0]) for i in members)
+        batch = np.zeros((len(members), n_samples))
+        for row, i in enumerate(members):
+            batch[row, :len(inputs[i][0])] = inputs[i][0]
+        power, freqs, centres = batched_stft_power(batch, sample_rate)
+
+        # Drop DC; band energy is the power summed over each band's bins
+        power, freqs = power[:, 1:], freqs[1:]
+        bands = [(lo, hi) for lo, hi in ENVELOPE_BANDS_HZ if lo < freqs[-1]]
+        band_masks = np.array([(freqs >= lo) & (freqs < hi) for lo, hi in bands], dtype=np.float64)
+        envelopes = np.einsum("bf,nft->nbt", band_masks, power)
+
+        for row, i in enumerate(members):
+            spec, spec_min, spec_max = _to_uint8_db(power[row])
+            env, env_min, env_max = _to_uint8_db(envelopes[row])
+            images[i] = (spec, env)
+            meta = seismograms[i]
+            entries[i] = {
+                "station": meta["station"],
+                "distance_deg": meta["distance_deg"],
+                "sample_rate": sample_rate,
+                "freq_start_hz": float(freqs[0]),
+                "freq_step_hz": float(freqs[1] - freqs[0]) if len(freqs) > 1 else 0.0,
+                "n_freqs": len(freqs),
+                "time_start_s": meta["start_time_offset_s"] + float(centres[0]),
+                "time_step_s": float(centres[1] - centres[0]) if len(centres) > 1 else 0.0,
+                "n_frames": len(centres),
+                "spectrogram_db": [spec_min, spec_max],
+                "bands_hz": [list(b) for b in bands],
+                "envelope_db": [env_min, env_max],
+            }
+
+    offset = 0
+    with open(output_dir / "spectrograms.bin", "wb") as f:
+        for entry, (spec, env) in zip(entries, images):
+            entry["spectrogram_offset"] = offset
+            f.write(spec.tobytes())
+            offset += spec.nbytes
+            entry["envelope_offset"] = offset
+            f.write(env.tobytes())
+            offset += env.nbytes
+    with open(output_dir / "spectrograms_index.json", "w") as f:
+        json.dump({"dtype": "uint8", "window_s": SPEC_WINDOW_S, "hop_s": SPEC_HOP_S,
+                   "scale": "dB, 0-255 linear over each image's [min, max]",
+                   "traces": entries}, f)
+    print(f"  ✓ spectrograms.bin ({len(entries)} traces in {time.perf_counter() - start:.2f}s, "
+          f"{offset / 1e3:.0f} kB)")
+
+
+# ─── PHASE PICKING (recursive STA/LTA) ──────────────────
+STA_S = 10.0          # short-term average window
+LTA_S = 120.0         # long-term average window (traces start 60 s before origin)
+TRIGGER_ON = 2.5      # STA/LTA ratio that opens a pick
+TRIGGER_OFF = 1.2     # ratio the detector must drop below before the next pick
+PICK_WINDOW_S = 60.0  # max |observed - predicted| for a pick to be matched to a phase
+SNR_WINDOW_S = 60.0   # RMS windows after / before the pick for its SNR
+PICK_MIN_SNR = 2.0    # weaker picks are dropped
+
+
+def recursive_sta_lta(traces, sample_rate, sta_s=STA_S, lta_s=LTA_S):
+    """
+    Recursive STA/LTA characteristic function for a (n_traces, n_samples) array.
+
+    Uses scipy.signal.lfilter along the sample axis when SciPy is available;
+    otherwise steps through samples with every trace updated at once. Both
+    averages start from the mean energy of the first LTA window rather than
+    zero, so the short pre-event lead-in doesn't produce a start-up trigger;
+    the first STA window is still zeroed.
+    """
+    energy = np.asarray(traces, dtype=np.float64) ** 2
+    c_sta = 1.0 / (sta_s * sample_rate)
+    c_lta = 1.0 / (lta_s * sample_rate)
+    initial = energy[:, :max(int(lta_s * sample_rate), 1)].mean(axis=1)
+
+    if HAS_SCIPY:
+        sta = lfilter([c_sta], [1.0, c_sta - 1.0], energy, axis=1,
+                      zi=(1.0 - c_sta) * initial[:, None])[0]
+        lta = lfilter([c_lta], [1.0, c_lta - 1.0], energy, axis=1,
+                      zi=(1.0 - c_lta) * initial[:, None])[0]
+    else:
+        sta = np.empty_like(energy)
+        lta = np.empty_like(energy)
+        s = initial.copy()
+        l = initial.copy()
+        for i in range(energy.shape[1]):
+            s += c_sta * (energy[:, i] - s)
+            l += c_lta * (energy[:, i] - l)
+            sta[:, i], lta[:, i] = s, l
+
+    ratio = np.divide(sta, lta, out=np.zeros_like(sta), where=lta > 0)
+    ratio[:, :int(sta_s * sample_rate)] = 0.0
+    return ratio
+
+
+def trigger_onsets(ratio, on=TRIGGER_ON, off=TRIGGER_OFF):
+    """
+    Sample indices where each trace's ratio rises through `on`, after having
+    fallen below `off` since its previous pick. Returns a list of arrays.
+    """
+    rises = (ratio[:, 1:] >= on) & (ratio[:, :-1] < on)
+    falls = (ratio[:, 1:] < off) & (ratio[:, :-1] >= off)
+    onsets = []
+    for rise_row, fall_row in zip(rises, falls):
+        rise_idx = np.flatnonzero(rise_row) + 1
+        fall_idx = np.flatnonzero(fall_row) + 1
+        picks = []
+        armed_from = 0
+        for idx in rise_idx:
+            if idx >= armed_from:
+                picks.append(idx)
+                # Re-arm at the first fall below `off` after this pick
+                k = np.searchsorted(fall_idx, idx)
+                armed_from = fall_idx[k] if k < len(fall_idx) else np.inf
+        onsets.append(np.array(picks, dtype=np.int64))
+    return onsets
+
+
+def pick_arrivals(traces, seismograms, window_s=PICK_WINDOW_S):
+    """
+    Detect onsets on every trace and match them to the predicted arrivals.
+
+    All traces sharing a sample rate are processed as one zero-padded batch.
+    Each predicted phase takes the nearest unclaimed pick within window_s.
+    Returns one record per trace with every pick's time (s after origin),
+    SNR, matched phase and residual (observed - predicted).
+    """
+    results = [None] * len(seismograms)
+    by_rate = {}
+    for i, meta in enumerate(seismograms):
+        by_rate.setdefault(meta["sample_rate"], []).append(i)
+
+    for sample_rate, members in by_rate.items():
+        n_samples = max(len(traces[i]) for i in members)
+        batch = np.zeros((len(members), n_samples))
+        for row, i in enumerate(members):
+            batch[row, :len(traces[i])] = traces[i]
+        onsets = trigger_onsets(recursive_sta_lta(batch, sample_rate))
+
+        # SNR from cumulative energy: RMS after the pick over RMS before it
+        w = max(int(SNR_WINDOW_S * sample_rate), 1)
+        cum = np.concatenate([np.zeros((len(members), 1)), np.cumsum(batch ** 2, axis=1)], axis=1)
+
+        for row, i in enumerate(members):
+            meta = seismograms[i]
+            idx = onsets[row]
+            after = cum[row, np.minimum(idx + w, n_samples)] - cum[row, idx]
+            before = cum[row, idx] - cum[row, np.maximum(idx - w, 0)]
+            with np.errstate(divide="ignore", invalid="ignore"):
+                snr = np.sqrt(after / before)
+            times = meta["start_time_offset_s"] + idx / sample_rate
+
+            strong = snr >= PICK_MIN_SNR  # inf (silent lead-in) passes, NaN (flat window) does not
+            times, snr = times[strong], snr[strong]
+            picks = [{"time_s": round(float(t), 2),
+                      "snr": round(float(s), 2) if np.isfinite(s) else None,
+                      "phase": None, "predicted_s": None, "residual_s": None}
+                     for t, s in zip(times, snr)]
+            for arrival in sorted(meta["arrivals"], key=lambda a: a["time_s"]):
+                free = [k for k, p in enumerate(picks) if p["phase"] is None]
+                if not free:
+                    break
+                k = min(free, key=lambda k: abs(times[k] - arrival["time_s"]))
+                if abs(times[k] - arrival["time_s"]) <= window_s:
+                    picks[k].update(phase=arrival["phase"], predicted_s=arrival["time_s"],
+                                    residual_s=round(float(times[k] - arrival["time_s"]), 2))
+            results[i] = {"station": meta["station"], "distance_deg": meta["distance_deg"],
+                          "picks": picks}
+    return results
+
+
+# ─── RAY SHOOTING THROUGH earth_model (no ObsPy needed) ──
+# PREM-style velocity profile within each earth_model layer, as knots of
+# (radius km, vp km/s, vs km/s) interpolated linearly in radius
+PREM_GRADIENTS = {
+    "Inner Core": [(0, 11.26, 3.67), (600, 11.21, 3.63), (1221, 11.03, 3.50)],
+    "Outer Core": [(1221, 10.36, 0.0), (1500, 10.19, 0.0), (1800, 9.99, 0.0), (2100, 9.75, 0.0),
+                   (2400, 9.48, 0.0), (2700, 9.17, 0.0), (3000, 8.80, 0.0), (3250, 8.44, 0.0),
+                   (3480, 8.06, 0.0)],
+    "Lower Mantle": [(3480, 13.72, 7.26), (3630, 13.68, 7.27), (4371, 12.76, 6.84),
+                     (5600, 11.07, 6.24), (5711, 10.75, 5.95)],
+    "Transition Zone": [(5711, 10.27, 5.57), (5961, 9.13, 4.93)],
+    "Upper Mantle": [(5961, 8.91, 4.77), (6346, 8.11, 4.49)],
+    "Crust": [(6346, 6.80, 3.90), (6371, 5.80, 3.20)],
+}
 
-def generate_synthetic_seismogram(distance_deg, duration_s=7200, sample_rate=0.5):
-    """Generate synthetic seismogram waveform."""
-    num_samples = int(duration_s * sample_rate)
-    data = np.zeros(num_samples)
+R_CMB = 3480.0
+R_ICB = 1221.0
+
+# How each phase is built from one-way legs: the velocity it travels with,
+# number of surface bounces + 1, and where the ray bottoms out
+RAY_PHASES = {
+    "P": {"wave": "vp", "legs": 1, "bottom": "mantle"},
+    "S": {"wave": "vs", "legs": 1, "bottom": "mantle"},
+    "PP": {"wave": "vp", "legs": 2, "bottom": "mantle"},
+    "SS": {"wave": "vs", "legs": 2, "bottom": "mantle"},
+    "PcP": {"wave": "vp", "legs": 1, "bottom": "cmb_reflection"},
+    "ScS": {"wave": "vs", "legs": 1, "bottom": "cmb_reflection"},
+    "PKP": {"wave": "vp", "legs": 1, "bottom": "outer_core"},
+    "PKIKP": {"wave": "vp", "legs": 1, "bottom": "inner_core"},
+    "Pdiff": {"wave": "vp", "legs": 1, "bottom": "cmb_diffraction"},
+}
 
-    # Add noise floor
-    data += np.random.randn(num_samples) * 0.02
 
-    # P arrival time (approximate)
-    p_time = distance_deg * 8  # ~8 seconds per degree
-    p_sample = int(p_time * sample_rate)
+def layer_velocity(radius_km, wave):
+    """Velocity (km/s) at an array of radii from the earth_model layers and PREM_GRADIENTS."""
+    radius = np.asarray(radius_km, dtype=np.float64)
+    column = 1 if wave == "vp" else 2
+    layers = earth_model["layers"]
+    r_outer = np.array([layer["r_outer"] for layer in layers], dtype=np.float64)
+    k = np.clip(np.searchsorted(r_outer, radius, side="left"), 0, len(layers) - 1)
+    v = np.empty_like(radius)
+    for i, layer in enumerate(layers):
+        knots = np.array(PREM_GRADIENTS[layer["name"]])
+        in_layer = k == i
+        v[in_layer] = np.interp(radius[in_layer], knots[:, 0], knots[:, column])
+    return v
+
+
+class ShellGrid:
+    """
+    Concentric shells (surface first) with boundaries on every layer interface
+    and on the source radius. Within a shell the velocity follows the Bullen
+    law v = a·r^b through its top and bottom values, as TauP's slowness layers
+    do, so a ray's angle and time across the shell are exact closed forms.
+    """
+
+    def __init__(self, source_depth, step_km=10.0, path_step_km=50.0):
+        radius = earth_model["radius_km"]
+        self.radius = float(radius)
+        self.r_src = self.radius - source_depth
+        interfaces = [layer["r_inner"] for layer in earth_model["layers"]]
+        bounds = np.unique(np.concatenate([
+            np.arange(0.0, self.radius, step_km), interfaces, [self.radius, self.r_src]
+        ]))[::-1]
+        self.r_top = bounds[:-1]
+        self.r_bot = bounds[1:]
+        # Velocities just inside each shell: layer_velocity gives an interface
+        # radius to the layer below, so the bottom is sampled a hair above it
+        r_bot_inside = np.nextafter(self.r_bot, np.inf)
+        self.v_top = {wave: layer_velocity(self.r_top, wave) for wave in ("vp", "vs")}
+        self.v_bot = {wave: layer_velocity(r_bot_inside, wave) for wave in ("vp", "vs")}
+        self.k_src = int(np.searchsorted(-self.r_top, -self.r_src))  # first shell below source
+        self.k_cmb = int(np.sum(self.r_bot >= R_CMB))                 # shells in the mantle
+        # Boundaries written to output paths (the tracing itself uses every shell)
+        self.keep = ((np.abs(np.remainder(self.r_bot, path_step_km)) < 1e-6)
+                     | np.isin(self.r_bot, interfaces) | (self.r_bot == self.r_src))
+
+    def shells(self, wave, n):
+        """(r_top, r_bot, v_top, v_bot) of the first n shells for one wave type."""
+        return self.r_top[:n], self.r_bot[:n], self.v_top[wave][:n], self.v_bot[wave][:n]
+
+
+def _shell_contributions(p, r_top, r_bot, v_top, v_bot):
+    """
+    Angle (rad) and time (s) each ray spends crossing each shell on the way down.
+
+    p is the ray parameter in s/rad and η = r/v the slowness radius, which the
+    Bullen law makes a power law η ∝ r^B inside a shell. A ray passes a shell
+    while p ≤ η at its bottom and turns where η = p; across the shell
+    dθ = Δarccos(p/η) / B and dt = Δ√(η² − p²) / B. Returns (dtheta, dt,
+    turn_index, turn_radius, reached_bottom); turn_index is len(r_top) for rays
+    that pass through every shell.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        eta_top = r_top / v_top
+        eta_bot = r_bot / v_bot
+        # B = 1 is constant velocity: the centre shell (η_bot = 0) and fluid S shells
+        power = np.log(eta_top / eta_bot) / np.log(r_top / r_bot)
+        power = np.where(np.isfinite(power) & (power > 0), power, 1.0)
+
+    passes = p[:, None] <= eta_bot[None, :]
+    reached = np.ones_like(passes)
+    reached[:, 1:] = np.cumprod(passes[:, :-1], axis=1).astype(bool)
+    through = reached & passes
+    turns = reached & ~passes
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        q_top = np.clip(p[:, None] / eta_top, 0.0, 1.0)
+        q_bot = np.clip(p[:, None] / eta_bot, 0.0, 1.0)
+        w_top = np.sqrt(np.maximum(eta_top ** 2 - p[:, None] ** 2, 0.0))
+        w_bot = np.sqrt(np.maximum(eta_bot ** 2 - p[:, None] ** 2, 0.0))
+        dtheta = np.where(through, (np.arccos(q_top) - np.arccos(q_bot)) / power,
+                          np.where(turns, np.arccos(q_top) / power, 0.0))
+        dt = np.where(through, (w_top - w_bot) / power,
+                      np.where(turns, w_top / power, 0.0))
+
+    rows = np.arange(len(p))
+    has_turn = turns.any(axis=1)
+    turn_index = np.where(has_turn, np.argmax(turns, axis=1), len(r_top))
+    k = np.minimum(turn_index, len(r_top) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r_turn = r_top[k] * (p / eta_top[k]) ** (1 / power[k])
+    turn_radius = np.where(has_turn, np.minimum(r_turn, r_top[k]), r_bot[-1])
+    return dtheta, dt, turn_index, turn_radius, through[:, -1]
+
+
+def shoot_rays(p, phase, grid):
+    """
+    Epicentral distance (deg) and travel time (s) for an array of ray parameters.
+
+    Returns (distance_deg, time_s, valid); valid is False where the ray cannot
+    leave the source downwards or does not bottom out where the phase requires.
+    """
+    spec = RAY_PHASES[phase]
+    p = np.atleast_1d(np.asarray(p, dtype=np.float64))
+    n = grid.k_cmb if spec["bottom"].startswith("cmb") else len(grid.r_top)
+    dtheta, dt, turn_index, turn_radius, reached_bottom = _shell_contributions(
+        p, *grid.shells(spec["wave"], n))
+
+    valid = turn_index >= grid.k_src  # gets below the source
+    bottom = spec["bottom"]
+    if bottom == "mantle":
+        valid &= turn_radius > R_CMB
+    elif bottom == "outer_core":
+        valid &= (turn_radius > R_ICB) & (turn_radius < R_CMB)
+    elif bottom == "inner_core":
+        valid &= turn_radius < R_ICB
+    else:  # reflected or diffracted at the CMB: must reach it
+        valid &= reached_bottom
+
+    # Source leg (down from the source) + the remaining one-way surface legs
+    legs = 2 * spec["legs"] - 1
+    theta = dtheta[:, grid.k_src:].sum(axis=1) + legs * dtheta.sum(axis=1)
+    t = dt[:, grid.k_src:].sum(axis=1) + legs * dt.sum(axis=1)
+    return np.degrees(theta), t, valid & np.isfinite(t)
+
+
+def find_ray_parameters(phase, distances, grid, n_fan=2000, iterations=40):
+    """
+    Ray parameter of the first arrival of `phase` at each target distance.
+
+    Shoots a fan of rays once to bracket every target, refines every bracket
+    (each triplication branch, or a jump in distance between fan rays) together
+    by vectorized bisection, and keeps the earliest refined ray that actually
+    lands on the target. Returns (p, distance_deg, time_s, found).
+    """
+    distances = np.asarray(distances, dtype=np.float64)
+    spec = RAY_PHASES[phase]
+    v_src = layer_velocity(grid.r_src, spec["wave"])
+    p_max = grid.r_src / v_src  # horizontal take-off at the source
+
+    if spec["bottom"] == "cmb_diffraction":
+        return _find_diffracted(distances, grid, spec)
+
+    # Uniform in take-off angle: dense where shallow rays sweep distance quickly
+    p_fan = p_max * np.sin(np.linspace(1e-4, np.pi / 2 - 1e-6, n_fan))
+    d_fan, _, ok = shoot_rays(p_fan, phase, grid)
+
+    f = d_fan[None, :] - distances[:, None]
+    bracket = ((f[:, :-1] * f[:, 1:] <= 0) & ok[None, :-1] & ok[None, 1:])
+    target, i = np.nonzero(bracket)
+    goal = distances[target]
+
+    lo, hi = p_fan[i], p_fan[i + 1]
+    f_lo = d_fan[i] - goal
+    for _ in range(iterations):
+        mid = 0.5 * (lo + hi)
+        d_mid, _, ok_mid = shoot_rays(mid, phase, grid)
+        f_mid = d_mid - goal
+        same_side = ok_mid & (np.sign(f_mid) == np.sign(f_lo))
+        lo = np.where(same_side, mid, lo)
+        f_lo = np.where(same_side, f_mid, f_lo)
+        hi = np.where(same_side, hi, mid)
+
+    p_ray = 0.5 * (lo + hi)
+    d_ray, t_ray, ok_ray = shoot_rays(p_ray, phase, grid)
+    # Brackets across a jump converge on the jump, not the target
+    t_cost = np.where(ok_ray & (np.abs(d_ray - goal) < 0.05), t_ray, np.inf)
+
+    cost = np.full((len(distances), max(len(target), 1)), np.inf)
+    cost[target, np.arange(len(target))] = t_cost
+    best = np.argmin(cost, axis=1)
+    found = np.isfinite(cost[np.arange(len(distances)), best])
+    best = np.minimum(best, max(len(target) - 1, 0))
+    if not len(target):
+        return np.zeros_like(distances), distances.copy(), np.zeros_like(distances), found
+    return p_ray[best], d_ray[best], t_ray[best], found
+
+
+def _find_diffracted(distances, grid, spec):
+    """Pdiff: the CMB-grazing ray plus an arc along the CMB at the grazing slowness."""
+    v_cmb = layer_velocity(R_CMB + 1e-6, spec["wave"])
+    p = np.full(len(distances), (R_CMB - 1e-6) / v_cmb)
+    d_graze, t_graze, ok = shoot_rays(p[:1], "PcP" if spec["wave"] == "vp" else "ScS", grid)
+    arc = distances - d_graze[0]
+    found = ok[0] & (arc > 0)
+    t = t_graze[0] + p * np.radians(np.maximum(arc, 0))
+    return p, distances.copy(), t, found
+
+
+def _ray_path_points(p, phase, grid, distance):
+    """(theta, r, t) points along one traced ray, source to receiver."""
+    spec = RAY_PHASES[phase]
+    diffracted = spec["bottom"] == "cmb_diffraction"
+    n = grid.k_cmb if spec["bottom"].startswith("cmb") else len(grid.r_top)
+    dtheta, dt, turn_index, turn_radius, _ = _shell_contributions(
+        np.array([p]), *grid.shells(spec["wave"], n))
+    last = min(int(turn_index[0]), n - 1)
+    dtheta, dt = dtheta[0, :last + 1], dt[0, :last + 1]
+    r_bottom = grid.r_bot[:last + 1].copy()
+    r_bottom[last] = turn_radius[0] if turn_index[0] < n else grid.r_bot[n - 1]
+    keep = grid.keep[:last + 1].copy()
+    keep[last] = True
+
+    # One-way leg from the surface: radius reached after each shell
+    shells = np.arange(last + 1)
+    down = [(k, r_bottom[k]) for k in shells if keep[k]]
+    up = [(k, grid.r_top[k]) for k in shells[::-1] if k == 0 or keep[k - 1]]
+
+    theta, t = 0.0, 0.0
+    points = [(0.0, grid.r_src, 0.0)]
+
+    def descend(start):
+        nonlocal theta, t
+        prev = start
+        for k, r in down:
+            if k < start:
+                continue
+            theta += dtheta[prev:k + 1].sum()
+            t += dt[prev:k + 1].sum()
+            prev = k + 1
+            points.append((theta, r, t))
+
+    def ascend():
+        nonlocal theta, t
+        prev = last + 1
+        for k, r in up:
+            theta += dtheta[k:prev].sum()
+            t += dt[k:prev].sum()
+            prev = k
+            points.append((theta, r, t))
+
+    descend(grid.k_src)
+    if diffracted:
+        arc_total = np.radians(distance) - theta - dtheta.sum()
+        steps = max(int(np.degrees(arc_total)), 1)
+        for _ in range(steps):
+            theta += arc_total / steps
+            t += p * arc_total / steps
+            points.append((theta, R_CMB, t))
+    ascend()
+    for _ in range(spec["legs"] - 1):
+        descend(0)
+        ascend()
+    return points
+
+
+def trace_ray_paths(phases, distances, source_depth):
+    """ray_paths.json records traced through earth_model for every (phase, distance)."""
+    grid = ShellGrid(source_depth)
+    distances = list(distances)
+    found_rays = {}
+    for phase in phases:
+        p, _, t, found = find_ray_parameters(phase, distances, grid)
+        for dist, p_i, t_i, ok in zip(distances, p, t, found):
+            if ok:
+                found_rays[(dist, phase)] = (p_i, t_i)
 
-    # S arrival time
-    s_time = distance_deg * 14  # ~14 seconds per degree
-    s_sample = int(s_time * sample_rate)
+    ray_paths = []
+    for dist in distances:
+        for phase in phases:
+            if (dist, phase) not in found_rays:
+                continue
+            p, t = found_rays[(dist, phase)]
+            wave = RAY_PHASES[phase]["wave"]
+            v_src = float(layer_velocity(grid.r_src, wave))
+            v_surf = float(layer_velocity(grid.radius, wave))
+            ray_paths.append({
+                "phase": phase,
+                "distance_deg": dist,
+                "time_s": round(float(t), 2),
+                "ray_param": round(float(p), 4),
+                "takeoff_angle": round(float(np.degrees(np.arcsin(min(p * v_src / grid.r_src, 1.0)))), 2),
+                "incident_angle": round(float(np.degrees(np.arcsin(min(p * v_surf / grid.radius, 1.0)))), 2),
+                "wave_type": "P" if wave == "vp" else "S",
+                "path": [
+                    {"theta": round(float(a), 6), "r": round(float(b / grid.radius), 6),
+                     "t": round(float(c), 2)}
+                    for a, b, c in _ray_path_points(p, phase, grid, dist)
+                ],
+            })
+    return ray_paths
+
+
+# ─── CUSTOM TauP MODEL (built from earth_model, cached) ──
+# Named discontinuities TauP needs in a .nd file, by the earth_model layer
+# whose top they mark
+TAUP_ND_LABELS = {"Upper Mantle": "mantle", "Outer Core": "outer-core", "Inner Core": "inner-core"}
+
+
+def earth_model_nd():
+    """earth_model layers + PREM_GRADIENTS as TauP "named discontinuities" (.nd) text."""
+    radius = earth_model["radius_km"]
+    lines = []
+    for layer in sorted(earth_model["layers"], key=lambda layer: -layer["r_outer"]):
+        if layer["name"] in TAUP_ND_LABELS:
+            lines.append(TAUP_ND_LABELS[layer["name"]])
+        for r, vp, vs in sorted(PREM_GRADIENTS[layer["name"]], key=lambda knot: -knot[0]):
+            lines.append(f"{radius - r:.3f} {vp:.4f} {vs:.4f} {layer['rho']:.4f}")
+    return "\n".join(lines) + "\n"
+
+
+def earth_model_taup_path(rebuild=False):
+    """
+    Path of the compiled TauP model for earth_model, building it on first use.
+
+    Cached under CACHE_DIR/models keyed by a hash of the .nd layer table, so an
+    edit to earth_model or PREM_GRADIENTS gets a fresh model (and, because
+    the ray-path and travel-time caches are keyed by model name, fresh
+    tables) while unchanged runs and pool workers just load the .npz.
+    """
+    nd = earth_model_nd()
+    name = f"earth_model_{hashlib.sha256(nd.encode()).hexdigest()[:12]}"
+    model_dir = CACHE_DIR / "models"
+    path = model_dir / f"{name}.npz"
+    if path.exists() and not rebuild:
+        return str(path)
+
+    from obspy.taup.taup_create import build_taup_model
+    model_dir.mkdir(parents=True, exist_ok=True)
+    nd_path = model_dir / f"{name}.nd"
+    nd_path.write_text(nd)
+    start = time.perf_counter()
+    build_taup_model(str(nd_path), output_folder=str(model_dir), verbose=False)
+    print(f"  Built TauP model {path.name} from earth_model in {time.perf_counter() - start:.1f}s")
+    return str(path)
+
+
+def resolve_taup_model(model):
+    """'earth_model' → compiled cached model path; any other TauP model name as-is."""
+    return earth_model_taup_path() if model == "earth_model" else model
+
+
+# ─── RAY PATH SIMPLIFICATION + PACKED EXPORT ─────────────
+RAY_TOL_KM = 2.0   # max geometric deviation of a dropped point from the kept polyline
+RAY_TOL_S = 0.5    # max travel-time deviation of a dropped point
+
+
+def simplify_ray_paths(theta, r, t, path_id, tol_km=RAY_TOL_KM, tol_s=RAY_TOL_S):
+    """
+    Douglas–Peucker over many ray paths at once.
+
+    Inputs are flat arrays of every path point (theta in radians, r as a
+    fraction of the Earth radius, t in seconds) with path_id grouping them
+    into contiguous paths. Each pass measures every remaining point against
+    the segment between its kept neighbours, for all segments of all paths
+    together, and keeps the worst point of each segment that breaks either
+    tolerance. Returns a boolean keep mask.
+    """
+    radius = earth_model["radius_km"]
+    x = radius * r * np.sin(theta)
+    y = radius * r * np.cos(theta)
+    n = len(theta)
+    idx = np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    starts = np.flatnonzero(np.r_[True, path_id[1:] != path_id[:-1]])
+    keep[starts] = True
+    keep[np.r_[starts[1:] - 1, n - 1]] = True
+
+    while True:
+        kept = np.flatnonzero(keep)
+        seg = np.searchsorted(kept, idx, side="right") - 1
+        a = kept[np.minimum(seg, len(kept) - 1)]
+        b = kept[np.minimum(seg + 1, len(kept) - 1)]
+        inner = ~keep & (b > a)
+
+        # Distance to the segment a→b and time error against linear timing along it
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        length2 = np.maximum(dx * dx + dy * dy, 1e-12)
+        u = np.clip(((x - x[a]) * dx + (y - y[a]) * dy) / length2, 0.0, 1.0)
+        dist_km = np.hypot(x - (x[a] + u * dx), y - (y[a] + u * dy))
+        dt = np.abs(t - (t[a] + u * (t[b] - t[a])))
+        error = np.where(inner, np.maximum(dist_km / tol_km, dt / tol_s), 0.0)
+
+        # Worst point per segment (segments are keyed by their start index a)
+        order = np.lexsort((-error, a))
+        first = np.r_[True, a[order][1:] != a[order][:-1]]
+        worst = order[first]
+        worst = worst[error[worst] > 1.0]
+        if not len(worst):
+            return keep
+        keep[worst] = True
+
+
+def pack_ray_paths(ray_paths, output_dir=OUTPUT_DIR, tol_km=RAY_TOL_KM, tol_s=RAY_TOL_S):
+    """
+    Simplify ray paths and write them as packed float32 (theta, r, t) triplets
+    in ray_paths.bin, with a JSON index giving each path's point offset and
+    count. Returns the per-phase size report.
+    """
+    counts = np.array([len(ray["path"]) for ray in ray_paths])
+    points = np.array([(p["theta"], p["r"], p["t"]) for ray in ray_paths for p in ray["path"]],
+                      dtype=np.float64).reshape(-1, 3)
+    path_id = np.repeat(np.arange(len(ray_paths)), counts)
+
+    start = time.perf_counter()
+    keep = simplify_ray_paths(points[:, 0], points[:, 1], points[:, 2], path_id, tol_km, tol_s)
+    elapsed = time.perf_counter() - start
+
+    packed = points[keep].astype("<f4")
+    kept_counts = np.bincount(path_id[keep], minlength=len(ray_paths))
+    offsets = np.r_[0, np.cumsum(kept_counts)[:-1]]
+
+    paths = []
+    for ray, offset, count in zip(ray_paths, offsets, kept_counts):
+        entry = {k: v for k, v in ray.items() if k != "path"}
+        entry["offset"] = int(offset)
+        entry["count"] = int(count)
+        paths.append(entry)
+
+    report = {}
+    for i, ray in enumerate(ray_paths):
+        phase = report.setdefault(ray["phase"], {
+            "paths": 0, "points_in": 0, "points_out": 0, "json_bytes": 0, "packed_bytes": 0,
+        })
+        phase["paths"] += 1
+        phase["points_in"] += int(counts[i])
+        phase["points_out"] += int(kept_counts[i])
+        phase["json_bytes"] += len(json.dumps(ray))
+        phase["packed_bytes"] += int(kept_counts[i]) * 12 + len(json.dumps(paths[i]))
+    for phase in report.values():
+        phase["reduction"] = round(phase["json_bytes"] / max(phase["packed_bytes"], 1), 1)
+
+    index = {
+        "dtype": "float32",
+        "fields": ["theta", "r", "t"],
+        "n_points": int(len(packed)),
+        "tolerance_km": tol_km,
+        "tolerance_s": tol_s,
+        "paths": paths,
+        "size_report": report,
+    }
+    with open(output_dir / "ray_paths.bin", "wb") as f:
+        f.write(packed.tobytes())
+    with open(output_dir / "ray_paths_index.json", "w") as f:
+        json.dump(index, f)
+
+    print(f"  ✓ ray_paths.bin ({len(packed)}/{len(points)} points kept in {elapsed:.2f}s, "
+          f"≤{tol_km:g} km / ≤{tol_s:g} s)")
+    for name, phase in report.items():
+        print(f"      {name:<6} {phase['points_in']:>6} → {phase['points_out']:>5} points, "
+              f"{phase['json_bytes'] / 1e3:>7.1f} kB → {phase['packed_bytes'] / 1e3:>6.1f} kB "
+              f"({phase['reduction']}×)")
+    return report
+
+
+# ─── WAVEFRONT FRAMES (uniform time steps) ───────────────
+WAVEFRONT_DT_S = 10.0  # animation frame step in seconds of travel time
+
+
+def resample_ray_paths(ray_paths, dt=WAVEFRONT_DT_S):
+    """
+    Position of every ray at t = 0, dt, 2·dt, ... as (n_rays, n_frames) arrays
+    of theta and r, NaN once a ray has arrived.
+
+    All rays are interpolated together: each ray's times are offset by
+    ray_index × span so the concatenated time axis is globally sorted, and one
+    searchsorted finds every (ray, frame) bracket.
+    """
+    counts = np.array([len(ray["path"]) for ray in ray_paths])
+    points = np.array([(p["theta"], p["r"], p["t"]) for ray in ray_paths for p in ray["path"]],
+                      dtype=np.float64).reshape(-1, 3)
+    theta, r, t = points.T
+    ray_id = np.repeat(np.arange(len(ray_paths)), counts)
+    ends = np.cumsum(counts) - 1
+    starts = ends - counts + 1
+
+    n_frames = int(np.floor(t.max() / dt)) + 1
+    frame_t = np.arange(n_frames) * dt
+    span = t.max() + 2 * dt
+    key = ray_id * span + t
+
+    query = (np.arange(len(ray_paths))[:, None] * span + frame_t[None, :])
+    hi = np.searchsorted(key, query, side="left")
+    hi = np.clip(hi, starts[:, None] + 1, ends[:, None])
+    lo = hi - 1
+    dt_seg = t[hi] - t[lo]
+    w = np.where(dt_seg > 0, (frame_t[None, :] - t[lo]) / np.where(dt_seg > 0, dt_seg, 1), 0.0)
+    w = np.clip(w, 0.0, 1.0)
+
+    frames_theta = theta[lo] + w * (theta[hi] - theta[lo])
+    frames_r = r[lo] + w * (r[hi] - r[lo])
+    arrived = frame_t[None, :] > t[ends][:, None]
+    frames_theta[arrived] = np.nan
+    frames_r[arrived] = np.nan
+    return frame_t, frames_theta, frames_r
+
+
+def export_wavefronts(ray_paths, output_dir=OUTPUT_DIR, dt=WAVEFRONT_DT_S):
+    """
+    Write wavefronts.bin + wavefronts_index.json for frame-indexed playback.
+
+    wavefronts.bin holds two float32 sections:
+      1. ray positions: n_rays × n_frames × (theta, r), NaN after arrival
+      2. wavefront polylines: for each frame, for each phase, the (theta, r)
+         points of that phase's live rays ordered by distance
+    The index gives, per frame and phase, [offset, count] into section 2 in
+    points, so frame k of phase p is a direct slice.
+    """
+    start = time.perf_counter()
+    frame_t, frames_theta, frames_r = resample_ray_paths(ray_paths, dt)
+    n_rays, n_frames = frames_theta.shape
+    positions = np.stack([frames_theta, frames_r], axis=-1).astype("<f4")
+
+    phases = list(dict.fromkeys(ray["phase"] for ray in ray_paths))
+    chunks = []
+    polylines = np.zeros((n_frames, len(phases), 2), dtype=np.int64)
+    offset = 0
+    members = {}
+    for phase in phases:
+        rays = [i for i, ray in enumerate(ray_paths) if ray["phase"] == phase]
+        members[phase] = sorted(rays, key=lambda i: ray_paths[i]["distance_deg"])
+    for k in range(n_frames):
+        for j, phase in enumerate(phases):
+            front = positions[members[phase], k]
+            front = front[~np.isnan(front[:, 0])]
+            polylines[k, j] = (offset, len(front))
+            chunks.append(front)
+            offset += len(front)
+    fronts = np.concatenate(chunks) if chunks else np.empty((0, 2), dtype="<f4")
+
+    with open(output_dir / "wavefronts.bin", "wb") as f:
+        f.write(positions.tobytes())
+        f.write(fronts.tobytes())
+    index = {
+        "dtype": "float32",
+        "fields": ["theta", "r"],
+        "dt_s": dt,
+        "n_frames": n_frames,
+        "n_rays": n_rays,
+        "rays": [{"phase": ray["phase"], "distance_deg": ray["distance_deg"]} for ray in ray_paths],
+        "positions_offset_bytes": 0,
+        "polylines_offset_bytes": positions.nbytes,
+        "phases": phases,
+        "polylines": polylines.tolist(),  # [frame][phase] = [offset, count] in points
+    }
+    with open(output_dir / "wavefronts_index.json", "w") as f:
+        json.dump(index, f)
+    print(f"  ✓ wavefronts.bin ({n_rays} rays × {n_frames} frames at {dt:g}s in "
+          f"{time.perf_counter() - start:.2f}s, {(positions.nbytes + fronts.nbytes) / 1e6:.1f} MB)")
 
-    # Check shadow zone
-    in_shadow = 103 <= distance_deg <= 142
 
-    if not in_shadow and p_sample < num_samples:
-        # Add P wave arrival
-        p_width = 50
-        for i in range(min(p_width, num_samples - p_sample)):
-            data[p_sample + i] += 0.8 * np.exp(-i / 20) * np.sin(i * 0.5)
+def generate_synthetic_seismograms(distances, duration_s=7200, sample_rate=0.5):
+    """
+    Synthetic seismogram waveforms for many stations at once.
 
-    if distance_deg < 103 and s_sample < num_samples:
-        # Add S wave arrival (only before shadow zone)
-        s_width = 80
-        for i in range(min(s_width, num_samples - s_sample)):
-            data[s_sample + i] += 0.6 * np.exp(-i / 30) * np.sin(i * 0.3)
+    Returns a (n_stations, n_samples) float array, each row normalised to a
+    peak of 1.
+    """
+    dist = np.asarray(distances, dtype=np.float64)
+    n_stations = len(dist)
+    num_samples = int(duration_s * sample_rate)
 
-    if distance_deg > 142:
-        # Add PKP arrival for stations beyond shadow
-        pkp_time = distance_deg * 6 + 400
-        pkp_sample = int(pkp_time * sample_rate)
-        if pkp_sample < num_samples:
-            pkp_width = 60
-            for i in range(min(pkp_width, num_samples - pkp_sample)):
-                data[pkp_sample + i] += 0.5 * np.exp(-i / 25) * np.sin(i * 0.4)
+    # Add noise floor
+    data = np.random.randn(n_stations, num_samples) * 0.02
+
+    def add_wavelet(present, arrival_time, width, amplitude, decay, freq):
+        start = (arrival_time * sample_rate).astype(int)
+        offsets = np.arange(width)
+        idx = start[:, None] + offsets[None, :]
+        mask = present[:, None] & (start[:, None] < num_samples) & (idx < num_samples)
+        wavelet = amplitude * np.exp(-offsets / decay) * np.sin(offsets * freq)
+        r, c = np.nonzero(mask)
+        data[r, idx[r, c]] += wavelet[c]
+
+    # P arrival (~8 s/degree) except in the shadow zone
+    in_shadow = (dist >= 103) & (dist <= 142)
+    add_wavelet(~in_shadow, dist * 8, 50, 0.8, 20, 0.5)
+    # S arrival (~14 s/degree), only before the shadow zone
+    add_wavelet(dist < 103, dist * 14, 80, 0.6, 30, 0.3)
+    # PKP arrival for stations beyond the shadow zone
+    add_wavelet(dist > 142, dist * 6 + 400, 60, 0.5, 25, 0.4)
 
     # Normalize
-    max_amp = np.max(np.abs(data))
-    if max_amp > 0:
-        data = data / max_amp
+    max_amp = np.abs(data).max(axis=1, keepdims=True)
+    return np.divide(data, max_amp, out=data, where=max_amp > 0)
+
 
+def generate_synthetic_seismogram(distance_deg, duration_s=7200, sample_rate=0.5):
+    """Generate synthetic seismogram waveform."""
+    data = generate_synthetic_seismograms([distance_deg], duration_s, sample_rate)[0]
     return [round(float(d), 4) for d in data]
 
 
+def export_dense_record_section(spacing_deg=0.1, max_deg=180.0, duration_s=7200,
+                                sample_rate=0.5, output_dir=OUTPUT_DIR):
+    """
+    Synthesise a dense record section (one virtual station every spacing_deg)
+    and export it as int16 samples plus a JSON index.
+
+    Format of record_section.bin: n_stations × n_samples int16, row-major,
+    each row scaled so ±32767 is the trace peak.
+    """
+    distances = np.round(np.arange(spacing_deg, max_deg + spacing_deg / 2, spacing_deg), 4)
+    start = time.perf_counter()
+    data = generate_synthetic_seismograms(distances, duration_s, sample_rate)
+    elapsed = time.perf_counter() - start
+
+    quantized = np.round(data * 32767).astype("<i2")
+    with open(output_dir / "record_section.bin", "wb") as f:
+        f.write(quantized.tobytes())
+
+    index = {
+        "n_stations": len(distances),
+        "n_samples": data.shape[1],
+        "dtype": "int16",
+        "scale": 1 / 32767,
+        "sample_rate": sample_rate,
+        "start_time_offset_s": 0,
+        "distance_start_deg": float(distances[0]),
+        "distance_step_deg": spacing_deg,
+    }
+    with open(output_dir / "record_section.json", "w") as f:
+        json.dump(index, f, indent=2)
+    print(f"  ✓ record_section.bin ({len(distances)} stations in {elapsed:.2f}s, "
+          f"{quantized.nbytes / 1e6:.1f} MB)")
+
+
 def compute_theoretical_arrivals(distance_deg, source_depth):
     """Compute theoretical phase arrivals."""
     arrivals = []
@@ -247,113 +1667,151 @@ def generate_velocity_profile():
     return profile
 
 
-def main():
-    print("Generating seismic data for Seismic Anatomy visualizer...")
+# ─── EVENT CATALOGUE (batch mode) ─────────────────────────
+PHASES = ["P", "S", "PcP", "ScS", "PP", "SS", "PKP", "PKIKP", "Pdiff"]
+
+
+def _event_id(event):
+    """Filesystem-safe id: the catalogue id if there is one, else the origin time."""
+    if event.get("id"):
+        return "".join(c if c.isalnum() or c in "-_" else "_" for c in str(event["id"]))
+    return "".join(c for c in event["time_utc"] if c.isdigit() or c == "T")[:15]
+
+
+def read_catalog(path):
+    """
+    Events from a CSV or QuakeML catalogue as event_data-shaped dicts.
+
+    CSV needs time, latitude, longitude and depth (km) columns; mag/magnitude,
+    name/place, type and id are optional, so USGS ComCat exports work as-is.
+    QuakeML needs ObsPy.
+    """
+    path = Path(path)
+    events = []
+    if path.suffix.lower() in (".xml", ".quakeml", ".qml"):
+        if not HAS_OBSPY:
+            raise RuntimeError("Reading QuakeML needs ObsPy")
+        from obspy import read_events
+        for ev in read_events(str(path)):
+            origin = ev.preferred_origin() or ev.origins[0]
+            magnitude = ev.preferred_magnitude() or (ev.magnitudes[0] if ev.magnitudes else None)
+            description = ev.event_descriptions[0].text if ev.event_descriptions else None
+            events.append({
+                "id": str(ev.resource_id).rstrip("/").split("/")[-1].split("=")[-1],
+                "name": description or f"M{magnitude.mag if magnitude else '?'} {origin.time.date}",
+                "time_utc": origin.time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "latitude": origin.latitude,
+                "longitude": origin.longitude,
+                "depth_km": (origin.depth or 0.0) / 1000.0,
+                "magnitude": magnitude.mag if magnitude else None,
+                "type": ev.event_type or "earthquake",
+            })
+        return events
+
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+            magnitude = row.get("mag") or row.get("magnitude")
+            events.append({
+                "id": row.get("id") or None,
+                "name": row.get("name") or row.get("place") or f"M{magnitude} {row['time'][:10]}",
+                "time_utc": row["time"].rstrip("Z")[:19],
+                "latitude": float(row["latitude"]),
+                "longitude": float(row["longitude"]),
+                "depth_km": float(row["depth"]),
+                "magnitude": float(magnitude) if magnitude else None,
+                "type": row.get("type") or "earthquake",
+            })
+    return events
+
+
+def process_event(event, output_dir, args, inventories=None, workers=None):
+    """
+    Generate the full visualizer dataset for one event into output_dir.
 
-    phases_to_compute = ["P", "S", "PcP", "ScS", "PP", "SS", "PKP", "PKIKP", "Pdiff"]
+    Returns a summary with per-stage timings and per-station failures; raises
+    only if the event cannot be processed at all.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    lat, lon, depth = event["latitude"], event["longitude"], event["depth_km"]
+    timings = {}
+    station_errors = {}
 
     ray_paths = []
     travel_times = {}
     stations_out = []
     seismograms = []
+    traces = []  # full-precision samples behind each seismograms entry
+    broadband = []  # (samples, sample_rate) before the display bandpass, for spectrograms
 
     if HAS_OBSPY:
-        print("Using ObsPy to fetch real data from IRIS...")
-        client = Client("IRIS")
-        taup = TauPyModel(model="iasp91")
-        EVENT_TIME = UTCDateTime(EVENT_TIME_STR)
+        source = "the local cache" if args.offline else args.fdsn_url
+        print(f"Using ObsPy to fetch real data from {source}...")
+        event_time = UTCDateTime(event["time_utc"])
 
         # Compute ray paths
         print("Computing ray paths...")
-        for dist in range(5, 180, 5):
-            for phase in phases_to_compute:
-                try:
-                    arrivals = taup.get_ray_paths(
-                        source_depth_in_km=EVENT_DEPTH,
-                        distance_in_degree=dist,
-                        phase_list=[phase]
-                    )
-                    for arr in arrivals:
-                        path_points = []
-                        for pt in arr.path:
-                            r = (6371 - pt['depth']) / 6371
-                            theta = pt['dist']
-                            path_points.append({
-                                "theta": round(float(theta), 6),
-                                "r": round(float(r), 6),
-                                "t": round(float(pt['time']), 2)
-                            })
-                        ray_paths.append({
-                            "phase": arr.name,
-                            "distance_deg": dist,
-                            "time_s": round(arr.time, 2),
-                            "ray_param": round(arr.ray_param, 4),
-                            "takeoff_angle": round(arr.takeoff_angle, 2),
-                            "incident_angle": round(arr.incident_angle, 2),
-                            "wave_type": "P" if arr.name[0] in "Pp" else "S",
-                            "path": path_points
-                        })
-                except Exception:
-                    pass
+        start = time.perf_counter()
+        ray_paths, _ = compute_ray_paths(PHASES, range(5, 180, 5), depth,
+                                         model=args.taup_model, workers=workers)
+        timings["ray_paths_s"] = time.perf_counter() - start
 
         # Compute travel time curves
         print("Computing travel time curves...")
-        for phase in phases_to_compute:
-            times = []
-            for dist_x10 in range(0, 1800, 5):  # 0.0° to 180.0° in 0.5° steps
-                dist = dist_x10 / 10.0
-                try:
-                    arrs = taup.get_travel_times(
-                        source_depth_in_km=EVENT_DEPTH,
-                        distance_in_degree=dist,
-                        phase_list=[phase]
-                    )
-                    for a in arrs:
-                        times.append({"d": round(dist, 1), "t": round(a.time, 1)})
-                except:
-                    pass
-            if times:
-                travel_times[phase] = times
+        start = time.perf_counter()
+        tt_table = load_or_build_tt_table(PHASES, model=args.taup_model, workers=workers,
+                                          rebuild=args.rebuild_tables)
+        travel_times = tt_table.travel_time_curves(depth, np.arange(0, 1800, 5) / 10.0)
+        timings["travel_times_s"] = time.perf_counter() - start
 
         # Fetch seismograms
         print("Fetching seismograms (this may take a while)...")
-        for net, sta, approx_dist in target_stations:
+        start = time.perf_counter()
+        if inventories is None:
             try:
-                inv = client.get_stations(
-                    network=net, station=sta, channel="LHZ",
-                    starttime=EVENT_TIME, endtime=EVENT_TIME + 3600,
-                    level="response"
-                )
-                sta_coords = inv[0][0]
-                dist_deg = locations2degrees(
-                    EVENT_LAT, EVENT_LON,
-                    sta_coords.latitude, sta_coords.longitude
+                inventories = download_inventories(
+                    target_stations, event_time, event_time + 3600, args.fdsn_url,
+                    args.timeout, args.retries, offline=args.offline
                 )
+            except Exception as e:
+                print(f"  ✗ bulk station request: {e} (falling back to per-station requests)")
+        downloads, errors = download_stations(
+            target_stations, event_time, args.fdsn_url, args.max_concurrency,
+            args.timeout, args.retries, offline=args.offline, inventories=inventories
+        )
+        timings["download_s"] = time.perf_counter() - start
+
+        # Distance, azimuth and back-azimuth for every station in one pass
+        start = time.perf_counter()
+        coords = {key: inv.select(network=key[0], station=key[1])[0][0]
+                  for key, (inv, _) in downloads.items()}
+        keys = list(coords)
+        distances, azimuths, back_azimuths = great_circle(
+            lat, lon, [coords[k].latitude for k in keys], [coords[k].longitude for k in keys]
+        )
+        geometry = {k: (float(d), float(a), float(b))
+                    for k, d, a, b in zip(keys, distances, azimuths, back_azimuths)}
 
-                st = client.get_waveforms(
-                    net, sta, "*", "LHZ",
-                    EVENT_TIME - 60,
-                    EVENT_TIME + 2 * 3600,
-                    attach_response=True
-                )
-                st.merge(fill_value=0)
-                st.remove_response(output="VEL")
-                st.filter('bandpass', freqmin=0.01, freqmax=0.1)
-                st.detrend('demean')
+        for net, sta, approx_dist in target_stations:
+            if (net, sta) in errors:
+                station_errors[f"{net}.{sta}"] = str(errors[(net, sta)])
+                print(f"  ✗ {net}.{sta}: {errors[(net, sta)]}")
+                continue
+            try:
+                inv, st = downloads[(net, sta)]
+                sta_coords = coords[(net, sta)]
+                dist_deg, azimuth, back_azimuth = geometry[(net, sta)]
 
-                tr = st[0]
+                velocity = velocity_trace(inv, st)
+                tr = bandpass_trace(velocity, args.freqmin, args.freqmax)
 
-                arrivals = taup.get_travel_times(
-                    source_depth_in_km=EVENT_DEPTH,
-                    distance_in_degree=dist_deg,
-                    phase_list=phases_to_compute
-                )
-                phase_arrivals = [{"phase": a.name, "time_s": round(a.time, 2)} for a in arrivals]
+                phase_arrivals = tt_table.arrivals(depth, dist_deg)
 
-                data = tr.data[::2].tolist()
-                max_amp = max(abs(np.array(data)))
-                if max_amp > 0:
-                    data = [round(d / max_amp, 4) for d in data]
+                factor = max(int(round(tr.stats.sampling_rate / OUTPUT_SAMPLE_RATE)), 1)
+                trace = decimate(tr.data, factor)
+                max_amp = np.abs(trace).max()
+                data = (trace / max_amp if max_amp > 0 else trace).round(4).tolist()
 
                 stations_out.append({
                     "network": net,
@@ -361,6 +1819,8 @@ def main():
                     "latitude": round(sta_coords.latitude, 3),
                     "longitude": round(sta_coords.longitude, 3),
                     "distance_deg": round(dist_deg, 2),
+                    "azimuth_deg": round(azimuth, 2),
+                    "back_azimuth_deg": round(back_azimuth, 2),
                     "in_p_shadow": 103 <= dist_deg <= 142,
                     "in_s_shadow": dist_deg >= 103,
                     "arrivals": phase_arrivals
@@ -369,68 +1829,59 @@ def main():
                 seismograms.append({
                     "station": f"{net}.{sta}",
                     "distance_deg": round(dist_deg, 2),
-                    "sample_rate": 0.5,
+                    "sample_rate": tr.stats.sampling_rate / factor,
                     "start_time_offset_s": -60,
                     "data": data,
                     "arrivals": phase_arrivals
                 })
+                traces.append(trace)
+                broadband.append((velocity.data, velocity.stats.sampling_rate))
 
                 print(f"  ✓ {net}.{sta} at {dist_deg:.1f}°")
             except Exception as e:
+                station_errors[f"{net}.{sta}"] = f"{type(e).__name__}: {e}"
                 print(f"  ✗ {net}.{sta}: {e}")
+        timings["processing_s"] = time.perf_counter() - start
 
     else:
         # Generate synthetic data
-        print("Generating synthetic ray paths...")
-        for dist in range(5, 180, 5):
-            for phase in phases_to_compute:
-                # Skip phases that don't exist at certain distances
-                if phase == "S" and dist >= 103:
-                    continue
-                if phase == "PKP" and dist < 143:
-                    continue
-                if phase == "PKIKP" and dist < 150:
-                    continue
-                if phase == "Pdiff" and dist < 100:
-                    continue
-
-                path = generate_synthetic_ray_path(dist, phase, EVENT_DEPTH)
-                ray_paths.append({
-                    "phase": phase,
-                    "distance_deg": dist,
-                    "time_s": path[-1]["t"] if path else 0,
-                    "ray_param": 5.0,
-                    "takeoff_angle": 30.0,
-                    "incident_angle": 30.0,
-                    "wave_type": "P" if phase[0] in "Pp" else "S",
-                    "path": path
-                })
+        print("Tracing ray paths through earth_model...")
+        start = time.perf_counter()
+        ray_paths = trace_ray_paths(PHASES, range(5, 180, 5), depth)
+        timings["ray_paths_s"] = time.perf_counter() - start
+        print(f"  ✓ {len(ray_paths)} ray paths in {timings['ray_paths_s']:.2f}s")
 
         print("Generating travel time curves...")
-        for phase in phases_to_compute:
+        start = time.perf_counter()
+        for phase in PHASES:
             times = []
             for dist in np.arange(0, 180, 0.5):
-                arrivals = compute_theoretical_arrivals(dist, EVENT_DEPTH)
+                arrivals = compute_theoretical_arrivals(dist, depth)
                 for arr in arrivals:
                     if arr["phase"] == phase:
                         times.append({"d": round(dist, 1), "t": round(arr["time_s"], 1)})
             if times:
                 travel_times[phase] = times
+        timings["travel_times_s"] = time.perf_counter() - start
 
         print("Generating synthetic seismograms...")
-        for net, sta, dist in target_stations:
-            arrivals = compute_theoretical_arrivals(dist, EVENT_DEPTH)
-            data = generate_synthetic_seismogram(dist)
+        start = time.perf_counter()
+        traces = list(generate_synthetic_seismograms([dist for _, _, dist in target_stations],
+                                                     sample_rate=OUTPUT_SAMPLE_RATE))
+        broadband = [(trace, OUTPUT_SAMPLE_RATE) for trace in traces]
+        for (net, sta, dist), trace in zip(target_stations, traces):
+            arrivals = compute_theoretical_arrivals(dist, depth)
+            data = trace.round(4).tolist()
 
             # Generate approximate station coordinates
-            lat = EVENT_LAT + dist * 0.8 * np.cos(np.radians(dist * 2))
-            lon = EVENT_LON + dist * 1.2 * np.sin(np.radians(dist * 2))
+            sta_lat = lat + dist * 0.8 * np.cos(np.radians(dist * 2))
+            sta_lon = lon + dist * 1.2 * np.sin(np.radians(dist * 2))
 
             stations_out.append({
                 "network": net,
                 "station": sta,
-                "latitude": round(lat, 3),
-                "longitude": round(lon, 3),
+                "latitude": round(sta_lat, 3),
+                "longitude": round(sta_lon, 3),
                 "distance_deg": dist,
                 "in_p_shadow": 103 <= dist <= 142,
                 "in_s_shadow": dist >= 103,
@@ -440,47 +1891,220 @@ def main():
             seismograms.append({
                 "station": f"{net}.{sta}",
                 "distance_deg": dist,
-                "sample_rate": 0.5,
+                "sample_rate": OUTPUT_SAMPLE_RATE,
                 "start_time_offset_s": -60,
                 "data": data,
                 "arrivals": arrivals
             })
             print(f"  ✓ {net}.{sta} at {dist}°")
+        timings["processing_s"] = time.perf_counter() - start
+
+    print("Picking arrivals (STA/LTA)...")
+    start = time.perf_counter()
+    picks = pick_arrivals(traces, seismograms)
+    timings["picking_s"] = time.perf_counter() - start
+    n_matched = sum(p["phase"] is not None for s in picks for p in s["picks"])
+    print(f"  ✓ {sum(len(s['picks']) for s in picks)} picks on {len(picks)} traces, "
+          f"{n_matched} matched to predicted phases ({timings['picking_s']:.2f}s)")
+
+    if args.dense_record_section:
+        print("Synthesising dense record section...")
+        export_dense_record_section(args.dense_spacing, output_dir=output_dir)
 
     # Generate velocity profile
     velocity_profile = generate_velocity_profile()
 
     # Export all data
     print("\nExporting data files...")
+    start = time.perf_counter()
 
-    with open(OUTPUT_DIR / "earth_model.json", "w") as f:
+    with open(output_dir / "earth_model.json", "w") as f:
         json.dump(earth_model, f, indent=2)
     print(f"  ✓ earth_model.json")
 
-    with open(OUTPUT_DIR / "ray_paths.json", "w") as f:
+    with open(output_dir / "ray_paths.json", "w") as f:
         json.dump(ray_paths, f)
     print(f"  ✓ ray_paths.json ({len(ray_paths)} paths)")
+    if ray_paths:
+        pack_ray_paths(ray_paths, output_dir, args.ray_tol_km, args.ray_tol_s)
+        export_wavefronts(ray_paths, output_dir, args.wavefront_dt)
 
-    with open(OUTPUT_DIR / "travel_times.json", "w") as f:
+    with open(output_dir / "travel_times.json", "w") as f:
         json.dump(travel_times, f)
     print(f"  ✓ travel_times.json ({len(travel_times)} phases)")
 
-    with open(OUTPUT_DIR / "velocity_profile.json", "w") as f:
+    with open(output_dir / "velocity_profile.json", "w") as f:
         json.dump(velocity_profile, f)
     print(f"  ✓ velocity_profile.json")
 
-    with open(OUTPUT_DIR / "stations.json", "w") as f:
+    with open(output_dir / "stations.json", "w") as f:
         json.dump(stations_out, f, indent=2)
     print(f"  ✓ stations.json ({len(stations_out)} stations)")
 
-    with open(OUTPUT_DIR / "seismograms.json", "w") as f:
+    with open(output_dir / "seismograms.json", "w") as f:
         json.dump(seismograms, f)
     print(f"  ✓ seismograms.json ({len(seismograms)} traces)")
-
-    with open(OUTPUT_DIR / "event.json", "w") as f:
-        json.dump(event_data, f, indent=2)
+    export_seismogram_pyramids(seismograms, traces, output_dir)
+    export_spectrograms(broadband, seismograms, output_dir)
+
+    with open(output_dir / "picks.json", "w") as f:
+        json.dump({
+            "parameters": {"sta_s": STA_S, "lta_s": LTA_S, "trigger_on": TRIGGER_ON,
+                           "trigger_off": TRIGGER_OFF, "match_window_s": PICK_WINDOW_S,
+                           "snr_window_s": SNR_WINDOW_S, "min_snr": PICK_MIN_SNR},
+            "stations": picks,
+        }, f)
+    print(f"  ✓ picks.json")
+
+    with open(output_dir / "event.json", "w") as f:
+        json.dump({k: v for k, v in event.items() if k != "id"}, f, indent=2)
     print(f"  ✓ event.json")
+    timings["export_s"] = time.perf_counter() - start
 
+    return {
+        "stations_ok": len(seismograms),
+        "station_errors": station_errors,
+        "timings": {k: round(v, 3) for k, v in timings.items()},
+    }
+
+
+def _run_catalog_event(event, output_dir, args, inventories):
+    """Process-pool task: one catalogue event, never raising."""
+    start = time.perf_counter()
+    summary = {
+        "id": _event_id(event),
+        "name": event["name"],
+        "time_utc": event["time_utc"],
+        "output_dir": str(output_dir),
+    }
+    try:
+        # One event per process already; workers=1 runs its TauP work inline
+        result = process_event(event, output_dir, args, inventories, workers=1)
+        if result["stations_ok"]:
+            summary.update(status="ok", **result)
+        else:
+            summary.update(status="failed", error="no station data", **result)
+    except Exception as e:
+        summary.update(status="failed", error=f"{type(e).__name__}: {e}")
+    summary["wall_time_s"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+def run_catalog(args):
+    """Batch mode: every catalogue event into its own directory, plus manifest.json."""
+    events = read_catalog(args.catalog)
+    output_root = Path(args.output_dir)
+    output_root.mkdir(parents=True, exist_ok=True)
+    print(f"Batch mode: {len(events)} events from {args.catalog} → {output_root}")
+    batch_start = time.perf_counter()
+
+    inventories = {}
+    if HAS_OBSPY:
+        # Shared by every event: the travel-time table (built once here, then
+        # loaded from cache by each worker) and one inventory per station
+        # spanning the whole catalogue
+        print("Preparing shared travel-time table...")
+        load_or_build_tt_table(PHASES, model=args.taup_model, workers=args.workers,
+                               rebuild=args.rebuild_tables)
+        args.rebuild_tables = False
+
+        times = [UTCDateTime(e["time_utc"]) for e in events]
+        span_start, span_end = min(times), max(times) + 3600
+        print(f"Fetching station inventories for {span_start.date} – {span_end.date}...")
+        try:
+            inventories = download_inventories(target_stations, span_start, span_end,
+                                               args.fdsn_url, args.timeout, args.retries,
+                                               offline=args.offline)
+        except Exception as e:
+            print(f"  ✗ bulk station request: {e} (will retry per event)")
+
+    summaries = []
+    with ProcessPoolExecutor(max_workers=args.event_workers) as pool:
+        futures = [
+            pool.submit(_run_catalog_event, event, output_root / _event_id(event), args, inventories)
+            for event in events
+        ]
+        for future in as_completed(futures):
+            summary = future.result()
+            summaries.append(summary)
+            mark = "✓" if summary["status"] == "ok" else "✗"
+            detail = (f"{summary['stations_ok']} stations" if summary["status"] == "ok"
+                      else summary["error"])
+            print(f"{mark} {summary['id']} ({summary['name']}): {detail}, "
+                  f"{summary['wall_time_s']:.1f}s")
+
+    order = {_event_id(e): i for i, e in enumerate(events)}
+    summaries.sort(key=lambda s: order[s["id"]])
+    failed = [s for s in summaries if s["status"] != "ok"]
+    manifest = {
+        "catalog": str(args.catalog),
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "n_events": len(events),
+        "n_failed": len(failed),
+        "wall_time_s": round(time.perf_counter() - batch_start, 3),
+        "events": summaries,
+    }
+    _write_json_atomic(output_root / "manifest.json", manifest)
+
+    print("\n" + "=" * 60)
+    print(f"{len(events) - len(failed)}/{len(events)} events in {manifest['wall_time_s']:.1f}s")
+    print(f"Manifest: {output_root / 'manifest.json'}")
+    print("=" * 60)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate data for the Seismic Anatomy visualizer")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="worker processes for TauP computations (default: CPU count)")
+    parser.add_argument("--rebuild-tables", action="store_true",
+                        help="recompute the cached travel-time table")
+    parser.add_argument("--taup-model", default=TAUP_MODEL,
+                        help="TauP model for ray paths and travel times: 'earth_model' (built "
+                             "from this script's earth_model and cached) or a TauP model name "
+                             "(default %(default)s)")
+    parser.add_argument("--fdsn-url", default=FDSN_URL,
+                        help="FDSN provider key or base URL (default IRIS)")
+    parser.add_argument("--max-concurrency", type=int, default=FDSN_CONCURRENCY,
+                        help="stations downloaded at once (default %(default)s)")
+    parser.add_argument("--timeout", type=float, default=FDSN_TIMEOUT_S,
+                        help="per-request timeout in seconds (default %(default)s)")
+    parser.add_argument("--retries", type=int, default=FDSN_RETRIES,
+                        help="retries per request with exponential backoff (default %(default)s)")
+    parser.add_argument("--offline", action="store_true",
+                        help="use only cached raw data; never contact the FDSN service")
+    parser.add_argument("--freqmin", type=float, default=BANDPASS_FREQMIN,
+                        help="bandpass lower corner in Hz (default %(default)s)")
+    parser.add_argument("--freqmax", type=float, default=BANDPASS_FREQMAX,
+                        help="bandpass upper corner in Hz (default %(default)s)")
+    parser.add_argument("--ray-tol-km", type=float, default=RAY_TOL_KM,
+                        help="max geometric error of simplified ray paths in km (default %(default)s)")
+    parser.add_argument("--ray-tol-s", type=float, default=RAY_TOL_S,
+                        help="max travel-time error of simplified ray paths in s (default %(default)s)")
+    parser.add_argument("--wavefront-dt", type=float, default=WAVEFRONT_DT_S,
+                        help="time step of wavefront animation frames in s (default %(default)s)")
+    parser.add_argument("--dense-record-section", action="store_true",
+                        help="also synthesise a dense virtual-station record section")
+    parser.add_argument("--dense-spacing", type=float, default=0.1,
+                        help="virtual station spacing in degrees (default %(default)s)")
+    parser.add_argument("--catalog", type=Path,
+                        help="CSV or QuakeML event catalogue; processes every event (batch mode)")
+    parser.add_argument("--output-dir", type=Path, default=OUTPUT_DIR / "events",
+                        help="batch mode: one subdirectory per event here (default %(default)s)")
+    parser.add_argument("--event-workers", type=int, default=None,
+                        help="batch mode: events processed in parallel (default: CPU count)")
+    args = parser.parse_args()
+    if HAS_OBSPY:
+        args.taup_model = resolve_taup_model(args.taup_model)
+
+    if args.catalog:
+        manifest = run_catalog(args)
+        if manifest["n_failed"]:
+            raise SystemExit(1)
+        return
+
+    print("Generating seismic data for Seismic Anatomy visualizer...")
+    process_event(event_data, OUTPUT_DIR, args, workers=args.workers)
     print(f"\nDone! Output directory: {OUTPUT_DIR}")
 
 
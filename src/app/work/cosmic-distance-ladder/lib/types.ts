@@ -86,6 +86,7 @@ export interface HubbleDiagram {
   H0_shoes_err: number;
   H0_planck_err: number;
   tension_sigma: number;
+  tension_sigma_fit?: number;
 }
 
 // Redshift Spectrum